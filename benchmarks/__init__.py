@@ -0,0 +1 @@
+"""Benchmarks for ImportPhotos, run on synthetic photo cards."""
@@ -0,0 +1,114 @@
+"""Times the steps of an import on synthetic cards and writes the results as JSON.
+
+    $ python -m benchmarks.bench --sizes 1000 10000 100000 --output results.json
+
+Results of two commits can be compared with --compare old.json,
+and the policies syncing copies to disk with --fsync file batch off."""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.cards import card_mix, make_card
+from importphotos.lib import Folder, ImportJob, Photo
+from importphotos.transfer import AtomicWriter, FSYNC_BATCH, FSYNC_FILE, FSYNC_OFF
+
+SIZES = (1000, 10000, 100000)
+EXTENSIONS = (".jpg", ".jpeg", ".png", ".cr2", ".arw", ".mp4")
+STEPS = ("get_files_with_extension", "extract_dates", "filter_by_date", "sort_files_by_date", "execute")
+
+def run(files, workdir, jobs=4, executor="thread", padding=0, repeat=1, fsync=FSYNC_BATCH):
+    """Time each step of an import of a card of about files files, returns the best seconds of each step."""
+    card = os.path.join(workdir, "card")
+    destination = os.path.join(workdir, "library")
+    make_card(card, padding=padding, **card_mix(files))
+    timings = {step: [] for step in STEPS}
+    found = 0
+    for _ in range(repeat):
+        shutil.rmtree(destination, ignore_errors=True)
+        os.makedirs(destination)
+        with contextlib.redirect_stdout(io.StringIO()):
+            folder = Folder(card)
+            found = _time(timings, "get_files_with_extension", folder.get_files_with_extension, EXTENSIONS, True)
+            _time(timings, "extract_dates", folder.extract_dates, jobs, executor)
+            dates = sorted(photo.date_taken for photo in folder.photos)
+            _time(timings, "filter_by_date", folder.filter_by_date, dates[len(dates) // 4], dates[-1])
+            job = ImportJob(folder, destination, writer=AtomicWriter(fsync))
+            sorted_jobs = _time(timings, "sort_files_by_date", job.sort_files_by_date)
+            _time(timings, "execute", lambda: [sorted_job.execute(j) for j, sorted_job in enumerate(sorted_jobs.values())])
+    shutil.rmtree(card)
+    shutil.rmtree(destination)
+    return {"files": files, "fsync": fsync, "found": found, "seconds": {step: min(times) for step, times in timings.items()}}
+
+def _time(timings, step, function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    timings[step].append(time.perf_counter() - started)
+    return result
+
+def compare(old, new):
+    """Lines with the change of each step between two result files."""
+    old_runs = {(result["files"], result.get("fsync", FSYNC_BATCH)): result["seconds"] for result in old["results"]}
+    lines = []
+    for result in new["results"]:
+        before = old_runs.get((result["files"], result["fsync"]))
+        if before is None:
+            continue
+        for step, seconds in result["seconds"].items():
+            if before.get(step):
+                lines.append(f"{result['files']:>7} {result['fsync']:<5} {step:<26} {before[step]:9.3f}s -> {seconds:9.3f}s "
+                             f"{(seconds / before[step] - 1) * 100:+7.1f}%")
+    return lines
+
+def _commit():
+    """Commit of the working tree, None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description="Benchmark ImportPhotos on synthetic cards.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Number of files of each card.")
+    parser.add_argument("--jobs", type=int, default=4, help="Workers reading photo dates.")
+    parser.add_argument("--executor", choices=("thread", "process"), default="thread", help="Executor reading photo dates.")
+    parser.add_argument("--padding", type=int, default=0, help="Bytes added to every file.")
+    parser.add_argument("--fsync", nargs="+", choices=(FSYNC_FILE, FSYNC_BATCH, FSYNC_OFF), default=(FSYNC_BATCH,),
+                        help="Policies syncing the copies to disk, each card is run with each of them.")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs of each card, the fastest is kept.")
+    parser.add_argument("--workdir", default=None, help="Folder to write the cards to, a temporary folder by default.")
+    parser.add_argument("--output", default=None, help="JSON file to write the results to.")
+    parser.add_argument("--compare", default=None, help="JSON results of an earlier run to compare with.")
+    args = parser.parse_args(argv)
+    Photo.cache = None
+    Photo.journal = None
+    report = {"commit": _commit(), "date": datetime.datetime.now().isoformat(timespec="seconds"),
+              "python": platform.python_version(), "platform": platform.platform(),
+              "jobs": args.jobs, "executor": args.executor, "padding": args.padding, "results": []}
+    for files in args.sizes:
+        for fsync in args.fsync:
+            with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+                result = run(files, workdir, args.jobs, args.executor, args.padding, args.repeat, fsync)
+            report["results"].append(result)
+            print(f"{files:>7} files, fsync {fsync}: " + ", ".join(f"{step} {seconds:.3f}s" for step, seconds in result["seconds"].items()))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            for line in compare(json.load(file), report):
+                print(line)
+    return report
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
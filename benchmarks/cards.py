@@ -0,0 +1,92 @@
+"""Generator of synthetic photo cards laid out like a camera's DCIM folder."""
+import datetime
+import io
+import os
+import random
+import struct
+
+from PIL import Image
+
+PLACEHOLDER = b"2000:01:01 00:00:00"
+MP4_EPOCH = datetime.datetime(1904, 1, 1, tzinfo=datetime.timezone.utc)
+SIZE_JITTER = 16 * 1024
+
+def card_mix(files):
+    """Counts of each kind of file for a card of about files files.
+        40% single JPEGs, 40% in RAW+JPEG pairs, 10% single RAWs and 10% videos."""
+    return {"jpegs": files * 4 // 10, "pairs": files // 5, "raws": files // 10, "videos": files // 10}
+
+def make_card(path, jpegs=0, pairs=0, raws=0, videos=0, per_folder=999, start=datetime.datetime(2021, 1, 1),
+              step=datetime.timedelta(minutes=10), padding=0, seed=0):
+    """Write a card of files in numbered DCIM folders of per_folder photos, returns the paths written.
+        JPEGs have real EXIF, CR2 and ARW files a TIFF header with the date and MP4 files a movie header.
+        Photos are taken step apart from start, with their modified time set to the date taken.
+        padding adds that many bytes to every file, and up to SIZE_JITTER more so sizes vary like real photos.
+        Each file ends with its own bytes so no two are the same."""
+    rand = random.Random(seed)
+    template = _jpeg_template()
+    kinds = ["jpeg"] * jpegs + ["pair"] * pairs + ["raw"] * raws + ["video"] * videos
+    rand.shuffle(kinds)
+    written = []
+    for number, kind in enumerate(kinds):
+        folder = os.path.join(path, "DCIM", f"{100 + number // per_folder}CANON")
+        if number % per_folder == 0:
+            os.makedirs(folder, exist_ok=True)
+        date_taken = start + step * number
+        stem = os.path.join(folder, f"IMG_{number % 10000:04}")
+        tail = b"\x00" * (padding + rand.randrange(SIZE_JITTER)) + rand.randbytes(16)
+        files = []
+        if kind in ("jpeg", "pair"):
+            files.append((stem + ".JPG", template.replace(PLACEHOLDER, _exif_date(date_taken)) + tail))
+        if kind in ("raw", "pair"):
+            extension = rand.choice((".CR2", ".ARW"))
+            files.append((stem + extension, _raw(date_taken, extension == ".CR2") + tail))
+        if kind == "video":
+            files.append((os.path.join(folder, f"MVI_{number % 10000:04}.MP4"), _mp4(date_taken) + tail))
+        for file_path, data in files:
+            with open(file_path, 'wb') as file:
+                file.write(data)
+            timestamp = date_taken.timestamp()
+            os.utime(file_path, (timestamp, timestamp))
+            written.append(file_path)
+    misc = os.path.join(path, "MISC")
+    os.makedirs(misc, exist_ok=True)
+    with open(os.path.join(misc, "AUTPRINT.MRK"), 'wb') as file:
+        file.write(b"[HDR]\r\n")
+    return written
+
+def _exif_date(date_taken):
+    return date_taken.strftime("%Y:%m:%d %H:%M:%S").encode()
+
+def _jpeg_template():
+    """Small JPEG with DateTime and DateTimeOriginal set to PLACEHOLDER."""
+    exif = Image.Exif()
+    exif[0x0110] = "Synthetic"
+    exif[0x0132] = PLACEHOLDER.decode()
+    exif.get_ifd(0x8769)[0x9003] = PLACEHOLDER.decode()
+    output = io.BytesIO()
+    Image.new("RGB", (16, 16), (128, 96, 64)).save(output, "JPEG", exif=exif)
+    return output.getvalue()
+
+def _raw(date_taken, canon):
+    """Little endian TIFF header with Make and DateTime in IFD0, with the CR2 marker for Canon."""
+    make = b"Canon\x00" if canon else b"SONY\x00"
+    ifd = 16 if canon else 8
+    data_offset = ifd + 2 + 2 * 12 + 4
+    header = b"II*\x00" + struct.pack("<I", ifd)
+    if canon:
+        header += b"CR\x02\x00" + struct.pack("<I", 0)
+    entries = struct.pack("<H", 2)
+    entries += struct.pack("<HHII", 0x010F, 2, len(make), data_offset)
+    entries += struct.pack("<HHII", 0x0132, 2, 20, data_offset + len(make))
+    return header + entries + struct.pack("<I", 0) + make + _exif_date(date_taken) + b"\x00"
+
+def _mp4(date_taken):
+    """ftyp box and a moov box with a version 0 mvhd holding the creation time in UTC."""
+    seconds = int(date_taken.timestamp() - MP4_EPOCH.timestamp())
+    mvhd = struct.pack(">B3sIIII", 0, b"\x00\x00\x00", seconds, seconds, 600, 0) + b"\x00" * 80
+    moov = _box(b"moov", _box(b"mvhd", mvhd))
+    return _box(b"ftyp", b"isom\x00\x00\x02\x00isomiso2mp41") + moov
+
+def _box(kind, payload):
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
@@ -2,7 +2,8 @@
 import argparse
 import datetime
 
-from importphotos.validators import FileValidator
+from importphotos.config import VERIFY_MODES
+from importphotos.validators import FileValidator, NumberValidator
 
 class ArgumentParser(argparse.ArgumentParser):
     """Argument parser for ImportPhotos.py"""
@@ -20,14 +21,35 @@ class ArgumentParser(argparse.ArgumentParser):
                             help='Recursively search for files in subfolders of source folder.')
         self.add_argument('-m', '--move', action='store_true',
                             help='Deletes source files after copying.')
+        self.add_argument('--verify', choices=VERIFY_MODES, default=None,
+                            help='Check copies before deleting sources with --move: full hash read back, size only, or none. Defaults to verify in config.ini.')
         self.add_argument('-s' , '--date-search', nargs=2, metavar=('start-dtm', 'end-dtm'),
                             type=datetime.datetime.fromisoformat, help='Filter source files by start and end date. ISOformat - YYYY-MM-DD:HH:mm:ss')
+        self.add_argument('--strict-dates', action='store_true',
+                            help='Read the date taken of every file for --date-search, without skipping files modified far outside the range.')
         self.add_argument('-i', '--interactive', action='store_true', help='Interactive mode.')
         self.add_argument('-e', '--extension', type=FileValidator.file_extension, nargs='+',
                             help='File extension to search for in source folder.')
         self.add_argument('--version', action='version', version='Import Photos 1.1')
-        self.add_argument('-p', '--path', type=FileValidator.file_path, help='Path to source folder.')
-        self.add_argument('-o', '--destination', type=FileValidator.file_path, help='Path to destination folder.')
+        self.add_argument('-p', '--path', type=FileValidator.file_path, nargs='+', action='extend',
+                            help='Paths to source folders, imported at the same time.')
+        self.add_argument('-o', '--destination', type=FileValidator.file_path, nargs='+', action='extend',
+                            help='Paths to destination folders, the first is the library and the others get a copy of every photo.')
         self.add_argument('-d', '--dry-run', action='store_true', help='Dry run. Does not copy files.')
         self.add_argument('-w', '--overwrite', action='store_true', help='Overwrite files in destination folder.')
-        self.add_argument('-v', '--verbose', action='store_true', help='Verbose output.')
\ No newline at end of file
+        self.add_argument('-v', '--verbose', action='store_true', help='Verbose output.')
+        self.add_argument('-j', '--jobs', type=NumberValidator.positive_integer,
+                            help='Number of workers reading photo dates. Defaults to concurrency in config.ini.')
+        self.add_argument('--copy-jobs', type=NumberValidator.positive_integer,
+                            help='Number of workers copying photos. Defaults to copy_concurrency in config.ini.')
+        self.add_argument('--watch', nargs='*', default=None, metavar='ROOT',
+                            help='Keep running and import each card mounted in the mount roots, watch_dir in config.ini by default.')
+        self.add_argument('--resume', action='store_true',
+                            help='Resume an interrupted import, skipping photos the journal shows copied.')
+        self.add_argument('--log-file', default=None, metavar='LOG_FILE',
+                            help='JSON lines file to log the detail of each file to. Defaults to log_file in config.ini.')
+        self.add_argument('--profile', nargs='?', const='importphotos-profile.json', default=None, metavar='REPORT',
+                            help='Time each stage of the import and write a JSON report, importphotos-profile.json by default.')
+        cache = self.add_mutually_exclusive_group()
+        cache.add_argument('--no-cache', action='store_true', help='Do not use the metadata cache and the hash index.')
+        cache.add_argument('--rebuild-cache', action='store_true', help='Clear the metadata cache and the hash index and read every file again.')
\ No newline at end of file
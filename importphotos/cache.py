@@ -0,0 +1,100 @@
+"""Persistent cache of the metadata read from source files."""
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+
+FLUSH_EVERY = 1000
+
+class MetadataCache():
+    """SQLite cache of the date taken and key tags of files.
+        An entry is valid while the device, inode, size and modified time of the file match."""
+    def __init__(self, path, limit=200000, max_age=180, rebuild=False):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.limit = limit
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._used = []
+        self._updates = {}
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS metadata (
+                path TEXT PRIMARY KEY, device INTEGER, inode INTEGER, size INTEGER, mtime_ns INTEGER,
+                date_taken TEXT, tags TEXT, last_used REAL)""")
+            if rebuild:
+                self._connection.execute("DELETE FROM metadata")
+
+    def get(self, path, stat):
+        """Return the cached (date_taken, tags) of a file, None if missing or out of date."""
+        path = os.path.abspath(path)
+        with self._lock:
+            row = self._updates.get(path)
+            if row is not None:
+                row = row[1:7]
+            else:
+                row = self._connection.execute(
+                    "SELECT device, inode, size, mtime_ns, date_taken, tags FROM metadata WHERE path = ?", (path,)).fetchone()
+            if row is None or tuple(row[:4]) != _stat_key(stat):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._used.append((time.time(), path))
+        return datetime.datetime.fromisoformat(row[4]), json.loads(row[5])
+
+    def put(self, path, stat, date_taken, tags):
+        """Store the metadata of a file, written in batches."""
+        with self._lock:
+            path = os.path.abspath(path)
+            self._updates[path] = (path, *_stat_key(stat), date_taken.isoformat(), json.dumps(tags), time.time())
+            if len(self._updates) >= FLUSH_EVERY:
+                self._flush()
+
+    def flush(self):
+        """Write pending entries and access times to the database."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        with self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self._updates.values())
+            self._connection.executemany("UPDATE metadata SET last_used = ? WHERE path = ?", self._used)
+        self._updates = {}
+        self._used = []
+
+    def evict(self):
+        """Remove entries not used within max_age days and the least recently used over the limit.
+            Returns the number of entries removed."""
+        with self._lock, self._connection:
+            removed = self._connection.execute("DELETE FROM metadata WHERE last_used < ?",
+                                               (time.time() - self.max_age * 86400,)).rowcount
+            removed += self._connection.execute(
+                "DELETE FROM metadata WHERE path IN (SELECT path FROM metadata ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.limit,)).rowcount
+        return removed
+
+    def close(self):
+        """Flush, evict old entries and close the database."""
+        self.flush()
+        self.evict()
+        self._connection.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+
+    def __str__(self):
+        return f"MetadataCache({self.path}, {self.hits} hits, {self.misses} misses)"
+
+    def __repr__(self):
+        return f"MetadataCache({self.path}, {self.limit}, {self.max_age}, {self.hits}, {self.misses})"
+
+def _stat_key(stat):
+    """Values identifying a version of a file."""
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
@@ -4,23 +4,69 @@ import configparser
 import dataclasses
 import inspect
 import os
-from importphotos.validators import FileValidator
+from importphotos.validators import FileValidator, NumberValidator
+from importphotos.watch import mount_roots
 import importphotos
 
+EXECUTORS = ("thread", "process")
+VERIFY_MODES = ("full", "size", "none")
+FSYNC_POLICIES = ("file", "batch", "off")
+
 # Configuration Constants
 @dataclasses.dataclass
 class Config:
     """Class to hold the configuration of the program"""
     _config: configparser.ConfigParser
     source_dir: str
+    source_dirs: tuple[str, ...]
     destination_dir: str
+    destination_dirs: tuple[str, ...]
     file_types: list[str]
+    concurrency: int
+    executor: str
+    cache_file: str
+    cache_limit: int
+    cache_max_age: int
+    copy_concurrency: int
+    source_concurrency: int
+    destination_concurrency: int
+    journal_file: str
+    log_file: str
+    date_margin: int
+    verify: str
+    fsync: str
+    resumable_size: int
+    watch_dirs: tuple[str, ...]
+    watch_interval: int
+    watch_settle: int
 
     def __init__(self):
         self._config = self._read_config()
         self.source_dir = self.get_config_item("DEFAULT", "source_dir")
+        self.source_dirs = tuple(line.strip() for line in self.source_dir.splitlines() if line.strip())
+        self.source_dir = self.source_dirs[0] if self.source_dirs else self.source_dir
         self.destination_dir = self.get_config_item("DEFAULT", "destination_dir")
+        self.destination_dirs = tuple(line.strip() for line in self.destination_dir.splitlines() if line.strip())
+        self.destination_dir = self.destination_dirs[0] if self.destination_dirs else self.destination_dir
         self.file_types = self.get_config_item("DEFAULT", "file_types")
+        self.concurrency = self.get_optional_config_item("DEFAULT", "concurrency", "4")
+        self.executor = self.get_optional_config_item("DEFAULT", "executor", "thread")
+        self.cache_file = self.get_optional_config_item("DEFAULT", "cache_file", os.path.join("~", ".importphotos", "metadata.sqlite3"))
+        self.cache_limit = self.get_optional_config_item("DEFAULT", "cache_limit", "200000")
+        self.cache_max_age = self.get_optional_config_item("DEFAULT", "cache_max_age", "180")
+        self.copy_concurrency = self.get_optional_config_item("DEFAULT", "copy_concurrency", "4")
+        self.source_concurrency = self.get_optional_config_item("DEFAULT", "source_concurrency", "2")
+        self.destination_concurrency = self.get_optional_config_item("DEFAULT", "destination_concurrency", "4")
+        self.journal_file = self.get_optional_config_item("DEFAULT", "journal_file", os.path.join("~", ".importphotos", "journal.jsonl"))
+        self.log_file = self.get_optional_config_item("DEFAULT", "log_file", "")
+        self.date_margin = self.get_optional_config_item("DEFAULT", "date_margin", "")
+        self.verify = self.get_optional_config_item("DEFAULT", "verify", "full")
+        self.fsync = self.get_optional_config_item("DEFAULT", "fsync", "batch")
+        self.resumable_size = self.get_optional_config_item("DEFAULT", "resumable_size", "1024")
+        watch_dir = self.get_optional_config_item("DEFAULT", "watch_dir", "\n".join(mount_roots()))
+        self.watch_dirs = tuple(line.strip() for line in watch_dir.splitlines() if line.strip())
+        self.watch_interval = self.get_optional_config_item("DEFAULT", "watch_interval", "2")
+        self.watch_settle = self.get_optional_config_item("DEFAULT", "watch_settle", "10")
         try:
             self.validate()
         except configparser.Error as exc:
@@ -29,11 +75,30 @@ class Config:
     def validate(self):
         """Validates the configuration"""
         try:
-            FileValidator.file_path(self.source_dir)
-            FileValidator.file_path(self.destination_dir)
+            for source_dir in self.source_dirs:
+                FileValidator.file_path(source_dir)
+            for destination_dir in self.destination_dirs:
+                FileValidator.file_path(destination_dir)
             self.file_types = FileValidator.file_extension(" ".join(self.file_types))
+            self.concurrency = NumberValidator.positive_integer(self.concurrency)
+            self.cache_limit = NumberValidator.positive_integer(self.cache_limit)
+            self.cache_max_age = NumberValidator.positive_integer(self.cache_max_age)
+            self.copy_concurrency = NumberValidator.positive_integer(self.copy_concurrency)
+            self.source_concurrency = NumberValidator.positive_integer(self.source_concurrency)
+            self.destination_concurrency = NumberValidator.positive_integer(self.destination_concurrency)
+            if self.date_margin:
+                self.date_margin = NumberValidator.positive_integer(self.date_margin)
+            self.resumable_size = NumberValidator.positive_integer(self.resumable_size)
+            self.watch_interval = NumberValidator.positive_integer(self.watch_interval)
+            self.watch_settle = NumberValidator.positive_integer(self.watch_settle)
         except argparse.ArgumentTypeError as exc:
             raise configparser.Error(f"Configuration is invalid: {exc}") from exc
+        if self.executor not in EXECUTORS:
+            raise configparser.Error(f"Configuration is invalid: executor must be one of {", ".join(EXECUTORS)}")
+        if self.verify not in VERIFY_MODES:
+            raise configparser.Error(f"Configuration is invalid: verify must be one of {", ".join(VERIFY_MODES)}")
+        if self.fsync not in FSYNC_POLICIES:
+            raise configparser.Error(f"Configuration is invalid: fsync must be one of {", ".join(FSYNC_POLICIES)}")
 
     def get_config_item(self, group, key):
         """Returns the value of the key in the group"""
@@ -51,6 +116,12 @@ class Config:
             print(exc)
             raise KeyError(f"Key {key} not found in group {group}") from exc
 
+    def get_optional_config_item(self, group, key, default):
+        """Returns the value of the key in the group or the default if it is not set"""
+        if not self._config.has_option(group, key):
+            return default
+        return self.get_config_item(group, key)
+
     def _read_config(self, config_file = None):
         """Loads the config from the config file"""
         if config_file is None:
@@ -0,0 +1,237 @@
+"""Content hashes finding the same photo under any name."""
+import collections
+import hashlib
+import os
+import sqlite3
+import threading
+
+BLOCK_SIZE = 64 * 1024
+FLUSH_EVERY = 1000
+
+# Size and modified time of a file known without a stat, like the ones a DestinationIndex keeps, read like an os.stat_result
+FileStatus = collections.namedtuple("FileStatus", ("st_size", "st_mtime_ns"))
+
+def new_digest():
+    """Empty BLAKE2 digest of the full hashes."""
+    return hashlib.blake2b(digest_size=32)
+
+class HashIndex():
+    """SQLite store of the partial and full hashes of files.
+        An entry is valid while the size and modified time of the file match."""
+    def __init__(self, path, rebuild=False):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._updates = {}
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS hashes (
+                path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, partial TEXT, full TEXT)""")
+            if rebuild:
+                self._connection.execute("DELETE FROM hashes")
+
+    def get(self, path, stat):
+        """Return the stored (partial, full) hashes of a file, None if missing or out of date."""
+        path = os.path.abspath(path)
+        with self._lock:
+            row = self._updates.get(path)
+            if row is not None:
+                row = row[1:]
+            else:
+                row = self._connection.execute(
+                    "SELECT size, mtime_ns, partial, full FROM hashes WHERE path = ?", (path,)).fetchone()
+        if row is None or tuple(row[:2]) != (stat.st_size, stat.st_mtime_ns):
+            return None
+        return row[2], row[3]
+
+    def put(self, path, stat, partial, full=None):
+        """Store the hashes of a file, written in batches."""
+        with self._lock:
+            path = os.path.abspath(path)
+            self._updates[path] = (path, stat.st_size, stat.st_mtime_ns, partial, full)
+            if len(self._updates) >= FLUSH_EVERY:
+                self._flush()
+
+    def flush(self):
+        """Write pending entries to the database."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        with self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)", self._updates.values())
+        self._updates = {}
+
+    def close(self):
+        """Flush and close the database."""
+        self.flush()
+        self._connection.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+
+    def __str__(self):
+        return f"HashIndex({self.path})"
+
+    def __repr__(self):
+        return f"HashIndex({self.path}, {len(self._updates)})"
+
+class Deduplicator():
+    """Finds files with the same content by size, then a hash of their first and last blocks, then a full BLAKE2 hash."""
+    def __init__(self, hashes=None):
+        self.hashes = hashes
+        self.partial_hashed = 0
+        self.full_hashed = 0
+        self._hashes = {}
+        self._seen_photos = {}
+        self._seen_locks = {}
+        self._lock = threading.Lock()
+        self._seen_lock = threading.Lock()
+
+    def same(self, first, second, first_stat=None, second_stat=None):
+        """True if the two files have the same content.
+            A file given with a FileStatus is looked up in the stored hashes without a stat, and only stat'ed to be hashed."""
+        first_stat = os.stat(first) if first_stat is None else first_stat
+        second_stat = os.stat(second) if second_stat is None else second_stat
+        if first_stat.st_size != second_stat.st_size:
+            return False
+        if self._hash(first, first_stat) != self._hash(second, second_stat):
+            return False
+        if first_stat.st_size <= 2 * BLOCK_SIZE:
+            return True
+        return self._hash(first, first_stat, True) == self._hash(second, second_stat, True)
+
+    def find(self, path, candidates, stat=None, statuses=None):
+        """First of the candidate files with the same content as path, None if there is none.
+            statuses maps candidates to their FileStatus when it is known, see same."""
+        for candidate in candidates:
+            try:
+                if self.same(path, candidate, stat, statuses.get(candidate) if statuses is not None else None):
+                    return candidate
+            except OSError:
+                continue
+        return None
+
+    def _hash(self, path, stat, full=False):
+        """Partial or full hash of a file, the stored one or the one of the file stat'ed again when stat is a FileStatus."""
+        stored = self._stored(path, stat)[1 if full else 0]
+        if stored is not None:
+            return stored
+        if isinstance(stat, FileStatus):
+            stat = os.stat(path)
+        return self.full_hash(path, stat) if full else self.partial_hash(path, stat)
+
+    def duplicates(self, photos):
+        """Photos with the same content as an earlier photo, mapped to that photo."""
+        seen = {}
+        duplicates = {}
+        for photo in photos:
+            original = self._seen(seen, photo)
+            if original is not None:
+                duplicates[photo] = original
+        return duplicates
+
+    def seen(self, photo):
+        """Earlier photo passed to seen with the same content as photo, None if photo is the first.
+            Only photos of one size wait for each other while they are hashed."""
+        try:
+            size = photo.stat.st_size
+        except OSError:
+            return None
+        with self._seen_lock:
+            seen, lock = self._seen_photos, self._seen_locks.setdefault(size, threading.Lock())
+        with lock:
+            return self._seen(seen, photo)
+
+    def forget_seen(self):
+        """Forget the photos passed to seen, before the next import."""
+        with self._seen_lock:
+            self._seen_photos = {}
+            self._seen_locks = {}
+
+    def _seen(self, seen, photo):
+        """Look up a photo among the photos seen so far, by size then hashes, and add it.
+            The first photo of a size is only hashed once a second one of that size is seen."""
+        try:
+            size = photo.stat.st_size
+            photos = seen.setdefault(size, {})
+            if not photos:
+                photos[None] = [photo]
+                return None
+            if None in photos:
+                first = photos.pop(None)[0]
+                photos.setdefault(self.partial_hash(first.path, first.stat), []).append(first)
+            group = photos.setdefault(self.partial_hash(photo.path, photo.stat), [])
+            for earlier in group:
+                if size <= 2 * BLOCK_SIZE or self.full_hash(earlier.path, earlier.stat) == self.full_hash(photo.path, photo.stat):
+                    return earlier
+        except OSError:
+            return None
+        group.append(photo)
+        return None
+
+    def partial_hash(self, path, stat):
+        """Hash of the size, first and last blocks of a file."""
+        partial, _ = self._stored(path, stat)
+        if partial is None:
+            digest = hashlib.blake2b(str(stat.st_size).encode(), digest_size=16)
+            with open(path, 'rb') as file:
+                digest.update(file.read(BLOCK_SIZE))
+                if stat.st_size > BLOCK_SIZE:
+                    file.seek(max(BLOCK_SIZE, stat.st_size - BLOCK_SIZE))
+                    digest.update(file.read(BLOCK_SIZE))
+            partial = digest.hexdigest()
+            self.partial_hashed += 1
+            self._store(path, stat, partial, self._stored(path, stat)[1])
+        return partial
+
+    def full_hash(self, path, stat):
+        """BLAKE2 hash of the whole file."""
+        partial, full = self._stored(path, stat)
+        if full is None:
+            digest = new_digest()
+            with open(path, 'rb') as file:
+                while block := file.read(1024 * 1024):
+                    digest.update(block)
+            full = digest.hexdigest()
+            self.full_hashed += 1
+            self._store(path, stat, partial, full)
+        return full
+
+    def store_full_hash(self, path, stat, full):
+        """Remember the full hash of a file computed elsewhere, like while copying it."""
+        self._store(path, stat, self._stored(path, stat)[0], full)
+
+    def _stored(self, path, stat):
+        """Known (partial, full) hashes of a file, (None, None) if it was not hashed."""
+        key = os.path.abspath(path)
+        with self._lock:
+            entry = self._hashes.get(key)
+        if entry is not None and entry[0] == (stat.st_size, stat.st_mtime_ns):
+            return entry[1:]
+        stored = self.hashes.get(path, stat) if self.hashes is not None else None
+        if stored is not None:
+            with self._lock:
+                self._hashes[key] = ((stat.st_size, stat.st_mtime_ns), *stored)
+            return stored
+        return None, None
+
+    def _store(self, path, stat, partial, full):
+        with self._lock:
+            self._hashes[os.path.abspath(path)] = ((stat.st_size, stat.st_mtime_ns), partial, full)
+        if self.hashes is not None:
+            self.hashes.put(path, stat, partial, full)
+
+    def close(self):
+        """Close the hash index."""
+        if self.hashes is not None:
+            self.hashes.close()
+
+    def __str__(self):
+        return f"Deduplicator({self.partial_hashed} partial hashes, {self.full_hashed} full hashes)"
+
+    def __repr__(self):
+        return f"Deduplicator({self.hashes!r}, {self.partial_hashed}, {self.full_hashed})"
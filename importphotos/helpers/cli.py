@@ -3,12 +3,32 @@
 import argparse
 import datetime
 import shutil
+import signal
+import threading
 
 from tabulate import tabulate
 
+BATCH = 64
+
+_width = None
+_pending = []
+_lock = threading.Lock()
+
 def width():
-    """Returns the width of the terminal"""
-    return shutil.get_terminal_size(fallback = (100, 1))[0] -1
+    """Returns the width of the terminal, cached until the terminal is resized"""
+    if _width is None:
+        if hasattr(signal, 'SIGWINCH'):
+            try:
+                signal.signal(signal.SIGWINCH, refresh_width)
+            except ValueError:
+                pass
+        refresh_width()
+    return _width
+
+def refresh_width(*_):
+    """Reads the width of the terminal again, called on SIGWINCH"""
+    global _width
+    _width = shutil.get_terminal_size(fallback = (100, 1))[0] -1
 
 def find_last_space(text : str, width : int):
     """Find the last space in the text before the width"""
@@ -21,6 +41,7 @@ def find_last_space(text : str, width : int):
 
 def print_banner(author : str, version : float):
     """Prints the banner for the program"""
+    flush_messages()
     print("#" * width())
     print("#" + r"  _____                              _____                            _             ".center(width()-2, ' ') + '#')
     print("#" + r" |_   _|                            |_   _|                          | |            ".center(width()-2, ' ') + '#')
@@ -38,6 +59,7 @@ def print_banner(author : str, version : float):
 
 def print_header(text : str, strength : int = 1):
     """Prints a header with the text centered in the middle of the line"""
+    flush_messages()
     if strength > 1:
         print("#" * width())
         print(f"#{text.center(width() - 2, ' ')}#")
@@ -45,15 +67,41 @@ def print_header(text : str, strength : int = 1):
     else:
         print(f"#{f" {text} ".center(width() - 2, '#')}#")
 
-def print_message(message : str):
-    """Prints a message"""
+def format_message(message : str):
+    """Returns the lines of a message wrapped to the terminal"""
+    columns = width()
     message = str(message)
     message = message.strip()
-    while len(message) > width() - 2:
-        last_space = find_last_space(message, width() -  4)
-        print(f"# {message[:last_space+1].ljust(width()-4, ' ')} #")
+    lines = []
+    while len(message) > columns - 2:
+        last_space = find_last_space(message, columns -  4)
+        lines.append(f"# {message[:last_space+1].ljust(columns-4, ' ')} #")
         message = message[last_space + 1:]
-    print(f"# {message.ljust(width() - 4, ' ')} #")
+    lines.append(f"# {message.ljust(columns - 4, ' ')} #")
+    return lines
+
+def print_message(message : str):
+    """Prints a message after the buffered messages"""
+    flush_messages()
+    print("\n".join(format_message(message)))
+
+def buffer_message(message : str):
+    """Buffers a message, printed in one write with the next BATCH messages or before the next printed message"""
+    lines = format_message(message)
+    with _lock:
+        _pending.extend(lines)
+        if len(_pending) < BATCH:
+            return
+    flush_messages()
+
+def flush_messages():
+    """Prints the buffered messages"""
+    with _lock:
+        if not _pending:
+            return
+        lines = "\n".join(_pending)
+        _pending.clear()
+        print(lines)
 
 def print_done():
     """Prints a done message"""
@@ -61,6 +109,7 @@ def print_done():
 
 def print_table(headers: list, rows : list[list]):
     """Prints a table"""
+    flush_messages()
     lines = tabulate(rows, headers, tablefmt="grid").split('\n')
     for line in lines:
         if len(line) > width() - 4:
@@ -70,6 +119,7 @@ def print_table(headers: list, rows : list[list]):
 
 def print_dict(dictionary : dict):
     """Prints a dictionary"""
+    flush_messages()
     for key, value in dictionary.items():
         message = f"# {key} # {value} ".ljust(width() - 1, ' ') + "#"
         print(message)
@@ -102,6 +152,7 @@ def print_progress_bar (iteration : int, total : int, prefix = '', suffix = '',
 
 def input_yes_no(prompt : str):
     """Prompt the user for a yes or no response"""
+    flush_messages()
     while True:
         response = input(f"# {prompt}")
         if not response:
@@ -115,6 +166,7 @@ def input_yes_no(prompt : str):
 
 def input_date(prompt : str):
     """Prompt the user for a date"""
+    flush_messages()
     while True:
         response = input(f"# {prompt}")
         if not response:
@@ -126,6 +178,7 @@ def input_date(prompt : str):
 
 def input_custom(prompt : str, func, help_text : str):
     """Prompt the user for a custom input"""
+    flush_messages()
     while True:
         response = input(f"# {prompt}")
         if not response:
@@ -0,0 +1,106 @@
+"""Leveled log of the detail of an import, to the terminal and a JSON lines file"""
+import datetime
+import json
+import os
+import threading
+
+from importphotos.helpers.cli import buffer_message, flush_messages
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVELS = {DEBUG: "debug", INFO: "info", WARNING: "warning", ERROR: "error"}
+
+class Log():
+    """Messages at or above level are buffered for the terminal, every message is written to the file at path.
+        With a file, per-file detail can be logged at DEBUG and kept off the terminal."""
+    def __init__(self, level=DEBUG, path=None):
+        self.level = level
+        self.path = path
+        self.counts = dict.fromkeys(LEVELS, 0)
+        self._lock = threading.Lock()
+        self._file = None
+        if path is not None:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._file = open(path, 'a', encoding='utf-8')
+
+    def log(self, level, message, **fields):
+        """Log a message with fields for the file."""
+        with self._lock:
+            self.counts[level] += 1
+            if self._file is not None:
+                record = {"time": datetime.datetime.now().isoformat(), "level": LEVELS[level], "message": str(message), **fields}
+                self._file.write(json.dumps(record, default=str) + "\n")
+        if level >= self.level:
+            buffer_message(message)
+
+    def debug(self, message, **fields):
+        """Log detail, like one line per file."""
+        self.log(DEBUG, message, **fields)
+
+    def info(self, message, **fields):
+        """Log a message."""
+        self.log(INFO, message, **fields)
+
+    def warning(self, message, **fields):
+        """Log a problem with a file."""
+        self.log(WARNING, message, **fields)
+
+    def error(self, message, **fields):
+        """Log a failure."""
+        self.log(ERROR, message, **fields)
+
+    def flush(self):
+        """Print the buffered messages and write the file."""
+        flush_messages()
+        if self._file is not None:
+            with self._lock:
+                self._file.flush()
+
+    def close(self):
+        """Flush and close the file."""
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __str__(self):
+        return f"Log({LEVELS[self.level]}, {self.path})"
+
+    def __repr__(self):
+        return f"Log({self.level}, {self.path}, {self.counts})"
+
+log = Log()
+
+def configure(level=DEBUG, path=None):
+    """Replace the log used by debug, info, warning and error, closing the one before."""
+    global log
+    log.close()
+    log = Log(level, path)
+    return log
+
+def debug(message, **fields):
+    """Log detail to the current log."""
+    log.debug(message, **fields)
+
+def info(message, **fields):
+    """Log a message to the current log."""
+    log.info(message, **fields)
+
+def warning(message, **fields):
+    """Log a problem with a file to the current log."""
+    log.warning(message, **fields)
+
+def error(message, **fields):
+    """Log a failure to the current log."""
+    log.error(message, **fields)
+
+def flush():
+    """Flush the current log."""
+    log.flush()
+
+def close():
+    """Close the current log."""
+    log.close()
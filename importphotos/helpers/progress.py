@@ -0,0 +1,143 @@
+"""Progress of files and bytes drawn by a background thread"""
+import collections
+import datetime
+import sys
+import threading
+import time
+
+from importphotos.helpers.cli import flush_messages, print_message, width
+
+class Progress():
+    """Progress of files and bytes shared by all workers.
+        A background thread redraws it at most rate times a second, as a bar with MB/s and an ETA on a terminal,
+        and as a log line every interval seconds when stdout is not a terminal.
+        The speed is a moving average over the last window seconds."""
+    def __init__(self, prefix='Progress:', files=0, size=0, rate=10, interval=10.0, window=5.0, tty=None):
+        self.prefix = prefix
+        self.files = 0
+        self.size = 0
+        self.total_files = files
+        self.total_size = size
+        self.rate = rate
+        self.interval = interval
+        self.window = window
+        self.tty = sys.stdout.isatty() if tty is None else tty
+        self.draws = 0
+        self._samples = collections.deque()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._width = width()
+        self._logged = 0.0
+
+    def add(self, files=1, size=0):
+        """Add files and bytes still to do."""
+        with self._lock:
+            self.total_files += files
+            self.total_size += size
+
+    def advance(self, files=1, size=0, skipped=0):
+        """Count files and bytes done, skipped bytes are no longer waited for."""
+        with self._lock:
+            self.files += files
+            self.size += size
+            self.total_size -= skipped
+
+    def start(self):
+        """Start drawing in the background."""
+        self._stopped.clear()
+        self._logged = time.monotonic()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the background thread and draw the final state."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._sample()
+        if self.tty:
+            self._draw()
+            print()
+        else:
+            print_message(self.line())
+
+    def _run(self):
+        """Draw until stopped, on a terminal only when something changed."""
+        drawn = None
+        while not self._stopped.wait(1 / self.rate):
+            self._sample()
+            if self.tty:
+                state = self.files, self.size, self.total_files, self.total_size
+                if state != drawn:
+                    self._draw()
+                    drawn = state
+            elif time.monotonic() - self._logged >= self.interval:
+                print_message(self.line())
+                self._logged = time.monotonic()
+
+    def _sample(self):
+        """Record the bytes done now and forget samples older than the window."""
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, self.size))
+            while len(self._samples) > 2 and now - self._samples[0][0] > self.window:
+                self._samples.popleft()
+
+    def throughput(self):
+        """Bytes per second over the last window seconds."""
+        with self._lock:
+            if len(self._samples) < 2:
+                return 0.0
+            (start, start_size), (end, end_size) = self._samples[0], self._samples[-1]
+        if end <= start:
+            return 0.0
+        return (end_size - start_size) / (end - start)
+
+    def eta(self):
+        """Time left at the current speed, None while the speed is not known."""
+        speed = self.throughput()
+        if speed <= 0:
+            return None
+        return datetime.timedelta(seconds=int(max(self.total_size - self.size, 0) / speed))
+
+    def fraction(self):
+        """Part done, by bytes when sizes are known and by files otherwise."""
+        if self.total_size > 0:
+            return min(self.size / self.total_size, 1.0)
+        if self.total_files > 0:
+            return min(self.files / self.total_files, 1.0)
+        return 1.0
+
+    def line(self):
+        """Progress as one line of text."""
+        eta = self.eta()
+        return (f"{self.prefix} {self.fraction() * 100:.1f}% {self.files}/{self.total_files} files, "
+                f"{self.size / 1000000:.1f}/{self.total_size / 1000000:.1f} MB, {self.throughput() / 1000000:.1f} MB/s, "
+                f"ETA {eta if eta is not None else '-:--:--'}")
+
+    def _draw(self):
+        """Draw the bar over the current terminal line, after the buffered messages."""
+        flush_messages()
+        eta = self.eta()
+        styling = (f"{self.prefix} || {self.fraction() * 100:.1f}% {self.files}/{self.total_files} "
+                   f"{self.throughput() / 1000000:.1f} MB/s ETA {eta if eta is not None else '-:--:--'}")
+        length = max(self._width - len(styling) - 3, 0)
+        filled = int(length * self.fraction())
+        bar = '█' * filled + '-' * (length - filled)
+        print(f"\r# {styling.replace('||', f'|{bar}|', 1)}#", end='\r', flush=True)
+        self.draws += 1
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def __str__(self):
+        return self.line()
+
+    def __repr__(self):
+        return f"Progress({self.prefix}, {self.files}, {self.size}, {self.total_files}, {self.total_size})"
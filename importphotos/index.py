@@ -0,0 +1,129 @@
+"""Index of the files already in destination folders."""
+import os
+import threading
+import time
+
+from importphotos.dedup import FileStatus
+from importphotos.transfer import is_temporary
+
+class DestinationIndex():
+    """Names of the files in destination folders with their size and modified time, each folder listed once with os.scandir.
+        refresh lists again the folders changed since they were listed."""
+    def __init__(self):
+        self._folders = {}
+        self._modified = {}
+        self._scanning = {}
+        self._lock = threading.Lock()
+        self.scans = 0
+
+    def get(self, folder, name):
+        """Return (size, mtime_ns) of a file in the folder, None if there is no such file."""
+        files = self._folder(folder)
+        with self._lock:
+            return files.get(os.path.normcase(name))
+
+    def add(self, folder, name, size, mtime_ns=None):
+        """Record a file written to the folder."""
+        files = self._folder(folder)
+        with self._lock:
+            files[os.path.normcase(name)] = (size, time.time_ns() if mtime_ns is None else mtime_ns)
+
+    def reserve(self, folder, name, size):
+        """Record a file about to be written under name, or name_1, name_2... while the name is taken.
+            Returns the name reserved."""
+        files = self._folder(folder)
+        stem, extension = os.path.splitext(name)
+        with self._lock:
+            reserved, n = name, 0
+            while os.path.normcase(reserved) in files:
+                n += 1
+                reserved = f"{stem}_{n}{extension}"
+            files[os.path.normcase(reserved)] = (size, time.time_ns())
+        return reserved
+
+    def same_size(self, folder, size):
+        """Names of the files of the folder with the given size."""
+        return list(self.files_of_size(folder, size))
+
+    def files_of_size(self, folder, size):
+        """FileStatus of the files of the folder with the given size, by name."""
+        files = self._folder(folder)
+        with self._lock:
+            return {name: FileStatus(*status) for name, status in files.items() if status[0] == size}
+
+    def remove(self, folder, name):
+        """Forget a file removed from the folder."""
+        files = self._folder(folder)
+        with self._lock:
+            files.pop(os.path.normcase(name), None)
+
+    def mark(self, folder):
+        """Take the modified time a listed folder has now as the one it was listed at, once files were written to it through the index,
+            so refresh only lists it again when something else changes it."""
+        key = os.path.normcase(os.path.abspath(folder))
+        modified = _modified(folder)
+        with self._lock:
+            if key in self._modified:
+                self._modified[key] = modified
+
+    def refresh(self):
+        """Forget the folders modified since they were listed, so they are listed again when next used.
+            Returns the number of folders forgotten."""
+        with self._lock:
+            listed = list(self._modified.items())
+        changed = [key for key, modified in listed if _modified(key) != modified]
+        with self._lock:
+            for key in changed:
+                self._folders.pop(key, None)
+                self._modified.pop(key, None)
+        return len(changed)
+
+    def _folder(self, folder):
+        """Files of a folder, listed the first time it is used by one thread while the others using it wait."""
+        key = os.path.normcase(os.path.abspath(folder))
+        with self._lock:
+            if key in self._folders:
+                return self._folders[key]
+            scanning = self._scanning.setdefault(key, threading.Lock())
+        with scanning:
+            with self._lock:
+                if key in self._folders:
+                    return self._folders[key]
+            modified = _modified(folder)
+            files = _scan(folder)
+            with self._lock:
+                self._modified[key] = modified
+                self._folders[key] = files
+                self._scanning.pop(key, None)
+                self.scans += 1
+        return files
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(files) for files in self._folders.values())
+
+    def __str__(self):
+        return f"DestinationIndex({len(self._folders)} folders, {len(self)} files)"
+
+    def __repr__(self):
+        return f"DestinationIndex({len(self._folders)}, {len(self)}, {self.scans})"
+
+def _modified(folder):
+    """Modified time of a folder, None if it does not exist."""
+    try:
+        return os.stat(folder).st_mtime_ns
+    except OSError:
+        return None
+
+def _scan(folder):
+    """List the files of a folder with the status os.scandir already read, without the temporary names of copies."""
+    files = {}
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file() and not is_temporary(entry.name):
+                    stat = entry.stat()
+                    files[os.path.normcase(entry.name)] = (stat.st_size, stat.st_mtime_ns)
+    except FileNotFoundError:
+        pass
+    return files
@@ -0,0 +1,98 @@
+"""Append-only journal of the files of an import, replayed to resume an interrupted import."""
+import json
+import os
+import threading
+import time
+
+DISCOVERED = "discovered"
+DATED = "dated"
+COPIED = "copied"
+VERIFIED = "verified"
+DELETED = "deleted"
+STATES = (DISCOVERED, DATED, COPIED, VERIFIED, DELETED)
+
+SYNC_EVERY = 256
+SYNC_INTERVAL = 1.0
+
+class Journal():
+    """JSON lines journal with one record per state a file reaches, synced to disk in batches.
+        With resume the journal is replayed and appended to, otherwise it is started again."""
+    def __init__(self, path, resume=False):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.entries = replay(path) if resume else {}
+        self.pending = 0
+        self.syncs = 0
+        self._lock = threading.Lock()
+        self._synced = time.monotonic()
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    def record(self, state, path, stat=None, **fields):
+        """Append the state a file reached, with its size and modified time if stat is given."""
+        record = {"state": state, "path": os.path.abspath(path), **fields}
+        if stat is not None:
+            record["size"] = stat.st_size
+            record["mtime_ns"] = stat.st_mtime_ns
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self.pending += 1
+            if self.pending >= SYNC_EVERY or time.monotonic() - self._synced >= SYNC_INTERVAL:
+                self._sync()
+
+    def state(self, path, stat):
+        """Replayed entry of a file, None if it is not in the journal or the file changed since."""
+        entry = self.entries.get(os.path.abspath(path))
+        if entry is None or (entry.get("size"), entry.get("mtime_ns")) != (stat.st_size, stat.st_mtime_ns):
+            return None
+        return entry
+
+    def reached(self, path, stat, state):
+        """True if the replayed journal shows the file reached state or a later one."""
+        entry = self.state(path, stat)
+        return entry is not None and STATES.index(entry["state"]) >= STATES.index(state)
+
+    def sync(self):
+        """Write pending records to disk."""
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.pending = 0
+        self.syncs += 1
+        self._synced = time.monotonic()
+
+    def close(self):
+        """Sync and close the journal."""
+        self.sync()
+        self._file.close()
+
+    def __str__(self):
+        return f"Journal({self.path}, {len(self.entries)} files replayed)"
+
+    def __repr__(self):
+        return f"Journal({self.path}, {len(self.entries)}, {self.syncs})"
+
+def replay(path):
+    """Latest state of each file in a journal, with the fields of all its records.
+        A file whose size or modified time changed starts again, a truncated last record is ignored."""
+    entries = {}
+    try:
+        file = open(path, encoding='utf-8')
+    except FileNotFoundError:
+        return entries
+    with file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            entry = entries.setdefault(record["path"], {})
+            if "size" in record and "size" in entry and (entry["size"], entry["mtime_ns"]) != (record["size"], record["mtime_ns"]):
+                entry.clear()
+            state = entry.get("state", record["state"])
+            entry.update(record)
+            entry["state"] = max(state, record["state"], key=STATES.index)
+    return entries
@@ -1,11 +1,38 @@
 """Class for Photo Files."""
+import collections
+import concurrent.futures
 import datetime
+import errno
+import functools
 import os
 import shutil
+import time
 
-from PIL import Image, UnidentifiedImageError
+from importphotos.dedup import Deduplicator, new_digest
+from importphotos.helpers import log
+from importphotos.helpers.cli import print_message
+from importphotos.helpers.progress import Progress
+from importphotos.index import DestinationIndex
+from importphotos import journal
+from importphotos.metadata import read_metadata
+from importphotos.profiler import WALK, DATES, CHECKS, COPY, DELETE
+from importphotos.transfer import AtomicWriter, hash_file
+from importphotos.walker import Walker
 
-from importphotos.helpers.cli import print_progress_bar, print_message
+DATE_MARGIN = datetime.timedelta(hours=48)
+
+# Extensions of the file of a pair whose date is used for the others, like the JPEG of a RAW+JPEG pair
+PRIMARY_EXTENSIONS = (".jpg", ".jpeg")
+
+COPIED = "copied"
+MOVED = "moved"
+SKIPPED = "skipped"
+ERRORED = "errored"
+
+# How a copy is checked before its source may be deleted: a hash of the copy read back, its size only, or not at all
+VERIFY_FULL = "full"
+VERIFY_SIZE = "size"
+VERIFY_NONE = "none"
 
 class Job():
     """Class for jobs of Photos."""
@@ -23,6 +50,11 @@ class Job():
         """Return the result of the job."""
         return self.result is not None
 
+    @property
+    def photos(self):
+        """Photos of the job."""
+        return self._folder.photos
+
     def __str__(self) -> str:
         return f"Job({self._folder}, {self.result})"
 
@@ -30,36 +62,52 @@ class Job():
         return f"Job({self._folder}, {self.result})"
 
 class DeleteJob(Job):
-    """Class for deleting photos."""
-    def __init__(self, folder):
+    """Class for deleting photos.
+        With verified, only photos whose copy passed verification, and so have a checksum, are deleted."""
+    def __init__(self, folder, verified=False):
         super().__init__(folder)
+        self.verified = verified
+        self.unverified_files = []
 
     def execute(self, j, verbose=False):
         """Delete files, returns amount of deleted files"""
         print_message(f'[{j}] - Deleting {len(self._folder.photos)} files')
-        print_progress_bar(0, len(self._folder.photos), prefix = 'Deleting:', suffix = f'Job {j}', length = 56)
         deleted_files = []
         errored_files = []
-        for i, photo in enumerate(self._folder.photos):
-            print_progress_bar(i + 1, len(self._folder.photos), prefix = 'Progress:', suffix = '', length=56)
-            try:
-                os.remove(photo.path)
-                deleted_files.append(photo)
-            except Exception as err:
-                errored_files.append(photo)
-                if verbose:
-                    print(err)
+        with Progress('Deleting:', len(self._folder.photos)) as progress:
+            for photo in self._folder.photos:
+                if self.verified and photo.checksum is None:
+                    self.unverified_files.append(photo)
+                    progress.advance()
+                    continue
+                started = time.perf_counter()
+                try:
+                    os.remove(photo.path)
+                    deleted_files.append(photo)
+                    photo._record(journal.DELETED)
+                    photo._profile(DELETE, started)
+                except Exception as err:
+                    errored_files.append(photo)
+                    if verbose:
+                        log.warning(f"Failed to delete {photo}: {err}", path=photo.path)
+                progress.advance()
 
         print_message(f"Deleted {len(deleted_files)} files")
         if verbose:
-            print_message("Deleted files:")
+            log.debug("Deleted files:")
             for file in deleted_files:
-                print_message(f"{file}")
+                log.debug(f"{file}", path=file.path, status="deleted")
+        if len(self.unverified_files) > 0:
+            print_message(f"Kept {len(self.unverified_files)} files whose copy was not verified")
+            if verbose:
+                for file in self.unverified_files:
+                    log.debug(f"{file}", path=file.path, status="unverified")
         print_message(f"Errored out on {len(errored_files)} files")
         if verbose:
-            print_message("Errored files:")
+            log.debug("Errored files:")
             for file in errored_files:
-                print_message(f"{file}")
+                log.debug(f"{file}", path=file.path, status=ERRORED)
+            log.flush()
         self.result = deleted_files, errored_files
         return self.result
 
@@ -70,57 +118,286 @@ class DeleteJob(Job):
         return f"DeleteJob({self._folder}, {self.result})"
 
 class ImportJob(Job):
-    """Class for copying photos."""
-    def __init__(self, folder, destination, overwrite=False):
+    """Class for copying photos to a destination folder and its mirrors through an AtomicWriter.
+        Jobs sorted from this job share its DestinationIndex, Deduplicator and AtomicWriter."""
+    def __init__(self, folder, destination, overwrite=False, move=False, index=None, deduplicator=None, verify=VERIFY_NONE,
+                 writer=None, mirrors=()):
         super().__init__(folder)
-        try:
-            os.makedirs(destination)
-        except FileExistsError:
-            pass
+        for path in (destination, *mirrors):
+            try:
+                os.makedirs(path)
+            except FileExistsError:
+                pass
         self.destination_folder = destination
+        self.mirror_folders = list(mirrors)
+        self.mirror_statuses = {mirror: {} for mirror in self.mirror_folders}
+        self.mirror_results = {}
         self.overwrite = overwrite
+        self.move = move
+        self.verify = verify
+        self.copy_methods = {}
+        self.moved_files = []
+        self.renamed_files = {}
+        self.resumed_files = []
+        self.duplicates = {}
+        self.uncommitted = set()
+        self.index = DestinationIndex() if index is None else index
+        self.deduplicator = Deduplicator() if deduplicator is None else deduplicator
+        self.writer = AtomicWriter() if writer is None else writer
+        self._device = None
 
     def execute(self, j, verbose=False):
         """Copy files does not overwrtite files, returns amount of copied files"""
+        self.start(j)
+        statuses = []
+        progress = Progress(f'Syncing {os.path.basename(self.destination_folder)}:', len(self._folder.photos), sum(photo.size for photo in self._folder.photos))
+        with progress:
+            for photo in self._folder.photos:
+                statuses.append(self.import_photo(photo, verbose))
+                progress.advance(1, *((photo.size, 0) if statuses[-1] == COPIED else (0, photo.size)))
+        return self.finish(statuses, verbose)
+
+    def start(self, j):
+        """Check the destination folder, find photos copied twice in the job and announce the job."""
         #Input validation
         if not os.path.exists(self.destination_folder):
             raise FileNotFoundError(f"Destination folder {self.destination_folder} does not exist.")
+        if not self.overwrite:
+            started = time.perf_counter()
+            self.duplicates = self.deduplicator.duplicates(self._folder.photos)
+            if Photo.profiler is not None:
+                Photo.profiler.record(CHECKS, None, time.perf_counter() - started, files=0)
 
         print_message(f'[{j}][{os.path.basename(self.destination_folder)}] - Processing {len(self._folder.photos)} files, syncing with {self.destination_folder}')
-        print_progress_bar(0, len(self._folder.photos), prefix = f'Syncing {os.path.basename(self.destination_folder)}:', suffix = f'Job {j}', length = 56)
-        skipped_files = []
-        copied_files = []
-        errored_files = []
-        for i, photo in enumerate(self._folder.photos):
-            print_progress_bar(i + 1, len(self._folder.photos), prefix = 'Progress:', suffix = '', length=56)
-            if os.path.exists(os.path.join(self.destination_folder, os.path.basename(photo.path))) and not self.overwrite:
-                skipped_files.append(photo)
-                continue
+
+    @property
+    def destination_folders(self):
+        """Destination folder followed by the mirror folders."""
+        return [self.destination_folder, *self.mirror_folders]
+
+    @property
+    def device(self):
+        """Device of the destination folder."""
+        if self._device is None:
+            self._device = os.stat(self.destination_folder).st_dev
+        return self._device
+
+    def import_photo(self, photo, verbose=False):
+        """Copy one photo to the destination folder and each mirror it is missing from, reading it once.
+            Returns COPIED, MOVED, SKIPPED or ERRORED for the destination folder, the mirrors are kept in mirror_statuses."""
+        statuses = dict.fromkeys(self.destination_folders)
+        filenames = {}
+        started = time.perf_counter()
+        try:
+            if self._copied_before(photo):
+                self.resumed_files.append(photo)
+                statuses[self.destination_folder] = COPIED
+            for folder in self.destination_folders:
+                if statuses[folder] is not None:
+                    continue
+                if self.overwrite:
+                    filenames[folder] = photo.filename
+                elif photo in self.duplicates or self._find_copy(photo, folder) is not None:
+                    statuses[folder] = SKIPPED
+                else:
+                    filenames[folder] = self.index.reserve(folder, photo.filename, photo.stat.st_size)
+            if not self.overwrite and filenames:
+                photo._profile(CHECKS, started)
+        except OSError as err:
+            if verbose:
+                log.warning(f"Failed to copy {photo}: {err}", path=photo.path)
+            self._release(photo, filenames)
+            return self._status(photo, dict.fromkeys(self.destination_folders, ERRORED))
+        if filenames:
+            statuses.update(self._transfer(photo, filenames, verbose))
+        return self._status(photo, statuses)
+
+    def _find_copy(self, photo, folder):
+        """File of a destination folder with the same content as the photo, None if there is none."""
+        statuses = {os.path.join(folder, name): status for name, status in self.index.files_of_size(folder, photo.stat.st_size).items()}
+        return self.deduplicator.find(photo.path, list(statuses), photo.stat, statuses)
+
+    def _transfer(self, photo, filenames, verbose=False):
+        """Rename or copy a photo to the names reserved for it in each folder, returns the status of each folder."""
+        started = time.perf_counter()
+        destinations = {folder: os.path.join(folder, filename) for folder, filename in filenames.items()}
+        if filenames.get(self.destination_folder, photo.filename) != photo.filename:
+            self.renamed_files[photo.path] = filenames[self.destination_folder]
+        if self.move and not self.mirror_folders and photo.stat.st_dev == self.device:
             try:
-                shutil.copy(photo.path, self.destination_folder)
-                copied_files.append(photo)
-            except shutil.SameFileError:
-                copied_files.append(photo)
-            except shutil.Error as err:
-                errored_files.append(photo)
+                os.replace(photo.path, destinations[self.destination_folder])
+            except OSError as err:
                 if verbose:
-                    print(err)
+                    log.warning(f"Failed to copy {photo}: {err}", path=photo.path)
+                self._release(photo, filenames)
+                return dict.fromkeys(filenames, ERRORED)
+            photo._profile(COPY, started, 0, 0)
+            self.index.add(self.destination_folder, filenames[self.destination_folder], photo.stat.st_size)
+            self._record_copy(photo, destinations[self.destination_folder])
+            photo._record(journal.DELETED)
+            return {self.destination_folder: MOVED}
+        digest = new_digest() if self.verify != VERIFY_NONE else None
+        try:
+            copies = dict(zip(destinations, self.writer.copy_many(photo.path, list(destinations.values()), digest)))
+        except OSError as err:
+            copies = dict.fromkeys(destinations, err)
+        statuses = {}
+        verified = digest is not None
+        for folder, copy in copies.items():
+            if isinstance(copy, shutil.SameFileError):
+                statuses[folder] = COPIED
+                verified = False
+                continue
+            if not isinstance(copy, Exception):
+                method, temporary = copy
+                try:
+                    matches = digest is None or self._verify(photo, temporary, destinations[folder], digest.hexdigest())
+                    copy = None if matches else OSError(errno.EIO, "Copy does not match the source", destinations[folder])
+                except OSError as err:
+                    copy = err
+                if copy is None:
+                    if folder == self.destination_folder:
+                        self.copy_methods[photo.path] = method
+                    statuses[folder] = COPIED
+                    continue
+                self.writer.discard(temporary)
+            self._failed(photo, folder, filenames, copy, verbose)
+            statuses[folder] = ERRORED
+            verified = False
+        if verified:
+            photo.checksum = digest.hexdigest()
+            self.deduplicator.store_full_hash(photo.path, photo.stat, photo.checksum)
+        elif ERRORED in statuses.values():
+            photo.checksum = None
+        for folder in [folder for folder, status in statuses.items() if status == COPIED]:
+            if isinstance(copies[folder], Exception):
+                if folder == self.destination_folder:
+                    self._record_copy(photo, destinations[folder])
+                continue
+            self.index.add(folder, filenames[folder], photo.stat.st_size)
+            try:
+                self.writer.commit(copies[folder][1], destinations[folder],
+                                   functools.partial(self._record_copy, photo, destinations[folder]) if folder == self.destination_folder else None,
+                                   functools.partial(self._commit_failed, photo, folder, filenames, verbose=verbose))
+            except OSError as err:
+                self.writer.discard(copies[folder][1])
+                self._commit_failed(photo, folder, filenames, err, verbose)
+                statuses[folder] = ERRORED
+        copied = [folder for folder, status in statuses.items() if status == COPIED]
+        if copied:
+            photo._profile(COPY, started, photo.size * (2 if verified and self.verify == VERIFY_FULL else 1), photo.size * len(copied))
+        return statuses
+
+    def _failed(self, photo, folder, filenames, err, verbose=False):
+        """Report a photo that could not be copied to a folder and give back the name reserved for it there."""
+        if verbose:
+            log.warning(f"Failed to copy {photo}: {err}", path=photo.path, destination=folder)
+        self._release(photo, {folder: filenames[folder]})
+
+    def _commit_failed(self, photo, folder, filenames, err, verbose=False):
+        """Report a copy the writer failed to put in place, finish counts it as errored
+            when the writer only failed once import_photo returned."""
+        self._failed(photo, folder, filenames, err, verbose)
+        if folder == self.destination_folder:
+            self.copy_methods.pop(photo.path, None)
+        photo.checksum = None
+        self.uncommitted.add((photo, folder))
+
+    def _release(self, photo, filenames):
+        """Give back the names reserved for a photo that was not copied."""
+        if self.overwrite:
+            return
+        for folder, filename in filenames.items():
+            self.index.remove(folder, filename)
+            if folder == self.destination_folder:
+                self.renamed_files.pop(photo.path, None)
+
+    def _status(self, photo, statuses):
+        """Keep the statuses of the mirror folders, returns the status of the destination folder."""
+        for folder in self.mirror_folders:
+            self.mirror_statuses[folder][photo] = statuses[folder]
+        return statuses[self.destination_folder]
+
+    def _record_copy(self, photo, destination):
+        """Record in the journal that a photo is copied to destination, and verified if it has a checksum."""
+        photo._record(journal.COPIED, destination=os.path.abspath(destination))
+        if photo.checksum is not None:
+            photo._record(journal.VERIFIED, checksum=photo.checksum)
+
+    def _verify(self, photo, copy, destination, checksum):
+        """True if the copy has the size of the source and, with VERIFY_FULL, the checksum hashed while copying it read back.
+            The checksum of a verified copy is stored as the full hash of destination."""
+        stat = os.stat(copy)
+        if stat.st_size != photo.stat.st_size:
+            return False
+        if self.verify == VERIFY_FULL and hash_file(copy, new_digest()) != checksum:
+            return False
+        self.deduplicator.store_full_hash(destination, stat, checksum)
+        return True
+
+    def _copied_before(self, photo):
+        """True if the journal replayed with --resume shows the photo copied to this destination folder.
+            The checksum of a copy the journal shows verified is kept."""
+        if Photo.journal is None or not Photo.journal.reached(photo.path, photo.stat, journal.COPIED):
+            return False
+        entry = Photo.journal.state(photo.path, photo.stat)
+        if os.path.dirname(entry.get("destination", "")) != os.path.abspath(self.destination_folder):
+            return False
+        photo.checksum = entry.get("checksum")
+        return True
+
+    def finish(self, statuses, verbose=False):
+        """Put the copies in place, report the statuses of the photos, in the order of the job, and store the result."""
+        self.writer.sync()
+        for folder in self.destination_folders:
+            self.index.mark(folder)
+        statuses = [ERRORED if (photo, self.destination_folder) in self.uncommitted else status for photo, status in zip(self._folder.photos, statuses)]
+        for photo, folder in self.uncommitted:
+            if folder in self.mirror_statuses:
+                self.mirror_statuses[folder][photo] = ERRORED
+        copied_files = [photo for photo, status in zip(self._folder.photos, statuses) if status in (COPIED, MOVED)]
+        self.moved_files = [photo for photo, status in zip(self._folder.photos, statuses) if status == MOVED]
+        errored_files = [photo for photo, status in zip(self._folder.photos, statuses) if status == ERRORED]
+        skipped_files = [photo for photo, status in zip(self._folder.photos, statuses) if status == SKIPPED]
+        renamed_files = [photo for photo in copied_files if photo.path in self.renamed_files]
 
         print_message(f"Copied {len(copied_files)} files to {os.path.basename(self.destination_folder)}")
         if verbose:
-            print_message("Copied files:")
+            log.debug("Copied files:")
             for file in copied_files:
-                print_message(f"{file} -> {self.destination_folder}")
+                log.debug(f"{file} -> {self.destination_folder} ({self.copy_methods.get(file.path, "same file")})",
+                          path=file.path, status=COPIED, destination=self.destination_folder)
+        resumed_files = [photo for photo in self.resumed_files if photo in copied_files]
+        if len(resumed_files) > 0:
+            print_message(f"Resumed {len(resumed_files)} files copied by an earlier run")
+        if len(self.moved_files) > 0:
+            print_message(f"Moved {len(self.moved_files)} files on the same device by renaming")
+        methods = collections.Counter(self.copy_methods.values())
+        if len(methods) > 0:
+            print_message(f"Copied with {", ".join(f"{method} {count}" for method, count in methods.most_common())}")
+        if len(renamed_files) > 0:
+            print_message(f"Renamed {len(renamed_files)} files with a different file of the same name in {os.path.basename(self.destination_folder)}")
+            if verbose:
+                log.debug("Renamed files:")
+                for file in renamed_files:
+                    log.debug(f"{file} -> {self.renamed_files[file.path]}", path=file.path, renamed=self.renamed_files[file.path])
         print_message(f"Skipped {len(skipped_files)} files with duplicates in {os.path.basename(self.destination_folder)}")
         if verbose:
-            print_message("Skipped files:")
+            log.debug("Skipped files:")
             for file in skipped_files:
-                print_message(f"{file} == {self.destination_folder}")
+                log.debug(f"{file} == {self.destination_folder}", path=file.path, status=SKIPPED)
         print_message(f"Errored out on {len(errored_files)} files")
         if verbose:
-            print_message("Errored files:")
+            log.debug("Errored files:")
             for file in errored_files:
-                print_message(f"{file}")
+                log.debug(f"{file}", path=file.path, status=ERRORED)
+            log.flush()
+        for mirror in self.mirror_folders:
+            mirror_statuses = [self.mirror_statuses[mirror].get(photo) for photo in self._folder.photos]
+            self.mirror_results[mirror] = tuple([photo for photo, status in zip(self._folder.photos, mirror_statuses) if status == wanted]
+                                                for wanted in (COPIED, ERRORED, SKIPPED))
+            print_message(f"Mirrored {len(self.mirror_results[mirror][0])} files to {mirror}, skipped {len(self.mirror_results[mirror][2])}, "
+                          f"errored out on {len(self.mirror_results[mirror][1])}")
         self.result = copied_files, errored_files, skipped_files
         return self.result
 
@@ -129,18 +406,22 @@ class ImportJob(Job):
         jobs = dict()
         for photo in self._folder.photos:
             try:
-                year_month = photo.date_taken.strftime('%Y-%m')
+                year_month = photo.sort_date.strftime('%Y-%m')
             except Exception as e:
-                print(f"Faulted on {photo.path} file")
+                log.error(f"Faulted on {photo.path} file", path=photo.path)
+                log.flush()
                 raise e
             if verbose:
-                print(f"Sorting {photo} into {os.path.join(self.destination_folder, year_month)}")
+                log.debug(f"Sorting {photo} into {os.path.join(self.destination_folder, year_month)}", path=photo.path)
             if year_month not in jobs.keys():
                 folder = Folder(self._folder.path)
                 folder.add_photo(photo)
-                jobs[year_month] = ImportJob(folder, os.path.join(self.destination_folder, year_month), self.overwrite)
+                jobs[year_month] = ImportJob(folder, os.path.join(self.destination_folder, year_month), self.overwrite, self.move,
+                                             self.index, self.deduplicator, self.verify, self.writer,
+                                             [os.path.join(mirror, year_month) for mirror in self.mirror_folders])
             else:
                 jobs[year_month].add_photo(photo)
+        log.flush()
         return jobs
 
     def __str__(self):
@@ -164,39 +445,104 @@ class Folder():
     def get_files_with_extension(self, extensions, recurse=False, verbose=False):
         """Get source files from folder and filter by extension.
             If recurse is True, search subfolders for files."""
-        found_photos = []
-        found_files = []
-        for root, dirs, files in os.walk(self.path):
-            found_photos.extend([Photo(os.path.join(root,k)) for k in files if k.upper().endswith(extensions)])
-            found_files.extend([os.path.join(root,k) for k in files if not k.upper().endswith(extensions)])
-            print_message(f"Found {len(files)} files in {root}")
+        def report(root, matched, unmatched, folders):
+            print_message(f"Found {len(matched) + len(unmatched)} files in {root}")
             if verbose:
-                print_message(f"{len(found_photos)} Selected from {root}")
-                print_message(f"{len(dirs)} folders in {root}")
-                for file in found_photos:
-                    print_message(f"{file}")
-                print_message(f"{len(found_files)} Not selected from {root}")
-                for file in (file for file in found_files if file not in found_photos):
-                    print_message(f"{file}")
-            if not recurse:
-                break
+                log.debug(f"{len(matched)} Selected from {root}")
+                log.debug(f"{len(folders)} folders in {root}")
+                for file in matched:
+                    log.debug(f"{file}", path=os.path.join(root, file), selected=True)
+                log.debug(f"{len(unmatched)} Not selected from {root}")
+                for file in unmatched:
+                    log.debug(f"{file}", path=os.path.join(root, file), selected=False)
+        found_photos = list(self.iter_photos(extensions, recurse, report))
         print_message(f"Found {len(found_photos)} {extensions} total in {self.path}.")
         self.photos = found_photos
         return len(found_photos)
 
+    def iter_photos(self, extensions, recurse=False, on_directory=None):
+        """Yield the photos of the folder with one of the extensions a folder at a time, pairs together, see pair_photos.
+            on_directory is called after each folder, see Walker.walk."""
+        found = []
+        ready = collections.deque()
+        def paired(root, matched, unmatched, folders):
+            ready.extend(pair_photos(found))
+            found.clear()
+            if on_directory is not None:
+                on_directory(root, matched, unmatched, folders)
+        entries = Walker(extensions, recurse).walk(self.path, paired)
+        while True:
+            started = time.perf_counter()
+            entry = next(entries, None)
+            if entry is None:
+                ready.extend(pair_photos(found))
+            else:
+                photo = Photo(entry.path, entry)
+                photo._profile(WALK, started)
+                found.append(photo)
+            while ready:
+                photo = ready.popleft()
+                photo._record(journal.DISCOVERED, stat=False)
+                yield photo
+            if entry is None:
+                return
+
+    def extract_dates(self, jobs=1, executor="thread", verbose=False):
+        """Read the date taken of photos not read yet with a pool of workers, from the journal or the cache when they have it.
+            Returns the photos that failed, removed from the folder."""
+        pending = [photo for photo in self.photos if photo._date_taken is None]
+        if len(pending) == 0:
+            return []
+        if Photo.cache is not None or Photo.journal is not None:
+            for photo in pending:
+                photo._date_taken = photo._get_cached_date_taken()
+            cached = len(pending)
+            pending = [photo for photo in pending if photo._date_taken is None]
+            print_message(f"Read dates of {cached - len(pending)} files from the cache.")
+        pool = concurrent.futures.ProcessPoolExecutor if executor == "process" else concurrent.futures.ThreadPoolExecutor
+        with pool(max_workers=jobs) as workers:
+            errored_files = self._read_dates([photo for photo in pending if photo.partner is None], workers, verbose)
+            partners = [photo for photo in pending if photo.partner is not None and not photo._take_partner_date()]
+            errored_files.extend(self._read_dates(partners, workers, verbose))
+        if Photo.cache is not None:
+            Photo.cache.flush()
+        print_message(f"Read dates of {len(pending) - len(errored_files)} files with {jobs} {executor} workers.")
+        if len(errored_files) > 0:
+            print_message(f"Failed to read dates of {len(errored_files)} files")
+            errored = set(errored_files)
+            self.photos = [photo for photo in self.photos if photo not in errored]
+        return errored_files
+
+    def _read_dates(self, photos, workers, verbose=False):
+        """Read the date taken of photos with the workers of a pool, returns the photos that failed."""
+        reader = read_date if Photo.profiler is None else timed_read_date
+        errored_files = []
+        for photo, result in zip(photos, workers.map(reader, [photo.path for photo in photos])):
+            if Photo.profiler is not None:
+                result, seconds = result
+                Photo.profiler.record(DATES, photo.path, seconds, result[1] if isinstance(result, tuple) else 0)
+            if isinstance(result, Exception):
+                errored_files.append(photo)
+                if verbose:
+                    log.warning(f"Failed to read date of {photo}: {result}", path=photo.path)
+                continue
+            date_taken, bytes_read, photo.tags = result
+            photo._date_taken = date_taken if date_taken is not None else photo._fallback_date_taken()
+            photo.bytes_read += bytes_read
+            photo._cache_date_taken(photo._date_taken)
+        return errored_files
+
     def filter_by_date(self, start, end, verbose = False):
         """Filter files by date modified."""
         filtered_files = []
         for photo in self.photos:
-            if photo.date_taken >= start and photo.date_taken <= end:
+            if photo.sort_date >= start and photo.sort_date <= end:
                 filtered_files.append(photo)
-            else:
-                print(verbose)
-                if verbose:
-                    print_message(f"Not selected {photo}")
+            elif verbose:
+                log.debug(f"Not selected {photo}", path=photo.path, selected=False)
         if verbose:
             for photo in filtered_files:
-                print_message(f"Selected {photo}")
+                log.debug(f"Selected {photo}", path=photo.path, selected=True)
         print_message(f"Selected {len(filtered_files)} files in date range.")
         if len(filtered_files) == 0:
             return filtered_files
@@ -210,37 +556,202 @@ class Folder():
         return f"Folder({self.path}, {len(self.photos)} photos)"
 
 class Photo():
-    """Class for photos."""
-    def __init__(self, path):
-        if not os.path.exists(path):
-            raise FileNotFoundError(f"File {path} does not exist.")
+    """Class for photos, the date taken is read on first access and then kept.
+        Photo.cache, Photo.journal and Photo.profiler are used by every photo when they are set."""
+    __slots__ = ('path', 'filename', 'bytes_read', 'tags', 'pair', 'checksum', '_entry', '_stat', '_date_taken', '_undated')
+    cache = None
+    journal = None
+    profiler = None
+
+    def __init__(self, path, entry=None):
         self.path = path
         self.filename = os.path.basename(path)
-        self.date_taken = self._get_date_taken()
+        self.bytes_read = 0
+        self.tags = {}
+        self.pair = None
+        self.checksum = None
+        self._entry = entry
+        self._stat = None
+        self._date_taken = None
+        self._undated = False
+
+    @property
+    def date_taken(self):
+        """Date taken, read from the file the first time it is needed."""
+        if self._date_taken is None:
+            self._date_taken = self._get_date_taken()
+        return self._date_taken
+
+    @property
+    def partner(self):
+        """First photo of the pair the photo is in, None if it is not paired or is the first."""
+        if self.pair is None or self.pair[0] is self:
+            return None
+        return self.pair[0]
+
+    @property
+    def sort_date(self):
+        """Date the photo is sorted and filtered by, the date taken of its partner so a pair is never split."""
+        partner = self.partner
+        if partner is not None and partner._date_taken is not None:
+            return partner._date_taken
+        return self.date_taken
+
+    @property
+    def size(self):
+        """Size of the file in bytes, 0 if it can not be read."""
+        try:
+            return self.stat.st_size
+        except OSError:
+            return 0
+
+    @property
+    def stat(self):
+        """Status of the file, read the first time it is needed.
+            Taken from the directory entry the photo was found with, free on Windows."""
+        if self._stat is None:
+            self._stat = self._entry.stat() if self._entry is not None else os.stat(self.path)
+            self._entry = None
+        return self._stat
+
+    @property
+    def modified(self):
+        """Modified time of the file."""
+        return datetime.datetime.fromtimestamp(self.stat.st_mtime)
+
+    def modified_within(self, start, end, margin=DATE_MARGIN):
+        """False only if the file was modified more than margin before start or after end, True if it can not be read."""
+        try:
+            return start - margin <= self.modified <= end + margin
+        except (OSError, OverflowError, ValueError):
+            return True
+
+    def resolve_date_taken(self, pool=None):
+        """Date taken from the journal, the cache, the partner of the photo or the file, read in pool when given.
+            Raises the error of a file whose date can not be read."""
+        if self._date_taken is None:
+            self._date_taken = self._get_cached_date_taken()
+        if self._date_taken is None and not self._take_partner_date():
+            started = time.perf_counter()
+            result = pool.submit(read_date, self.path).result() if pool is not None else read_date(self.path)
+            self._profile(DATES, started, result[1] if isinstance(result, tuple) else 0)
+            if isinstance(result, Exception):
+                raise result
+            date_taken, bytes_read, self.tags = result
+            self._date_taken = date_taken if date_taken is not None else self._fallback_date_taken()
+            self.bytes_read += bytes_read
+            self._cache_date_taken(self._date_taken)
+        return self._date_taken
+
+    def _take_partner_date(self):
+        """Take the date taken and tags of the partner once its date was read, True if the partner had a date of its own."""
+        partner = self.partner
+        if partner is None or partner._date_taken is None or partner._undated:
+            return False
+        self._date_taken = partner._date_taken
+        self.tags = dict(partner.tags)
+        self._cache_date_taken(self._date_taken)
+        return True
 
     def _get_date_taken(self):
-        """Get date taken from EXIF data or file modified date if not available."""
-        date_taken = None
+        """Get date taken from the metadata cache, or from the file if it is not cached."""
+        date_taken = self._get_cached_date_taken()
+        if date_taken is None:
+            date_taken = self._read_date_taken()
+            self._cache_date_taken(date_taken)
+        return date_taken
+
+    def _get_cached_date_taken(self):
+        """Get date taken from the replayed journal or the metadata cache, None if it is not in either."""
         try:
-            exif = Image.open(self.path).getexif()
-            print(exif)
-            if not exif:
-                raise UnidentifiedImageError(f'Image {self.path} does not have EXIF data.')
-            #text = exif[36867]
-            text = exif[306]
-            date_taken = text.replace(":", "-", 2).replace(" ", ":", 1)
-            return datetime.datetime.fromisoformat(date_taken)
-        except UnidentifiedImageError:
-            alternatives = [".JPG", ".JPEG"]
-            for alt in alternatives:
-                file, extension = os.path.splitext(self.path)
-                new_path = file + alt
-                if os.path.exists(new_path) and not new_path == file + extension.upper():
-                    return Photo(new_path).date_taken
-            return datetime.datetime.fromtimestamp(os.path.getmtime(self.path))
+            entry = Photo.journal.state(self.path, self.stat) if Photo.journal is not None else None
+            if entry is not None and "date_taken" in entry:
+                self.tags = entry.get("tags", {})
+                return datetime.datetime.fromisoformat(entry["date_taken"])
+            cached = Photo.cache.get(self.path, self.stat) if Photo.cache is not None else None
+        except OSError:
+            return None
+        if cached is None:
+            return None
+        date_taken, self.tags = cached
+        self._record(journal.DATED, date_taken=date_taken.isoformat(), tags=self.tags)
+        return date_taken
+
+    def _cache_date_taken(self, date_taken):
+        """Store the date taken in the metadata cache and the journal."""
+        if Photo.cache is not None:
+            Photo.cache.put(self.path, self.stat, date_taken, self.tags)
+        self._record(journal.DATED, date_taken=date_taken.isoformat(), tags=self.tags)
+
+    def _record(self, state, stat=True, **fields):
+        """Record a state of the photo in the journal, with the size and modified time of the file if stat."""
+        if Photo.journal is None:
+            return
+        try:
+            stat = self.stat if stat else None
+        except OSError:
+            stat = None
+        Photo.journal.record(state, self.path, stat, **fields)
+
+    def _profile(self, stage, started, read=0, written=0):
+        """Record the time since started of a stage of the photo in the profiler."""
+        if Photo.profiler is not None:
+            Photo.profiler.record(stage, self.path, time.perf_counter() - started, read, written)
+
+    def _read_date_taken(self, fallback=True):
+        """Get date taken from EXIF data, or if not available the fallback date, None without fallback."""
+        metadata = read_metadata(self.path)
+        self.bytes_read += metadata.bytes_read
+        self.tags = metadata.tags
+        if metadata.date_taken is not None or not fallback:
+            return metadata.date_taken
+        return self._fallback_date_taken()
+
+    def _fallback_date_taken(self):
+        """Date taken of the partner of the photo, read once for the pair, or the file modified date.
+            The photo is marked as having no date of its own."""
+        self._undated = True
+        partner = self.partner
+        if partner is not None:
+            try:
+                return partner.date_taken
+            except Exception:
+                pass
+        return datetime.datetime.fromtimestamp(os.path.getmtime(self.path))
 
     def __str__(self):
         return f"{self.filename}"
 
     def __repr__(self):
         return f"Photo({self.filename}, {self.date_taken}, {self.path})"
+
+def read_date(path):
+    """Read the date taken of a file in a worker thread or process, returns errors instead of raising them.
+        The date is None for a file without one, the caller knows its pair and falls back."""
+    try:
+        photo = Photo(path)
+        return photo._read_date_taken(False), photo.bytes_read, photo.tags
+    except Exception as err:
+        return err
+
+def pair_photos(photos):
+    """Pair photos in the same folder with the same name, setting the pair of each, returns them in pairs.
+        The pair is led by its JPEG, whose date the others take when they have none, and keeps its first place."""
+    groups = {}
+    for photo in photos:
+        directory, filename = os.path.split(photo.path)
+        groups.setdefault((os.path.normcase(directory), os.path.splitext(filename)[0].lower()), []).append(photo)
+    paired = []
+    for group in groups.values():
+        if len(group) > 1:
+            group.sort(key=lambda photo: os.path.splitext(photo.filename)[1].lower() not in PRIMARY_EXTENSIONS)
+            for photo in group:
+                photo.pair = group
+        paired.extend(group)
+    return paired
+
+def timed_read_date(path):
+    """read_date with the seconds it took, for the profiler."""
+    started = time.perf_counter()
+    result = read_date(path)
+    return result, time.perf_counter() - started
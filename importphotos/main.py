@@ -5,10 +5,20 @@ import datetime
 import os
 
 from importphotos.args import ArgumentParser
+from importphotos.cache import MetadataCache
 from importphotos.config import Config
-from importphotos.helpers.cli import print_banner, print_dict, print_header, print_message, print_done, input_custom, input_date, input_yes_no
-from importphotos.lib import Folder, ImportJob, DeleteJob
+from importphotos.dedup import Deduplicator, HashIndex
+from importphotos.helpers import log
+from importphotos.helpers.cli import print_banner, print_header, print_message, print_done, input_custom, input_date, input_yes_no
+from importphotos.index import DestinationIndex
+from importphotos.journal import Journal
+from importphotos.lib import Folder, DeleteJob, Photo, VERIFY_NONE
+from importphotos.pipeline import ImportPipeline
+from importphotos.profiler import Profiler
+from importphotos.scheduler import CopyScheduler
+from importphotos.transfer import AtomicWriter
 from importphotos.validators import FileValidator
+from importphotos.watch import MountWatcher, card_folder
 
 #TODO: Change all uses of "Photo" to "Image" to be more generic, do this for the classes as well
 def main():
@@ -41,38 +51,47 @@ def main():
         input("# Press Enter to exit...")
         exit(1)
 
-    source_dir = args.path is not None if args.path else config.source_dir
-    destination_dir = args.destination is not None if args.destination else config.destination_dir
-    file_extensions = args.extension is not None if args.extension else config.file_types
+    source_dirs = args.path if args.path else config.source_dirs
+    destination_dirs = args.destination if args.destination else config.destination_dirs
+    file_extensions = args.extension if args.extension else config.file_types
+    workers = args.jobs if args.jobs else config.concurrency
+    log_file = args.log_file if args.log_file else config.log_file
+    detail = args.verbose or bool(log_file)
+    if log_file:
+        log.configure(log.INFO if args.verbose else log.ERROR, os.path.expanduser(log_file))
+        print_message(f"Logging detail of each file to {log_file}")
+    deduplicator = Deduplicator()
+    Photo.journal = Journal(os.path.expanduser(config.journal_file), args.resume)
+    if args.profile:
+        Photo.profiler = Profiler()
+    if args.resume:
+        print_message(f"Resuming from {config.journal_file} with {len(Photo.journal.entries)} files")
+    if not args.no_cache:
+        Photo.cache = MetadataCache(os.path.expanduser(config.cache_file), config.cache_limit, config.cache_max_age, args.rebuild_cache)
+        deduplicator = Deduplicator(HashIndex(os.path.expanduser(config.cache_file), args.rebuild_cache))
     
+    #Watch mode imports every card without asking
+    if args.watch is not None:
+        args.interactive = False
+
     #Interactive Mode for missing arguments
     if args.interactive and not args.path:
-        print_message(f"Please provide a source directory. Press Enter to use currently selected. {source_dir}")
+        print_message(f"Please provide a source directory. Press Enter to use currently selected. {", ".join(source_dirs)}")
         tmp = input_custom('Enter the source directory: ', FileValidator.file_path, 'Please enter a valid directory path')
-        source_dir = tmp if tmp else source_dir
+        source_dirs = [tmp] if tmp else source_dirs
     if args.interactive and not args.destination:
-        print_message(f"Please provide a destination directory. Press Enter to use currently selected. {destination_dir}")
+        print_message(f"Please provide a destination directory. Press Enter to use currently selected. {", ".join(destination_dirs)}")
         tmp = input_custom('Enter the destination directory: ', FileValidator.file_path, 'Please enter a valid directory path')
-        destination_dir = tmp if tmp else destination_dir
+        destination_dirs = [tmp] if tmp else destination_dirs
     if args.interactive and not args.extension:
         print_message(f"Please provide a file type. Press Enter to use currently selected. {file_extensions}")
         tmp = input_custom('Enter the file types: ', FileValidator.file_extension, 'Please enter a valid file extension')
         file_extensions = tmp if tmp else file_extensions
 
-    #Search for files
-    print_header('Searching for Photos',2)
-    source_photos = Folder(source_dir)
+    #Interactive Mode for import options, asked before photos are streamed
     if not args.recursive and args.interactive:
-        print_message(f"Do you want to search for photos in subfolders of {source_dir}? (Y/N)")
+        print_message(f"Do you want to search for photos in subfolders of {", ".join(source_dirs)}? (Y/N)")
         args.recursive = input_yes_no("Enter Y/N: ")
-    print_message(f"Searching for photos in {source_dir}{" and subfolders" if args.recursive else ""} with extensions {file_extensions}")
-    found_photos = source_photos.get_files_with_extension(file_extensions, args.recursive, args.verbose)
-    if found_photos == 0:
-        print_message(f"No photos found in {source_dir}{" and subfolders" if args.recursive else ""}. Exiting.")
-        input("# Press Enter to exit...")
-        exit()
-    
-    #Filter by date
     if args.date_search is None and args.interactive:
         print_message("Please provide a date range to filter for. Press Enter to skip.")
         start = input_date("Enter Start Date (YYYY-MM-DD:HH:mm:ss): ")
@@ -83,17 +102,6 @@ def main():
                 args.date_search = (start, end)
             else:
                 args.date_search = (start, datetime.datetime.now())
-    if args.date_search is not None:
-        print_message(f"Filtering photos by date taken between {args.date_search[0]} and {args.date_search[1]}")
-        selected_photos=source_photos.filter_by_date(args.date_search[0], args.date_search[1], args.verbose)
-        if len(selected_photos) == 0:
-            print_message("No photos found in date range. Exiting.")
-            input("# Press Enter to exit...")
-            exit()
-    
-    #Create Jobs
-    if ((not args.overwrite or not args.foldername) and args.interactive) or args.verbose:
-        print_header('Creating Jobs from selected photos')
     if not args.overwrite and args.interactive:
         print_message("Do you want to overwrite existing photos in the destination folder? (Y/N)")
         args.overwrite = input_yes_no("Enter Y/N: ")
@@ -102,37 +110,93 @@ def main():
         tmp = input("Enter folder name: ")
         if tmp:
             args.foldername = tmp
-    jobs = dict()
+    if not args.move and args.interactive:
+        print_message("Do you want to delete the source photos once they are copied? (Y/N)")
+        args.move = input_yes_no("Enter Y/N: ")
 
-    if args.foldername:
-        if args.verbose:
-            print_message(f"Copying {len(source_photos.photos)} selected photos to {os.path.join(destination_dir, args.foldername)}")
-        jobs[args.foldername] = ImportJob(source_photos.photos, os.path.join(destination_dir, args.foldername), args.overwrite)
-    else:
-        jobs = ImportJob(source_photos, destination_dir, args.overwrite).sort_files_by_date(args.verbose)
+    #Import photos as they are found, the caches and the journal are closed however the import ends
+    found = True
+    try:
+        if args.watch is not None:
+            watch(args, config, destination_dirs, file_extensions, workers, deduplicator, detail)
+        else:
+            found = import_photos(args, config, source_dirs, destination_dirs, file_extensions, workers, deduplicator, detail) is not None
+    finally:
+        if Photo.cache is not None:
+            if args.verbose:
+                print_message(Photo.cache)
+            Photo.cache.close()
         if args.verbose:
-            print_message(f"Copying {len(source_photos.photos)} selected photos to {destination_dir} sorted by year-month")
-            print_dict(jobs)
-    print_header(f'Executing {len(jobs)} Import Job{"" if len(jobs) == 1 else "s"}',2)
+            print_message(deduplicator)
+        deduplicator.close()
+        Photo.journal.close()
+        log.close()
+    if not found:
+        print_message("Exiting.")
+        input("# Press Enter to exit...")
+        exit()
+    if Photo.profiler is not None:
+        print_header("Profile", 2)
+        Photo.profiler.print()
+        Photo.profiler.write(args.profile)
+        print_message(f"Wrote profile to {args.profile}")
+    print_done()
+    if args.watch is not None:
+        return
+    try:
+        input("# Press enter to exit...")
+    except EOFError:
+        pass
+
+def import_photos(args, config, source_dirs, destination_dirs, file_extensions, workers, deduplicator, detail, index=None):
+    """Import the photos of the source folders, delete them with --move and print the results.
+        Returns the pipeline, None if no photos were found."""
+    print_header('Importing Photos',2)
+    print_message(f"Searching for photos in {", ".join(source_dirs)}{" and subfolders" if args.recursive else ""} with extensions {file_extensions}")
+    if args.date_search is not None:
+        print_message(f"Filtering photos by date taken between {args.date_search[0]} and {args.date_search[1]}")
+    destination_dir, mirrors = destination_dirs[0], list(destination_dirs[1:])
+    print_message(f"Copying photos to {os.path.join(destination_dir, args.foldername) if args.foldername else f"{destination_dir} sorted by year-month"}")
+    if mirrors:
+        print_message(f"Copying every photo to {", ".join(mirrors)} as well")
+    #Copies are verified when the sources may be deleted afterwards
+    verify = (args.verify if args.verify else config.verify) if args.move else VERIFY_NONE
+    scheduler = CopyScheduler(args.copy_jobs if args.copy_jobs else config.copy_concurrency,
+                              config.source_concurrency, config.destination_concurrency)
+    pipeline = ImportPipeline([Folder(source_dir) for source_dir in source_dirs], destination_dir, scheduler, file_extensions, args.recursive, args.date_search,
+                              args.foldername, args.overwrite, args.move, deduplicator, workers, config.executor,
+                              date_margin=None if args.strict_dates or not config.date_margin else datetime.timedelta(hours=config.date_margin), verify=verify,
+                              writer=AtomicWriter(config.fsync, resumable_size=config.resumable_size * 1000000), mirrors=mirrors, index=index)
+    results = pipeline.run(detail)
+    if pipeline.found == 0:
+        print_message(f"No photos found in {", ".join(source_dirs)}{" and subfolders" if args.recursive else ""}.")
+        return None
+    if len(pipeline.jobs) == 0 and args.date_search is not None:
+        print_message("No photos found in date range.")
+        return None
+    jobs = pipeline.jobs
     import_results = [], [], []
-    for i, job in enumerate(jobs.values()):
-        job_result = job.execute(i+1, args.verbose)
+    for job_result in results:
         import_results[0].extend(job_result[0])
         import_results[1].extend(job_result[1])
         import_results[2].extend(job_result[2])
 
     #Delete Job
-    if not args.move and args.interactive:
-        args.move = input_yes_no(f"Do you want to delete the source photos ({len(import_results[0])})? (Y/N)")
     if args.move:
-        delete_results = [],[]
-        if len(import_results[0]) > 0:
-            copied_folder = Folder(source_dir)
+        moved_files = set(photo for job in jobs.values() for photo in job.moved_files)
+        delete_results = [photo for photo in import_results[0] if photo in moved_files], []
+        unverified_files = []
+        if len(import_results[0]) > len(moved_files):
+            copied_folder = Folder(source_dirs[0])
             print_header('Deleting Photos',2)
             for photo in import_results[0]:
-                copied_folder.add_photo(photo)
-            delete_job = DeleteJob(copied_folder)
-            delete_results = delete_job.execute(0, args.verbose)
+                if photo not in moved_files:
+                    copied_folder.add_photo(photo)
+            delete_job = DeleteJob(copied_folder, verify != VERIFY_NONE)
+            delete_job_results = delete_job.execute(0, detail)
+            delete_results[0].extend(delete_job_results[0])
+            delete_results[1].extend(delete_job_results[1])
+            unverified_files = delete_job.unverified_files
 
     print_header("Results", 2)
     print_header("Import Results")
@@ -145,6 +209,10 @@ def main():
     print_message(f"Skipped {len(import_results[2])} photos")
     if args.verbose and len(import_results[2]) > 0:
         print_message(import_results[2])
+    for i, mirror in enumerate(mirrors):
+        mirror_results = [job.mirror_results[job.mirror_folders[i]] for job in jobs.values()]
+        print_message(f"Copied {sum(len(result[0]) for result in mirror_results)} photos to {mirror}, "
+                      f"failed {sum(len(result[1]) for result in mirror_results)}, skipped {sum(len(result[2]) for result in mirror_results)}")
     if args.move:
         print_header("Delete Results")
         if (len(delete_results[0]) <= 0 and len(delete_results[1]) <= 0):
@@ -156,8 +224,39 @@ def main():
             print_message(f"Failed to delete {len(delete_results[1])} photos")
             if args.verbose and len(delete_results[1]) > 0:
                 print_message(delete_results[1])
-    print_done()
+            if len(unverified_files) > 0:
+                print_message(f"Kept {len(unverified_files)} photos whose copy was not verified")
+    if args.verbose:
+        print_message(pipeline.writer)
+    return pipeline
+
+def watch(args, config, destination_dirs, file_extensions, workers, deduplicator, detail):
+    """Import each card mounted in the mount roots without asking anything, until interrupted.
+        The metadata cache, the hash index and the destination index stay open between cards."""
+    #Cameras keep photos in numbered subfolders of DCIM
+    args.recursive = True
+    watcher = MountWatcher(args.watch if args.watch else config.watch_dirs, file_extensions, config.watch_interval, config.watch_settle)
+    index = DestinationIndex()
+    print_header('Watching for cards',2)
+    where = ", ".join(watcher.roots) if watcher.roots else "new drives"
+    print_message(f"Waiting for cards in {where} "
+                  f"{"with inotify" if watcher.inotify is not None else f"checking every {watcher.interval} seconds"}, press Ctrl+C to stop")
     try:
-        input("# Press enter to exit...")
-    except EOFError:
-        pass
+        for volume in watcher:
+            print_message(f"Found {volume}")
+            index.refresh()
+            deduplicator.forget_seen()
+            try:
+                import_photos(args, config, [card_folder(volume)], destination_dirs, file_extensions, workers, deduplicator, detail, index)
+            except Exception as exc:
+                print_message(f"Failed to import {volume}: {exc}")
+            if Photo.cache is not None:
+                Photo.cache.flush()
+            if deduplicator.hashes is not None:
+                deduplicator.hashes.flush()
+            Photo.journal.sync()
+            print_message(f"Waiting for the next card in {where}")
+    except KeyboardInterrupt:
+        print_message("Stopped watching for cards")
+    finally:
+        watcher.close()
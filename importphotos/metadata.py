@@ -0,0 +1,211 @@
+"""Header-only metadata readers for photo files."""
+import collections
+import datetime
+import os
+import struct
+
+from PIL import Image, UnidentifiedImageError
+
+BLOCK_SIZE = 4096
+MAX_HEADER_BYTES = 64 * 1024
+
+MAKE = 0x010F
+MODEL = 0x0110
+DATE_TIME = 0x0132
+EXIF_IFD = 0x8769
+DATE_TIME_ORIGINAL = 0x9003
+
+TAG_NAMES = {MAKE: 'Make', MODEL: 'Model', DATE_TIME: 'DateTime', DATE_TIME_ORIGINAL: 'DateTimeOriginal'}
+
+# ISO base media (MP4, MOV) top level boxes a file can start with, and brands of still images left to PIL
+BOX_TYPES = (b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot')
+IMAGE_BRANDS = (b'heic', b'heix', b'mif1', b'msf1', b'avif')
+MAX_BOXES = 256
+MP4_EPOCH = datetime.datetime(1904, 1, 1, tzinfo=datetime.timezone.utc)
+
+Metadata = collections.namedtuple('Metadata', ['date_taken', 'tags', 'bytes_read'])
+
+class HeaderReader():
+    """Reads byte ranges from the start of a file in whole blocks, counting the bytes read."""
+    def __init__(self, file, limit=MAX_HEADER_BYTES):
+        self._file = file
+        self._blocks = {}
+        self.limit = limit
+        self.bytes_read = 0
+
+    def read(self, offset, size):
+        """Return size bytes at offset, raises ValueError past the limit or the end of the file."""
+        if offset < 0 or offset + size > self.limit:
+            raise ValueError(f"Offset {offset} is outside the first {self.limit} bytes.")
+        first = offset // BLOCK_SIZE
+        last = (offset + size - 1) // BLOCK_SIZE
+        data = b"".join(self._block(block) for block in range(first, last + 1))
+        start = offset - first * BLOCK_SIZE
+        data = data[start:start + size]
+        if len(data) < size:
+            raise ValueError(f"File ends before offset {offset + size}.")
+        return data
+
+    def _block(self, block):
+        """Read a block from the file once."""
+        if block not in self._blocks:
+            self._file.seek(block * BLOCK_SIZE)
+            self._blocks[block] = self._file.read(BLOCK_SIZE)
+            self.bytes_read += len(self._blocks[block])
+        return self._blocks[block]
+
+class CountingFile():
+    """File wrapper counting the bytes read, used to measure the PIL fallback."""
+    def __init__(self, file):
+        self._file = file
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        """Read from the file."""
+        data = self._file.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def seek(self, offset, whence=0):
+        """Seek in the file."""
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        """Position in the file."""
+        return self._file.tell()
+
+def read_metadata(path, limit=MAX_HEADER_BYTES):
+    """Read the date taken and key tags of a file.
+        JPEG, TIFF based and MP4 or MOV files are parsed from their headers, other formats are opened with PIL."""
+    with open(path, 'rb', buffering=0) as file:
+        reader = HeaderReader(file, limit)
+        try:
+            signature = reader.read(0, 4)
+        except ValueError:
+            return Metadata(None, {}, reader.bytes_read)
+        if signature[:2] == b'\xff\xd8':
+            parser = _parse_jpeg
+        elif signature in (b'II*\x00', b'MM\x00*'):
+            parser = _parse_tiff
+        elif _is_movie(reader):
+            return _read_movie(file, reader.bytes_read)
+        else:
+            return _read_with_pil(file)
+        try:
+            tags = parser(reader)
+        except (ValueError, struct.error):
+            tags = {}
+        return Metadata(_date_from_tags(tags), tags, reader.bytes_read)
+
+def _parse_jpeg(reader):
+    """Find the EXIF APP1 segment of a JPEG and parse its TIFF header."""
+    offset = 2
+    while True:
+        marker, length = struct.unpack('>2sH', reader.read(offset, 4))
+        if marker[0] != 0xFF or marker[1] in (0xD9, 0xDA):
+            return {}
+        if marker[1] == 0xE1 and reader.read(offset + 4, 6) == b'Exif\x00\x00':
+            return _parse_tiff(reader, offset + 10)
+        offset += 2 + length
+
+def _parse_tiff(reader, base=0):
+    """Parse IFD0 and the EXIF IFD of a TIFF header starting at base."""
+    byte_order = '<' if reader.read(base, 2) == b'II' else '>'
+    magic, ifd_offset = struct.unpack(f'{byte_order}HI', reader.read(base + 2, 6))
+    if magic != 42:
+        raise ValueError(f"Unknown TIFF magic {magic}.")
+    tags = {}
+    exif_offset = _parse_ifd(reader, base, ifd_offset, byte_order, tags)
+    if exif_offset:
+        _parse_ifd(reader, base, exif_offset, byte_order, tags)
+    return tags
+
+def _parse_ifd(reader, base, ifd_offset, byte_order, tags):
+    """Read the ASCII tags we know from an IFD, returns the EXIF IFD offset if present."""
+    exif_offset = None
+    count = struct.unpack(f'{byte_order}H', reader.read(base + ifd_offset, 2))[0]
+    entries = reader.read(base + ifd_offset + 2, count * 12)
+    for i in range(count):
+        tag, kind, length, value = struct.unpack(f'{byte_order}HHI4s', entries[i * 12:i * 12 + 12])
+        if tag == EXIF_IFD:
+            exif_offset = struct.unpack(f'{byte_order}I', value)[0]
+        elif tag in TAG_NAMES and kind == 2:
+            if length > 4:
+                value = reader.read(base + struct.unpack(f'{byte_order}I', value)[0], length)
+            tags[TAG_NAMES[tag]] = value[:length].split(b'\x00', 1)[0].decode('ascii', 'replace').strip()
+    return exif_offset
+
+def _is_movie(reader):
+    """True for ISO base media files other than still images."""
+    try:
+        kind = reader.read(4, 4)
+        return kind in BOX_TYPES and not (kind == b'ftyp' and reader.read(8, 4) in IMAGE_BRANDS)
+    except ValueError:
+        return False
+
+def _read_movie(file, bytes_read=0):
+    """Read the creation time of the moov/mvhd box, seeking from box header to box header.
+        Only the headers are read, wherever the moov box is, so a few KB even for large clips."""
+    counting_file = CountingFile(file)
+    tags = {}
+    try:
+        moov = _find_box(counting_file, 0, os.fstat(file.fileno()).st_size, b'moov')
+        mvhd = _find_box(counting_file, *moov, b'mvhd') if moov is not None else None
+        if mvhd is not None:
+            counting_file.seek(mvhd[0])
+            version = counting_file.read(4)[0]
+            if version == 1:
+                seconds = struct.unpack('>Q', counting_file.read(8))[0]
+            else:
+                seconds = struct.unpack('>I', counting_file.read(4))[0]
+            if seconds > 0:
+                created = (MP4_EPOCH + datetime.timedelta(seconds=seconds)).astimezone().replace(tzinfo=None)
+                tags['CreateDate'] = created.strftime('%Y:%m:%d %H:%M:%S')
+    except (struct.error, IndexError, OverflowError, ValueError):
+        tags = {}
+    return Metadata(_date_from_tags(tags), tags, bytes_read + counting_file.bytes_read)
+
+def _find_box(file, start, end, kind):
+    """(start, end) of the contents of the first box of kind between start and end, None if there is none."""
+    offset = start
+    for _ in range(MAX_BOXES):
+        if offset + 8 > end:
+            return None
+        file.seek(offset)
+        size, box = struct.unpack('>I4s', file.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', file.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return None
+        if box == kind:
+            return offset + header, min(offset + size, end)
+        offset += size
+    return None
+
+def _read_with_pil(file):
+    """Read EXIF with PIL for formats without a header parser."""
+    file.seek(0)
+    counting_file = CountingFile(file)
+    tags = {}
+    try:
+        with Image.open(counting_file) as image:
+            exif = image.getexif()
+            for tag, value in list(exif.items()) + list(exif.get_ifd(EXIF_IFD).items()):
+                if tag in TAG_NAMES and isinstance(value, str):
+                    tags[TAG_NAMES[tag]] = value.split('\x00', 1)[0].strip()
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+        pass
+    return Metadata(_date_from_tags(tags), tags, counting_file.bytes_read)
+
+def _date_from_tags(tags):
+    """Date taken from DateTimeOriginal, or DateTime or the CreateDate of a movie if it is not set."""
+    for name in ('DateTimeOriginal', 'DateTime', 'CreateDate'):
+        try:
+            return datetime.datetime.strptime(tags[name], '%Y:%m:%d %H:%M:%S')
+        except (KeyError, ValueError):
+            continue
+    return None
@@ -0,0 +1,243 @@
+"""Streaming import running the scan, date, route and copy stages at the same time."""
+import concurrent.futures
+import os
+import queue
+import threading
+import time
+
+from importphotos.helpers import log
+from importphotos.helpers.cli import print_message
+from importphotos.helpers.progress import Progress
+from importphotos.index import DestinationIndex
+from importphotos.lib import Folder, ImportJob, ERRORED, SKIPPED, VERIFY_NONE
+
+QUEUE_SIZE = 256
+
+_DONE = object()
+
+class Stage():
+    """Bounded queue into a stage of the pipeline.
+        Counts how often and how long the stage before it waited for room, which shows backpressure."""
+    def __init__(self, name, size=QUEUE_SIZE):
+        self.name = name
+        self.items = 0
+        self.waits = 0
+        self.waited = 0.0
+        self._queue = queue.Queue(size)
+        self._lock = threading.Lock()
+
+    def put(self, item, count=1):
+        """Hand an item of count photos to the stage, waiting while its queue is full."""
+        waited = None
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            started = time.perf_counter()
+            self._queue.put(item)
+            waited = time.perf_counter() - started
+        with self._lock:
+            self.items += count if item is not _DONE else 0
+            if waited is not None:
+                self.waits += 1
+                self.waited += waited
+
+    def get(self):
+        """Next item of the stage, waiting while its queue is empty."""
+        return self._queue.get()
+
+    def __str__(self):
+        return f"{self.name}: {self.items} photos, queue full {self.waits} times for {self.waited:.1f} seconds"
+
+    def __repr__(self):
+        return f"Stage({self.name}, {self._queue.maxsize}, {self.items}, {self.waits}, {self.waited})"
+
+class ImportPipeline():
+    """Imports the photos of one or more folders while they are still being found.
+        The scan, date, routing and copy stages of each folder run at the same time, joined by bounded queues."""
+    def __init__(self, folders, destination, scheduler, extensions, recurse=False, date_range=None, foldername=None,
+                 overwrite=False, move=False, deduplicator=None, workers=4, executor="thread", queue_size=QUEUE_SIZE,
+                 date_margin=None, verify=VERIFY_NONE, writer=None, mirrors=(), index=None):
+        self.folders = list(folders) if isinstance(folders, (list, tuple)) else [folders]
+        self.folder = self.folders[0]
+        self.destination = destination
+        self.scheduler = scheduler
+        self.extensions = extensions
+        self.recurse = recurse
+        self.date_range = date_range
+        self.foldername = foldername
+        self.overwrite = overwrite
+        self.move = move
+        self.deduplicator = deduplicator
+        self.workers = workers
+        self.executor = executor
+        self.date_margin = date_margin
+        self.verify = verify
+        self.writer = writer
+        self.mirrors = list(mirrors)
+        self.jobs = {}
+        self.found_in = [0] * len(self.folders)
+        self.pruned = 0
+        self.filtered = 0
+        self.errored_dates = []
+        self.dates = [Stage(self._stage_name("Dates", i), queue_size) for i in range(len(self.folders))]
+        self.routing = Stage("Routing", queue_size)
+        self.copying = [Stage(self._stage_name("Copying", i), queue_size) for i in range(len(self.folders))]
+        self.stages = (*self.dates, self.routing, *self.copying)
+        self.index = index if index is not None else DestinationIndex()
+        self._statuses = {}
+        self._devices = {}
+        self._dating = workers * len(self.folders)
+        self._errors = []
+        self._lock = threading.Lock()
+
+    @property
+    def found(self):
+        """Files found in all the folders."""
+        return sum(self.found_in)
+
+    def _stage_name(self, name, i):
+        """Name of a stage of folder i, numbered when there are several folders."""
+        return name if len(self.folders) == 1 else f"{name} {i + 1}"
+
+    def run(self, verbose=False):
+        """Run the stages until every photo found is handled, returns the (copied, errored, skipped) result of each job."""
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) if self.executor == "process" else None
+        threads = [threading.Thread(target=self._route, args=(self.routing,))]
+        for i in range(len(self.folders)):
+            threads += [threading.Thread(target=self._scan, args=(i, self.dates[i]))]
+            threads += [threading.Thread(target=self._date, args=(i, self.dates[i], self.routing, pool, verbose)) for _ in range(self.workers)]
+            threads += [threading.Thread(target=self._copy, args=(self.copying[i], verbose)) for _ in range(self.scheduler.workers)]
+        print_message(f"Importing from {", ".join(folder.path for folder in self.folders)} with {self.workers} {self.executor} date workers "
+                      f"and {self.scheduler.workers} copy workers{" each" if len(self.folders) > 1 else ""}")
+        self.scheduler.bytes_copied = 0
+        self.scheduler.progress = Progress('Copying:')
+        started = time.perf_counter()
+        try:
+            with self.scheduler.progress:
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.scheduler.elapsed = time.perf_counter() - started
+        if self._errors:
+            raise self._errors[0]
+        for folder, found in zip(self.folders, self.found_in):
+            print_message(f"Found {found} files in {folder.path}")
+        if self.pruned > 0:
+            print_message(f"Skipped {self.pruned} files modified more than {self.date_margin} outside the date range.")
+        if self.date_range is not None:
+            print_message(f"Selected {self.found - self.pruned - self.filtered - len(self.errored_dates)} files in date range.")
+        if len(self.errored_dates) > 0:
+            print_message(f"Failed to read dates of {len(self.errored_dates)} files")
+        if verbose:
+            for stage in self.stages:
+                log.info(stage)
+        results = [job.finish(self._statuses[key], verbose) for key, job in self.jobs.items()]
+        print_message(f"Copied {self.scheduler.bytes_copied / 1000000:.1f} MB in {self.scheduler.elapsed:.1f} seconds, {self.scheduler.throughput():.1f} MB/s")
+        return results
+
+    def _scan(self, i, dates):
+        """Find the photos of folder i and hand them to its date workers, dropping the ones modified far outside the date range."""
+        prefilter = self.date_range is not None and self.date_margin is not None
+        try:
+            for photo in self.folders[i].iter_photos(self.extensions, self.recurse):
+                self.found_in[i] += 1
+                if photo.pair is not None and photo is not photo.pair[-1]:
+                    continue
+                photos = photo.pair if photo.pair is not None else [photo]
+                if prefilter and not any(member.modified_within(*self.date_range, self.date_margin) for member in photos):
+                    with self._lock:
+                        self.pruned += len(photos)
+                    continue
+                dates.put(photos, len(photos))
+        except Exception as err:
+            self._errors.append(err)
+        finally:
+            for _ in range(self.workers):
+                dates.put(_DONE)
+
+    def _date(self, i, dates, routing, pool, verbose):
+        """Read the date taken of photos, a pair at a time, drop the ones out of the date range and hand the others on."""
+        try:
+            while (photos := dates.get()) is not _DONE:
+                for photo in photos:
+                    try:
+                        photo.resolve_date_taken(pool)
+                    except Exception as err:
+                        with self._lock:
+                            self.errored_dates.append(photo)
+                        if verbose:
+                            log.warning(f"Failed to read date of {photo}: {err}", path=photo.path)
+                        continue
+                    if self.date_range is not None and not self.date_range[0] <= photo.sort_date <= self.date_range[1]:
+                        with self._lock:
+                            self.filtered += 1
+                        if verbose:
+                            log.debug(f"Not selected {photo}", path=photo.path, selected=False)
+                        continue
+                    routing.put((i, photo))
+        except Exception as err:
+            self._errors.append(err)
+        finally:
+            with self._lock:
+                self._dating -= 1
+                last = self._dating == 0
+            if last:
+                routing.put(_DONE)
+
+    def _route(self, routing):
+        """Add photos to the job of their destination folder and hand them to the copy workers of their folder."""
+        try:
+            while (item := routing.get()) is not _DONE:
+                i, photo = item
+                key = self.foldername if self.foldername else photo.sort_date.strftime('%Y-%m')
+                job = self.jobs.get(key)
+                if job is None:
+                    folder = Folder(self.folders[i].path)
+                    folder.add_photo(photo)
+                    job = ImportJob(folder, os.path.join(self.destination, key), self.overwrite, self.move, self.index,
+                                    self.deduplicator, self.verify, self.writer, [os.path.join(mirror, key) for mirror in self.mirrors])
+                    self.jobs[key] = job
+                    self._statuses[key] = []
+                    self._devices[key] = job.device
+                    print_message(f'[{len(self.jobs)}][{key}] - Syncing with {job.destination_folder}')
+                else:
+                    job.add_photo(photo)
+                statuses = self._statuses[key]
+                statuses.append(None)
+                self.scheduler.progress.add(1, photo.size)
+                self.copying[i].put((key, len(statuses) - 1))
+        except Exception as err:
+            self._errors.append(err)
+            while routing.get() is not _DONE:
+                pass
+        finally:
+            for copying in self.copying:
+                for _ in range(self.scheduler.workers):
+                    copying.put(_DONE)
+
+    def _copy(self, copying, verbose):
+        """Copy photos with the scheduler as they are routed, skipping the ones seen before.
+            A photo that fails with any error is counted as ERRORED and the worker goes on."""
+        while (item := copying.get()) is not _DONE:
+            key, i = item
+            try:
+                photo = self.jobs[key].photos[i]
+                if not self.overwrite and self.deduplicator is not None and self.deduplicator.seen(photo) is not None:
+                    self._statuses[key][i] = SKIPPED
+                    self.scheduler.progress.advance(1, 0, photo.size)
+                    continue
+                self.scheduler.import_photo(self.jobs[key], self._devices[key], self._statuses[key], i, verbose)
+            except Exception as err:
+                if verbose:
+                    log.warning(f"Failed to copy {self.jobs[key].photos[i]}: {err}", path=self.jobs[key].photos[i].path)
+                self._statuses[key][i] = ERRORED
+
+    def __str__(self):
+        return f"ImportPipeline({", ".join(folder.path for folder in self.folders)} -> {self.destination}, {len(self.jobs)} jobs)"
+
+    def __repr__(self):
+        return f"ImportPipeline({self.folder.path}, {self.destination}, {self.workers}, {self.scheduler.workers}, {self.found})"
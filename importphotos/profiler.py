@@ -0,0 +1,85 @@
+"""Per-stage timing and I/O counters of an import."""
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+
+from importphotos.helpers.cli import print_table
+
+WALK = "walk"
+DATES = "dates"
+CHECKS = "checks"
+COPY = "copy"
+DELETE = "delete"
+STAGES = (WALK, DATES, CHECKS, COPY, DELETE)
+
+class Profiler():
+    """Wall time, files, bytes read and bytes written of each stage, and its slowest files.
+        Busy time is the sum of the time of each file, wall time runs from the first start to the last end."""
+    def __init__(self, slowest=10):
+        self.slowest = slowest
+        self.stages = {}
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def record(self, stage, path, seconds, read=0, written=0, files=1):
+        """Record a file, or a step without a file when path is None, that took seconds."""
+        ended = time.perf_counter()
+        with self._lock:
+            counters = self.stages.get(stage)
+            if counters is None:
+                counters = self.stages[stage] = {"files": 0, "seconds": 0.0, "read": 0, "written": 0,
+                                                 "started": ended - seconds, "ended": ended, "slowest": []}
+            counters["files"] += files
+            counters["seconds"] += seconds
+            counters["read"] += read
+            counters["written"] += written
+            counters["started"] = min(counters["started"], ended - seconds)
+            counters["ended"] = ended
+            if path is not None and self.slowest > 0:
+                entry = (seconds, next(self._order), path, read, written)
+                if len(counters["slowest"]) < self.slowest:
+                    heapq.heappush(counters["slowest"], entry)
+                else:
+                    heapq.heappushpop(counters["slowest"], entry)
+
+    def report(self):
+        """Counters of each stage in stage order, with the slowest files first."""
+        with self._lock:
+            names = [stage for stage in STAGES if stage in self.stages] + [stage for stage in self.stages if stage not in STAGES]
+            return {stage: {
+                "files": self.stages[stage]["files"],
+                "wall": self.stages[stage]["ended"] - self.stages[stage]["started"],
+                "seconds": self.stages[stage]["seconds"],
+                "read": self.stages[stage]["read"],
+                "written": self.stages[stage]["written"],
+                "slowest": [{"path": path, "seconds": seconds, "read": read, "written": written}
+                            for seconds, _, path, read, written in sorted(self.stages[stage]["slowest"], reverse=True)],
+            } for stage in names}
+
+    def write(self, path):
+        """Write the report as JSON."""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.report(), file, indent=2)
+
+    def print(self, slowest=3):
+        """Print the counters of each stage and its slowest files as tables."""
+        report = self.report()
+        print_table(["Stage", "Files", "Wall s", "Busy s", "Read MB", "Written MB"],
+                    [[stage, counters["files"], round(counters["wall"], 3), round(counters["seconds"], 3),
+                      round(counters["read"] / 1000000, 1), round(counters["written"] / 1000000, 1)]
+                     for stage, counters in report.items()])
+        rows = [[stage, os.path.basename(file["path"]), round(file["seconds"], 3)]
+                for stage, counters in report.items() for file in counters["slowest"][:slowest]]
+        if rows:
+            print_table(["Stage", "Slowest files", "Seconds"], rows)
+
+    def __str__(self):
+        return f"Profiler({', '.join(self.stages)})"
+
+    def __repr__(self):
+        return f"Profiler({self.slowest}, {list(self.stages)})"
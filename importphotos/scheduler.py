@@ -0,0 +1,105 @@
+"""Scheduler copying the photos of many ImportJobs at once."""
+import collections
+import concurrent.futures
+import os
+import threading
+import time
+
+from importphotos.helpers import log
+from importphotos.helpers.cli import print_message
+from importphotos.helpers.progress import Progress
+from importphotos.lib import COPIED, ERRORED
+
+class CopyScheduler():
+    """Runs the photos of all ImportJobs on one pool of workers.
+        Limits how many copies read from one source device and write to one destination device at a time."""
+    def __init__(self, workers=4, per_source=2, per_destination=4):
+        self.workers = workers
+        self.per_source = per_source
+        self.per_destination = per_destination
+        self.bytes_copied = 0
+        self.elapsed = 0.0
+        self.progress = None
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    def run(self, jobs, verbose=False):
+        """Copy the photos of the jobs, returns the (copied, errored, skipped) result of each job."""
+        jobs = list(jobs)
+        statuses = [[None] * len(job.photos) for job in jobs]
+        for j, job in enumerate(jobs):
+            job.start(j + 1)
+        devices = [_device(job.destination_folder) for job in jobs]
+        total = sum(len(job.photos) for job in jobs)
+        print_message(f"Copying {total} files from {len(jobs)} jobs with {self.workers} workers")
+        self.bytes_copied = 0
+        self.progress = Progress('Copying:', total, sum(photo.size for job in jobs for photo in job.photos))
+        started = time.perf_counter()
+        with self.progress, concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for j, i in self._order(jobs):
+                pool.submit(self.import_photo, jobs[j], devices[j], statuses[j], i, verbose)
+        self.elapsed = time.perf_counter() - started
+        results = [job.finish(job_statuses, verbose) for job, job_statuses in zip(jobs, statuses)]
+        print_message(f"Copied {self.bytes_copied / 1000000:.1f} MB in {self.elapsed:.1f} seconds, {self.throughput():.1f} MB/s")
+        return results
+
+    def throughput(self):
+        """Megabytes copied per second."""
+        if self.elapsed <= 0:
+            return 0.0
+        return self.bytes_copied / 1000000 / self.elapsed
+
+    def _order(self, jobs):
+        """Photos of the jobs taken in turn from each job, so no destination is waited on by every worker."""
+        queues = collections.deque(collections.deque((j, i) for i in range(len(job.photos))) for j, job in enumerate(jobs))
+        while queues:
+            queue = queues.popleft()
+            yield queue.popleft()
+            if queue:
+                queues.append(queue)
+
+    def import_photo(self, job, device, statuses, i, verbose=False):
+        """Copy photo i of a job within the source and destination limits, its status is stored in statuses[i].
+            A photo whose copy fails with any error is counted as ERRORED, so no worker error is lost."""
+        photo = job.photos[i]
+        try:
+            source = photo.stat.st_dev
+        except OSError as err:
+            if verbose:
+                log.warning(f"Failed to read {photo}: {err}", path=photo.path)
+            statuses[i] = ERRORED
+            if self.progress is not None:
+                self.progress.advance()
+            return
+        try:
+            with self._limit("source", source, self.per_source), self._limit("destination", device, self.per_destination):
+                statuses[i] = job.import_photo(photo, verbose)
+        except Exception as err:
+            if verbose:
+                log.warning(f"Failed to copy {photo}: {err}", path=photo.path)
+            statuses[i] = ERRORED
+        if statuses[i] == COPIED:
+            with self._lock:
+                self.bytes_copied += photo.stat.st_size
+        if self.progress is not None:
+            self.progress.advance(1, *((photo.size, 0) if statuses[i] == COPIED else (0, photo.size)))
+
+    def _limit(self, kind, device, count):
+        """Semaphore limiting the copies on a device."""
+        with self._lock:
+            if (kind, device) not in self._limits:
+                self._limits[(kind, device)] = threading.BoundedSemaphore(count)
+            return self._limits[(kind, device)]
+
+    def __str__(self):
+        return f"CopyScheduler({self.workers} workers, {self.throughput():.1f} MB/s)"
+
+    def __repr__(self):
+        return f"CopyScheduler({self.workers}, {self.per_source}, {self.per_destination})"
+
+def _device(path):
+    """Device of a path, or the path itself if it can not be read."""
+    try:
+        return os.stat(path).st_dev
+    except OSError:
+        return path
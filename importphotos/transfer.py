@@ -0,0 +1,489 @@
+"""Copy backends moving file data with as little user space work as possible."""
+import ctypes
+import ctypes.util
+import errno
+import json
+import os
+import queue
+import shutil
+import sys
+import threading
+
+from importphotos.dedup import new_digest
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+REFLINK = "reflink"
+COPY_FILE_RANGE = "copy_file_range"
+SENDFILE = "sendfile"
+BUFFERED = "buffered"
+CHUNKED = "chunked"
+
+# When copies are synced to disk: each before its rename, in batches before their renames, or never
+FSYNC_FILE = "file"
+FSYNC_BATCH = "batch"
+FSYNC_OFF = "off"
+FSYNC_BATCH_SIZE = 64
+
+# Copies are written to a hidden name in their folder and renamed into place once complete
+TEMPORARY_PREFIX = ".importphotos-"
+TEMPORARY_SUFFIX = ".part"
+CHECKPOINT_SUFFIX = ".checkpoint"
+
+FICLONE = 0x40049409
+CHUNK_SIZE = 64 * 1024 * 1024
+BUFFER_SIZE = 4 * 1024 * 1024
+CHECKPOINT_SIZE = 256 * 1024 * 1024
+FAN_OUT_QUEUE = 4
+
+# (method, source device, destination device) pairs the kernel refused, not tried again
+_unsupported = set()
+
+def _load_syncfs():
+    """syncfs from libc, syncing one filesystem in one call, None where it is not available."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        return ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True).syncfs
+    except (OSError, AttributeError):
+        return None
+
+_syncfs = _load_syncfs()
+
+def copy_file(source, destination, digest=None):
+    """Copy the data of source to the file destination with the fastest method available, returns the method used.
+        With a hashlib digest the data is copied through a buffer and hashed as it is read, raises OSError if the source ends early."""
+    with open(source, 'rb') as fsrc:
+        source_stat = os.fstat(fsrc.fileno())
+        fd = os.open(destination, os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o666)
+        with open(fd, 'wb') as fdst:
+            destination_stat = os.fstat(fdst.fileno())
+            if os.path.samestat(source_stat, destination_stat):
+                raise shutil.SameFileError(f"{source} and {destination} are the same file")
+            fdst.truncate(0)
+            if digest is not None:
+                method, reached = BUFFERED, _buffered(fsrc.fileno(), fdst.fileno(), 0, source_stat.st_size, digest)
+            else:
+                method, reached = _copy_range(fsrc.fileno(), fdst.fileno(), 0, source_stat.st_size, (source_stat.st_dev, destination_stat.st_dev))
+            if reached != source_stat.st_size:
+                raise OSError(errno.EIO, "Source ended before its size", source)
+            return method
+
+def _copy_range(fsrc, fdst, offset, size, devices, reflink=True):
+    """Copy from offset up to offset size with the fastest method the kernel takes, returns (method, offset reached)."""
+    for method, copy in _methods(*devices):
+        if method == REFLINK and not reflink:
+            continue
+        try:
+            return method, copy(fsrc, fdst, offset, size)
+        except _Unsupported as exc:
+            offset = exc.offset
+            if offset == 0:
+                _unsupported.add((method, *devices))
+    return BUFFERED, offset
+
+class _Unsupported(Exception):
+    """The kernel refused a copy method after offset bytes were copied."""
+    def __init__(self, offset):
+        super().__init__(offset)
+        self.offset = offset
+
+def _methods(source_device, destination_device):
+    """Copy methods to try for a pair of devices, fastest first."""
+    methods = []
+    if source_device == destination_device and fcntl is not None:
+        methods.append((REFLINK, _reflink))
+    if hasattr(os, 'copy_file_range'):
+        methods.append((COPY_FILE_RANGE, _copy_file_range))
+    if hasattr(os, 'sendfile'):
+        methods.append((SENDFILE, _sendfile))
+    methods = [(method, copy) for method, copy in methods if (method, source_device, destination_device) not in _unsupported]
+    methods.append((BUFFERED, _buffered))
+    return methods
+
+def _reflink(fsrc, fdst, offset, size):
+    """Share the source blocks with the destination, btrfs and XFS."""
+    if offset != 0:
+        raise _Unsupported(offset)
+    try:
+        fcntl.ioctl(fdst, FICLONE, fsrc)
+    except OSError as exc:
+        raise _Unsupported(offset) from exc
+    return os.fstat(fdst).st_size
+
+def _copy_file_range(fsrc, fdst, offset, size):
+    """Copy in the kernel, lets the filesystem or the server copy without reading the data."""
+    while offset < size:
+        try:
+            copied = os.copy_file_range(fsrc, fdst, min(CHUNK_SIZE, size - offset), offset, offset)
+        except OSError as exc:
+            if exc.errno in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF, errno.EPERM):
+                raise _Unsupported(offset) from exc
+            raise
+        if copied == 0:
+            raise _Unsupported(offset)
+        offset += copied
+    return offset
+
+def _sendfile(fsrc, fdst, offset, size):
+    """Copy in the kernel without a user space buffer."""
+    os.lseek(fdst, offset, os.SEEK_SET)
+    while offset < size:
+        try:
+            sent = os.sendfile(fdst, fsrc, offset, min(CHUNK_SIZE, size - offset))
+        except OSError as exc:
+            if exc.errno in (errno.EINVAL, errno.ENOSYS, errno.ENOTSOCK, errno.EOPNOTSUPP):
+                raise _Unsupported(offset) from exc
+            raise
+        if sent == 0:
+            raise _Unsupported(offset)
+        offset += sent
+    return offset
+
+def _buffered(fsrc, fdst, offset, size, digest=None):
+    """Copy up to offset size through a large user space buffer, updating digest with the data copied."""
+    os.lseek(fsrc, offset, os.SEEK_SET)
+    os.lseek(fdst, offset, os.SEEK_SET)
+    buffer = bytearray(BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(fsrc, 'rb', buffering=0, closefd=False) as reader, open(fdst, 'wb', buffering=0, closefd=False) as writer:
+        while offset < size:
+            read = reader.readinto(view[:min(BUFFER_SIZE, size - offset)])
+            if not read:
+                break
+            if digest is not None:
+                digest.update(view[:read])
+            written = 0
+            while written < read:
+                written += writer.write(view[written:read])
+            offset += read
+    return offset
+
+def _hash_range(fd, offset, size, digest):
+    """Update digest with the data of an open file from offset up to offset size."""
+    os.lseek(fd, offset, os.SEEK_SET)
+    buffer = bytearray(BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(fd, 'rb', buffering=0, closefd=False) as reader:
+        while offset < size:
+            read = reader.readinto(view[:min(BUFFER_SIZE, size - offset)])
+            if not read:
+                break
+            digest.update(view[:read])
+            offset += read
+    return offset
+
+def hash_file(path, digest, size=None):
+    """Update digest with the data of the file, or its first size bytes, read back through the buffer, returns its hex digest."""
+    buffer = bytearray(BUFFER_SIZE)
+    view = memoryview(buffer)
+    left = float('inf') if size is None else size
+    with open(path, 'rb', buffering=0) as reader:
+        while left > 0 and (read := reader.readinto(view[:int(min(BUFFER_SIZE, left))])):
+            digest.update(view[:read])
+            left -= read
+    return digest.hexdigest()
+
+def copy_to_many(source, destinations, digest=None):
+    """Copy source to several files reading it once, returns the error of each destination, None if it was written."""
+    writers = [_FanOutWriter(destination) for destination in destinations]
+    try:
+        with open(source, 'rb') as fsrc:
+            while block := fsrc.read(BUFFER_SIZE):
+                if digest is not None:
+                    digest.update(block)
+                for writer in writers:
+                    writer.put(block)
+    finally:
+        for writer in writers:
+            writer.close()
+    return [writer.error for writer in writers]
+
+class _FanOutWriter():
+    """Thread writing the blocks put in its queue to one file, keeps the first error and drops the blocks after it."""
+    def __init__(self, destination):
+        self.error = None
+        self._file = None
+        self._thread = None
+        self._queue = queue.Queue(FAN_OUT_QUEUE)
+        try:
+            self._file = open(destination, 'wb')
+        except OSError as err:
+            self.error = err
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, block):
+        """Queue a block to write, waiting while the queue is full."""
+        if self._thread is not None:
+            self._queue.put(block)
+
+    def close(self):
+        """Wait for the queued blocks to be written and close the file."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            self._file.close()
+        except OSError as err:
+            self.error = self.error or err
+
+    def _run(self):
+        while (block := self._queue.get()) is not None:
+            if self.error is None:
+                try:
+                    self._file.write(block)
+                except OSError as err:
+                    self.error = err
+
+def copy_resumable(source, destination, digest=None, chunk_size=None):
+    """Copy source to destination in chunks with a checkpoint after each, continuing an interrupted copy once it matches its hash.
+        digest is updated with all the data of the file, returns the offset the copy continued from."""
+    checkpoint = destination + CHECKPOINT_SUFFIX
+    chunk_size = CHECKPOINT_SIZE if chunk_size is None else chunk_size
+    hashed = new_digest() if digest is None else digest
+    with open(source, 'rb') as fsrc:
+        source_stat = os.fstat(fsrc.fileno())
+        offset = _checkpoint_offset(source, source_stat, destination, checkpoint, hashed)
+        resumed = offset
+        fd = os.open(destination, os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o666)
+        with open(fd, 'wb') as fdst:
+            devices = source_stat.st_dev, os.fstat(fdst.fileno()).st_dev
+            fdst.truncate(offset)
+            while offset < source_stat.st_size:
+                end = min(offset + chunk_size, source_stat.st_size)
+                if digest is not None:
+                    reached = _buffered(fsrc.fileno(), fdst.fileno(), offset, end, digest)
+                else:
+                    reached = _copy_range(fsrc.fileno(), fdst.fileno(), offset, end, devices, offset == 0 and end == source_stat.st_size)[1]
+                    reached = reached if reached != end else _hash_range(fsrc.fileno(), offset, end, hashed)
+                if reached != end:
+                    raise OSError(errno.EIO, "Source ended before its size", source)
+                offset = end
+                os.fsync(fdst.fileno())
+                _write_checkpoint(checkpoint, {"source": os.path.abspath(source), "size": source_stat.st_size, "mtime_ns": source_stat.st_mtime_ns,
+                                               "offset": offset, "checksum": hashed.hexdigest()})
+    return resumed
+
+def _checkpoint_offset(source, source_stat, destination, checkpoint, digest):
+    """Offset of the last checkpoint of a copy of source with the data before it hashed into digest, 0 without one.
+        Raises after removing the checkpoint when the copy does not match it."""
+    try:
+        with open(checkpoint, encoding='utf-8') as file:
+            state = json.load(file)
+        if (state["source"], state["size"], state["mtime_ns"]) != (os.path.abspath(source), source_stat.st_size, source_stat.st_mtime_ns):
+            return 0
+        if os.path.getsize(destination) < state["offset"]:
+            return 0
+        offset, checksum = state["offset"], state["checksum"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return 0
+    if offset == 0 or checksum is None:
+        return 0
+    if hash_file(destination, digest, offset) != checksum:
+        _remove(checkpoint)
+        raise OSError(errno.EIO, "Copy does not match its checkpoint", destination)
+    return offset
+
+def _write_checkpoint(checkpoint, state):
+    """Replace the checkpoint of a copy with state."""
+    with open(checkpoint + TEMPORARY_SUFFIX, 'w', encoding='utf-8') as file:
+        json.dump(state, file)
+    os.replace(checkpoint + TEMPORARY_SUFFIX, checkpoint)
+
+def temporary_name(destination):
+    """Hidden name in the folder of destination a copy is written to before it is renamed to destination."""
+    folder, name = os.path.split(destination)
+    return os.path.join(folder, f"{TEMPORARY_PREFIX}{name}{TEMPORARY_SUFFIX}")
+
+def is_temporary(name):
+    """True for the temporary name of a copy and the names of its checkpoint."""
+    return name.startswith(TEMPORARY_PREFIX) and name.endswith((TEMPORARY_SUFFIX, CHECKPOINT_SUFFIX))
+
+class AtomicWriter():
+    """Writes copies under a temporary name and renames them into place once complete, synced as the policy says.
+        Files of resumable_size bytes or more are copied with copy_resumable."""
+    def __init__(self, policy=FSYNC_FILE, batch=FSYNC_BATCH_SIZE, resumable_size=None):
+        self.policy = policy
+        self.batch = batch
+        self.resumable_size = resumable_size
+        self.resumed_bytes = 0
+        self.file_syncs = 0
+        self.filesystem_syncs = 0
+        self.directory_syncs = 0
+        self._pending = []
+        self._committed = []
+        self._directories = set()
+        self._lock = threading.Lock()
+
+    def copy(self, source, destination, digest=None):
+        """Copy source to the temporary name of destination with copy_file, returns (method, temporary name)."""
+        if os.path.exists(destination) and os.path.samefile(source, destination):
+            raise shutil.SameFileError(f"{source} and {destination} are the same file")
+        temporary = temporary_name(destination)
+        if self.resumable_size is not None and os.path.getsize(source) >= self.resumable_size:
+            resumed = copy_resumable(source, temporary, digest)
+            with self._lock:
+                self.resumed_bytes += resumed
+            return CHUNKED, temporary
+        try:
+            return copy_file(source, temporary, digest), temporary
+        except BaseException:
+            _remove(temporary)
+            raise
+
+    def copy_many(self, source, destinations, digest=None):
+        """Copy source to each destination, reading it once with copy_to_many when there are several.
+            Returns the (method, temporary name) of each destination, or the error it failed with."""
+        if len(destinations) == 1:
+            try:
+                return [self.copy(source, destinations[0], digest)]
+            except OSError as err:
+                return [err]
+        results = [None] * len(destinations)
+        temporaries = {}
+        for i, destination in enumerate(destinations):
+            if os.path.exists(destination) and os.path.samefile(source, destination):
+                results[i] = shutil.SameFileError(f"{source} and {destination} are the same file")
+            else:
+                temporaries[i] = temporary_name(destination)
+        try:
+            errors = copy_to_many(source, list(temporaries.values()), digest)
+        except BaseException:
+            for temporary in temporaries.values():
+                _remove(temporary)
+            raise
+        for (i, temporary), error in zip(temporaries.items(), errors):
+            if error is not None:
+                _remove(temporary)
+            results[i] = error if error is not None else (BUFFERED, temporary)
+        return results
+
+    def discard(self, temporary):
+        """Remove a copy that is not to be put in place, with its checkpoint."""
+        _remove(temporary)
+        _remove(temporary + CHECKPOINT_SUFFIX)
+
+    def commit(self, temporary, destination, on_commit=None, on_error=None):
+        """Rename a copy into place and call on_commit, raising if it can not be.
+            With FSYNC_BATCH it is renamed once its batch is synced, and on_error is called if that fails."""
+        if self.policy != FSYNC_BATCH:
+            if self.policy == FSYNC_FILE:
+                self._sync_file(temporary)
+            self._rename(temporary, destination)
+            if on_commit is not None:
+                on_commit()
+            return
+        with self._lock:
+            self._pending.append((temporary, destination, on_commit, on_error))
+            if len(self._pending) < self.batch:
+                return
+        try:
+            self.flush()
+        except OSError:
+            pass
+
+    def flush(self):
+        """Sync the copies still pending, rename them into place, sync their folders and call their on_commit."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        try:
+            self._sync_batch([temporary for temporary, _, _, _ in pending])
+        except OSError:
+            with self._lock:
+                self._pending[:0] = pending
+            raise
+        for temporary, destination, on_commit, on_error in pending:
+            try:
+                self._rename(temporary, destination)
+            except OSError as err:
+                self.discard(temporary)
+                if on_error is not None:
+                    on_error(err)
+                continue
+            if on_commit is not None:
+                with self._lock:
+                    self._committed.append(on_commit)
+        self._sync_directories()
+        with self._lock:
+            committed, self._committed = self._committed, []
+        for on_commit in committed:
+            on_commit()
+
+    def sync(self):
+        """Put the pending copies in place and sync the folders copies were renamed into."""
+        self.flush()
+
+    def _sync_directories(self):
+        """Sync the folders copies were renamed into since the last time, a folder that fails to sync is tried again."""
+        with self._lock:
+            directories, self._directories = self._directories, set()
+        if self.policy == FSYNC_OFF or not hasattr(os, 'O_DIRECTORY'):
+            return
+        for directory in sorted(directories):
+            try:
+                fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except OSError:
+                with self._lock:
+                    self._directories.update(directories)
+                raise
+            with self._lock:
+                self.directory_syncs += 1
+
+    def _sync_batch(self, paths):
+        """Sync files with one syncfs per filesystem they are on, or one fsync per file without syncfs."""
+        if _syncfs is None:
+            for path in paths:
+                self._sync_file(path)
+            return
+        folders = {}
+        for path in paths:
+            folder = os.path.dirname(os.path.abspath(path))
+            folders.setdefault(os.stat(folder).st_dev, folder)
+        for folder in folders.values():
+            fd = os.open(folder, os.O_RDONLY)
+            try:
+                if _syncfs(fd) != 0:
+                    raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()), folder)
+            finally:
+                os.close(fd)
+            with self._lock:
+                self.filesystem_syncs += 1
+
+    def _sync_file(self, path):
+        fd = os.open(path, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        with self._lock:
+            self.file_syncs += 1
+
+    def _rename(self, temporary, destination):
+        os.replace(temporary, destination)
+        _remove(temporary + CHECKPOINT_SUFFIX)
+        with self._lock:
+            self._directories.add(os.path.dirname(os.path.abspath(destination)))
+
+    def __str__(self):
+        return (f"AtomicWriter({self.policy}, {self.file_syncs} file syncs, {self.filesystem_syncs} filesystem syncs, {self.directory_syncs} folder syncs, "
+                f"{self.resumed_bytes / 1000000:.1f} MB resumed)")
+
+    def __repr__(self):
+        return f"AtomicWriter({self.policy}, {self.batch}, {len(self._pending)}, {self.file_syncs}, {self.directory_syncs})"
+
+def _remove(path):
+    """Remove a file if it exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
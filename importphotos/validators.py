@@ -21,3 +21,16 @@ class FileValidator:
         if not os.path.exists(arg_value):
             raise argparse.ArgumentTypeError(f"file path {arg_value} does not exist.")
         return arg_value
+
+class NumberValidator:
+    """Validators for Number inputs."""
+    @staticmethod
+    def positive_integer(arg_value):
+        """Check if argument is a whole number greater than zero."""
+        try:
+            value = int(arg_value)
+        except (TypeError, ValueError) as exc:
+            raise argparse.ArgumentTypeError(f"{arg_value} must be a whole number. Example: '4'") from exc
+        if value < 1:
+            raise argparse.ArgumentTypeError(f"{arg_value} must be greater than zero.")
+        return value
@@ -0,0 +1,79 @@
+"""Directory walker finding photos with os.scandir."""
+import os
+import stat
+
+# Folders cameras and operating systems keep on cards that never hold photos to import, compared lowercase
+SYSTEM_DIRS = frozenset({".trashes", ".spotlight-v100", ".fseventsd", ".thumbnails", "misc",
+                         "$recycle.bin", "system volume information", "lost+found"})
+
+def extension_set(extensions):
+    """Lowercase set of extensions from one extension or a sequence of them."""
+    if isinstance(extensions, str):
+        extensions = (extensions,)
+    return frozenset(extension.lower() for extension in extensions)
+
+class Walker():
+    """Walks a folder with os.scandir and yields the files with one of the extensions as they are found.
+        The directory entries tell files from folders without a stat, hidden and system folders are skipped."""
+    def __init__(self, extensions, recurse=False, skip_hidden=True, system_dirs=SYSTEM_DIRS):
+        self.extensions = extension_set(extensions)
+        self.recurse = recurse
+        self.skip_hidden = skip_hidden
+        self.system_dirs = system_dirs
+        self.directories = 0
+        self.entries = 0
+        self.matched = 0
+        self.skipped = []
+        self.errors = []
+
+    def walk(self, path, on_directory=None):
+        """Yield the os.DirEntry of each file with one of the extensions, folders before their subfolders.
+            on_directory(root, matched, unmatched, folders) is called after each folder with the names found in it."""
+        stack = [path]
+        while stack:
+            root = stack.pop()
+            matched, unmatched, folders = [], [], []
+            try:
+                with os.scandir(root) as entries:
+                    for entry in entries:
+                        self.entries += 1
+                        if entry.is_dir():
+                            if entry.name.lower() in self.system_dirs or self._hidden(entry):
+                                self.skipped.append(entry.path)
+                            else:
+                                folders.append(entry.name)
+                            continue
+                        if self._hidden(entry):
+                            continue
+                        if os.path.splitext(entry.name)[1].lower() in self.extensions and entry.is_file():
+                            self.matched += 1
+                            if on_directory is not None:
+                                matched.append(entry.name)
+                            yield entry
+                        elif on_directory is not None:
+                            unmatched.append(entry.name)
+            except OSError as err:
+                self.errors.append(err)
+                continue
+            self.directories += 1
+            if on_directory is not None:
+                on_directory(root, matched, unmatched, folders)
+            if self.recurse:
+                stack.extend(os.path.join(root, folder) for folder in reversed(folders))
+
+    def _hidden(self, entry):
+        """True for names starting with a dot, and files marked hidden or system on Windows."""
+        if not self.skip_hidden:
+            return False
+        if entry.name.startswith('.'):
+            return True
+        if os.name == 'nt':
+            attributes = entry.stat(follow_symlinks=False).st_file_attributes
+            return bool(attributes & (stat.FILE_ATTRIBUTE_HIDDEN | stat.FILE_ATTRIBUTE_SYSTEM))
+        return False
+
+    def __str__(self):
+        return f"Walker({self.matched} of {self.entries} entries in {self.directories} folders)"
+
+    def __repr__(self):
+        return f"Walker({sorted(self.extensions)}, {self.recurse}, {self.directories}, {self.entries}, {self.matched})"
@@ -0,0 +1,214 @@
+"""Watching mount roots for cards and other volumes to import."""
+import ctypes
+import ctypes.util
+import os
+import select
+import string
+import struct
+import sys
+import time
+
+from importphotos.walker import Walker
+
+POLL_INTERVAL = 2.0
+SETTLE_TIME = 10.0
+RESCAN_INTERVAL = 30.0
+CARD_FOLDER = "DCIM"
+
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_EVENTS = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+IN_EVENT_HEADER = struct.Struct("iIII")
+
+def mount_roots():
+    """Folders removable volumes are mounted in on Linux and macOS, none on Windows where each volume is a drive."""
+    if os.name == 'nt':
+        return ()
+    user = os.path.basename(os.path.expanduser("~"))
+    return (os.path.join("/media", user), os.path.join("/run/media", user), "/Volumes")
+
+def drives():
+    """Root folders of the drives mounted on Windows, like D:\\, empty elsewhere."""
+    if hasattr(os, 'listdrives'):
+        try:
+            return list(os.listdrives())
+        except OSError:
+            pass
+    if os.name != 'nt':
+        return []
+    return [f"{letter}:\\" for letter in string.ascii_uppercase if os.path.exists(f"{letter}:\\")]
+
+def card_folder(volume):
+    """Folder to import from on a volume, its DCIM folder when it has one."""
+    folder = os.path.join(volume, CARD_FOLDER)
+    return folder if os.path.isdir(folder) else volume
+
+def snapshot(path, extensions):
+    """Number, total size and latest modified time of the files with one of the extensions under path."""
+    count, size, modified = 0, 0, 0
+    for entry in Walker(extensions, recurse=True).walk(path):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        count += 1
+        size += stat.st_size
+        modified = max(modified, stat.st_mtime_ns)
+    return count, size, modified
+
+class Inotify():
+    """inotify instance from libc waking up when folders are created, moved or removed in the watched folders.
+        On Linux the mount table is watched as well, so a volume mounted over an existing folder wakes it up too."""
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        self.watched = set()
+        self.events = 0
+        try:
+            self._mounts = open("/proc/self/mounts", "rb")
+        except OSError:
+            self._mounts = None
+
+    def watch(self, path):
+        """Watch a folder, False if it does not exist yet."""
+        if path in self.watched:
+            return True
+        if self._add_watch(self.fd, os.fsencode(path), IN_EVENTS) < 0:
+            return False
+        self.watched.add(path)
+        return True
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds for a change, True if there was one."""
+        exceptional = [self._mounts] if self._mounts is not None else []
+        readable, _, changed = select.select([self.fd], [], exceptional, timeout)
+        if changed:
+            self._mounts.seek(0)
+            self._mounts.read()
+        if readable:
+            self._read()
+        return bool(readable or changed)
+
+    def _read(self):
+        """Read and count the pending events, their names are not needed."""
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(data):
+                length = IN_EVENT_HEADER.unpack_from(data, offset)[3]
+                offset += IN_EVENT_HEADER.size + length
+                self.events += 1
+
+    def close(self):
+        """Close the inotify instance."""
+        os.close(self.fd)
+        if self._mounts is not None:
+            self._mounts.close()
+
+    def __str__(self):
+        return f"Inotify({len(self.watched)} folders, {self.events} events)"
+
+    def __repr__(self):
+        return f"Inotify({self.fd}, {sorted(self.watched)}, {self.events})"
+
+class MountWatcher():
+    """Yields each volume mounted in the roots, or each new drive without roots, once its files stop changing.
+        inotify wakes it up on Linux, elsewhere it looks again every interval seconds."""
+    def __init__(self, roots, extensions, interval=POLL_INTERVAL, settle=SETTLE_TIME, inotify=True):
+        self.roots = list(roots)
+        self.extensions = extensions
+        self.interval = interval
+        self.settle = settle
+        self.polls = 0
+        self.inotify = None
+        if inotify and sys.platform.startswith("linux"):
+            try:
+                self.inotify = Inotify()
+            except (OSError, AttributeError):
+                self.inotify = None
+        self.volumes = self._volumes()
+        self.pending = {}
+
+    def _volumes(self):
+        """Folders of the roots, or drives without roots, with their device, watching the roots that exist with inotify."""
+        volumes = set()
+        if not self.roots:
+            for drive in drives():
+                try:
+                    volumes.add((drive, os.stat(drive).st_dev))
+                except OSError:
+                    continue
+            return volumes
+        for root in self.roots:
+            if self.inotify is not None:
+                self.inotify.watch(root)
+            try:
+                with os.scandir(root) as entries:
+                    for entry in entries:
+                        if entry.is_dir() and not entry.name.startswith('.'):
+                            try:
+                                volumes.add((entry.path, entry.stat().st_dev))
+                            except OSError:
+                                continue
+            except OSError:
+                continue
+        return volumes
+
+    def poll(self):
+        """Look for new volumes and return the ones whose files stopped changing, without waiting."""
+        self.polls += 1
+        volumes = self._volumes()
+        for volume in volumes - self.volumes:
+            self.pending[volume] = (None, None)
+        for volume in list(self.pending):
+            if volume not in volumes:
+                del self.pending[volume]
+        self.volumes = volumes
+        ready = []
+        now = time.monotonic()
+        for volume, (last, since) in list(self.pending.items()):
+            try:
+                current = snapshot(volume[0], self.extensions)
+            except OSError:
+                continue
+            if current != last:
+                self.pending[volume] = (current, now)
+            elif now - since >= self.settle:
+                del self.pending[volume]
+                if current[0] > 0:
+                    ready.append(volume[0])
+        return sorted(ready)
+
+    def wait(self):
+        """Wait for the next change of the roots, or while volumes are settling for the next time to look at them."""
+        if self.inotify is None:
+            time.sleep(self.interval)
+        else:
+            self.inotify.wait(min(self.interval, self.settle) if self.pending else RESCAN_INTERVAL)
+
+    def __iter__(self):
+        """Yield each new volume once it is ready, forever."""
+        while True:
+            yield from self.poll()
+            self.wait()
+
+    def close(self):
+        """Stop watching the roots."""
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+    def __str__(self):
+        return f"MountWatcher({", ".join(self.roots) if self.roots else "drives"}, {"inotify" if self.inotify is not None else "polling"})"
+
+    def __repr__(self):
+        return f"MountWatcher({self.roots}, {self.interval}, {self.settle}, {len(self.volumes)}, {len(self.pending)}, {self.polls})"
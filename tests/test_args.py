@@ -101,6 +101,8 @@ def test_path(mocker):
     parser = ArgumentParser()
     args = parser.parse_args(['-p', 'tests/test_args.py'])
     assert args.path
+    args = parser.parse_args(['-p', 'tests', 'tests/data', '-p', 'importphotos'])
+    assert len(args.path) == 3
 
 def test_destination(mocker):
     """Test the destination argument."""
@@ -108,3 +110,70 @@ def test_destination(mocker):
     parser = ArgumentParser()
     args = parser.parse_args(['-o', 'tests/test_args.py'])
     assert args.destination
+    args = parser.parse_args(['-o', 'tests', 'tests/data'])
+    assert len(args.destination) == 2
+
+def test_jobs():
+    """Test the jobs argument."""
+    parser = ArgumentParser()
+    args = parser.parse_args('')
+    assert args.jobs is None
+    args = parser.parse_args(['-j', '8'])
+    assert args.jobs == 8
+    with pytest.raises(SystemExit):
+        parser.parse_args(['--jobs', '0'])
+
+def test_cache():
+    """Test the cache arguments."""
+    parser = ArgumentParser()
+    args = parser.parse_args('')
+    assert args.no_cache is False
+    assert args.rebuild_cache is False
+    args = parser.parse_args(['--no-cache'])
+    assert args.no_cache is True
+    args = parser.parse_args(['--rebuild-cache'])
+    assert args.rebuild_cache is True
+    with pytest.raises(SystemExit):
+        parser.parse_args(['--no-cache', '--rebuild-cache'])
+
+def test_copy_jobs():
+    """Test the copy_jobs argument."""
+    parser = ArgumentParser()
+    args = parser.parse_args('')
+    assert args.copy_jobs is None
+    args = parser.parse_args(['--copy-jobs', '8'])
+    assert args.copy_jobs == 8
+
+def test_resume():
+    """Test the resume argument."""
+    parser = ArgumentParser()
+    args = parser.parse_args('')
+    assert args.resume is False
+    args = parser.parse_args(['--resume'])
+    assert args.resume is True
+
+def test_profile():
+    """Test the profile argument."""
+    parser = ArgumentParser()
+    assert parser.parse_args('').profile is None
+    assert parser.parse_args(['--profile']).profile == 'importphotos-profile.json'
+    assert parser.parse_args(['--profile', 'report.json']).profile == 'report.json'
+
+def test_watch():
+    """Test the watch argument."""
+    parser = ArgumentParser()
+    assert parser.parse_args('').watch is None
+    assert parser.parse_args(['--watch']).watch == []
+    assert parser.parse_args(['--watch', '/media/user', '/Volumes']).watch == ['/media/user', '/Volumes']
+
+def test_log_file():
+    """Test the log file argument."""
+    parser = ArgumentParser()
+    assert parser.parse_args('').log_file is None
+    assert parser.parse_args(['--log-file', 'import.jsonl']).log_file == 'import.jsonl'
+
+def test_strict_dates():
+    """Test the strict dates argument."""
+    parser = ArgumentParser()
+    assert parser.parse_args('').strict_dates is False
+    assert parser.parse_args(['--strict-dates']).strict_dates is True
@@ -0,0 +1,45 @@
+"""Unit Tests for the benchmarks package."""
+import datetime
+import json
+import os
+
+import benchmarks.bench
+import benchmarks.cards
+from importphotos.metadata import read_metadata
+
+def test_card_mix():
+    """Test the card_mix function."""
+    assert benchmarks.cards.card_mix(1000) == {"jpegs": 400, "pairs": 200, "raws": 100, "videos": 100}
+
+def test_make_card(tmp_path):
+    """Test the make_card function."""
+    written = benchmarks.cards.make_card(str(tmp_path), jpegs=3, pairs=2, raws=2, videos=1, per_folder=4)
+    assert len(written) == 10
+    assert sorted(os.listdir(tmp_path / "DCIM")) == ["100CANON", "101CANON"]
+    assert os.path.exists(tmp_path / "MISC" / "AUTPRINT.MRK")
+    extensions = [os.path.splitext(path)[1] for path in written]
+    assert extensions.count(".JPG") == 5
+    assert extensions.count(".CR2") + extensions.count(".ARW") == 4
+    assert extensions.count(".MP4") == 1
+    for path in written:
+        date_taken = read_metadata(path).date_taken
+        assert date_taken is not None
+        assert datetime.datetime.fromtimestamp(os.path.getmtime(path)) == date_taken
+    assert len(set(open(path, 'rb').read() for path in written)) == 10
+
+def test_main(tmp_path, capsys):
+    """Test the benchmarks write JSON results and compare them."""
+    output = str(tmp_path / "results.json")
+    benchmarks.bench.main(["--sizes", "20", "--jobs", "2", "--workdir", str(tmp_path), "--output", output])
+    with open(output, encoding="utf-8") as file:
+        report = json.load(file)
+    assert report["results"][0]["files"] == 20
+    assert report["results"][0]["found"] == 20
+    assert set(report["results"][0]["seconds"]) == set(benchmarks.bench.STEPS)
+    assert os.listdir(tmp_path) == ["results.json"]
+    assert report["results"][0]["fsync"] == "batch"
+    benchmarks.bench.main(["--sizes", "20", "--fsync", "batch", "off", "--workdir", str(tmp_path), "--compare", output])
+    captured = capsys.readouterr()
+    assert "     20 files, fsync off:" in captured.out
+    assert "     20 batch execute" in captured.out
+    assert "     20 off   execute" not in captured.out
@@ -0,0 +1,94 @@
+"""Unit Tests for importphotos.cache module."""
+import datetime
+import os
+
+from importphotos.cache import MetadataCache
+
+def write_file(path, data=b'data'):
+    """Write a test file and return its status."""
+    path.write_bytes(data)
+    return os.stat(path)
+
+def test_cache_put_get(tmp_path):
+    """Test MetadataCache stores and returns entries."""
+    taken = datetime.datetime(2021, 1, 1)
+    stat = write_file(tmp_path / "IMG_0001.JPG")
+    cache = MetadataCache(str(tmp_path / "cache" / "metadata.sqlite3"))
+    assert cache.get(str(tmp_path / "IMG_0001.JPG"), stat) is None
+    cache.put(str(tmp_path / "IMG_0001.JPG"), stat, taken, {"Make": "Sony"})
+    cache.flush()
+    assert cache.get(str(tmp_path / "IMG_0001.JPG"), stat) == (taken, {"Make": "Sony"})
+    assert cache.hits == 1
+    assert cache.misses == 1
+    assert len(cache) == 1
+    cache.close()
+    cache = MetadataCache(str(tmp_path / "cache" / "metadata.sqlite3"))
+    assert cache.get(str(tmp_path / "IMG_0001.JPG"), stat) == (taken, {"Make": "Sony"})
+    cache.close()
+
+def test_cache_stale(tmp_path):
+    """Test MetadataCache ignores entries of changed files."""
+    taken = datetime.datetime(2021, 1, 1)
+    stat = write_file(tmp_path / "IMG_0001.JPG")
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+    cache.put(str(tmp_path / "IMG_0001.JPG"), stat, taken, {})
+    cache.flush()
+    os.utime(tmp_path / "IMG_0001.JPG", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert cache.get(str(tmp_path / "IMG_0001.JPG"), os.stat(tmp_path / "IMG_0001.JPG")) is None
+    stat = write_file(tmp_path / "IMG_0001.JPG", b'other data')
+    assert cache.get(str(tmp_path / "IMG_0001.JPG"), stat) is None
+    assert cache.misses == 2
+    cache.close()
+
+def test_cache_batches_writes(tmp_path, mocker):
+    """Test MetadataCache writes entries in batches."""
+    mocker.patch("importphotos.cache.FLUSH_EVERY", 2)
+    stat = write_file(tmp_path / "IMG_0001.JPG")
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+    cache.put("IMG_0001.JPG", stat, datetime.datetime(2021, 1, 1), {})
+    assert len(cache) == 0
+    cache.put("IMG_0002.JPG", stat, datetime.datetime(2021, 1, 1), {})
+    assert len(cache) == 2
+    cache.close()
+
+def test_cache_rebuild(tmp_path):
+    """Test MetadataCache rebuild clears entries."""
+    stat = write_file(tmp_path / "IMG_0001.JPG")
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+    cache.put("IMG_0001.JPG", stat, datetime.datetime(2021, 1, 1), {})
+    cache.close()
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"), rebuild=True)
+    assert len(cache) == 0
+    cache.close()
+
+def test_cache_evict(tmp_path, mocker):
+    """Test MetadataCache evicts old and least recently used entries."""
+    stat = write_file(tmp_path / "IMG_0001.JPG")
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"), limit=2, max_age=1)
+    now = 1700000000.0
+    time = mocker.patch("time.time", return_value=now - 2 * 86400)
+    cache.put("IMG_0001.JPG", stat, datetime.datetime(2021, 1, 1), {})
+    time.return_value = now - 3
+    cache.put("IMG_0002.JPG", stat, datetime.datetime(2021, 1, 1), {})
+    time.return_value = now - 2
+    cache.put("IMG_0003.JPG", stat, datetime.datetime(2021, 1, 1), {})
+    time.return_value = now - 1
+    cache.put("IMG_0004.JPG", stat, datetime.datetime(2021, 1, 1), {})
+    cache.flush()
+    time.return_value = now
+    assert cache.get("IMG_0002.JPG", stat) is not None
+    cache.flush()
+    assert cache.evict() == 2
+    assert cache.get("IMG_0001.JPG", stat) is None
+    assert cache.get("IMG_0003.JPG", stat) is None
+    assert cache.get("IMG_0002.JPG", stat) is not None
+    assert cache.get("IMG_0004.JPG", stat) is not None
+    cache.close()
+
+def test_cache_str_repr(tmp_path):
+    """Test MetadataCache str and repr."""
+    path = str(tmp_path / "metadata.sqlite3")
+    cache = MetadataCache(path, 10, 5)
+    assert str(cache) == f"MetadataCache({path}, 0 hits, 0 misses)"
+    assert repr(cache) == f"MetadataCache({path}, 10, 5, 0, 0)"
+    cache.close()
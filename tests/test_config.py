@@ -5,6 +5,7 @@ import pytest
 import os
 
 from importphotos.config import Config
+from importphotos.watch import mount_roots
 
 def input_config():
     """Test data for Config class."""
@@ -132,3 +133,78 @@ def test_config_repr(mocker):
     mocker.patch("os.path.exists", return_value=True)
     config = Config()
     assert repr(config) == expected_config_repr
+
+def test_config_optional_items(mocker):
+    """Test Config class optional items."""
+    mocker.patch.object(configparser.ConfigParser, "read", return_value=[''])
+    mocker.patch("os.path.exists", return_value=True)
+    mocker.patch.object(Config, "get_config_item", side_effect=get_test_data_item)
+    config = Config()
+    assert config.concurrency == 4
+    assert config.executor == "thread"
+    assert config.cache_file == os.path.join("~", ".importphotos", "metadata.sqlite3")
+    assert config.cache_limit == 200000
+    assert config.cache_max_age == 180
+    assert config.copy_concurrency == 4
+    assert config.source_concurrency == 2
+    assert config.destination_concurrency == 4
+    assert config.journal_file == os.path.join("~", ".importphotos", "journal.jsonl")
+    assert config.log_file == ""
+    assert config.date_margin == ""
+    assert config.verify == "full"
+    assert config.fsync == "batch"
+    assert config.resumable_size == 1024
+    assert config.get_optional_config_item("DEFAULT", "missing", "default") == "default"
+    config.date_margin = "48"
+    config.validate()
+    assert config.date_margin == 48
+    config.date_margin = "-1"
+    with pytest.raises(configparser.Error):
+        config.validate()
+    config.date_margin = ""
+    config.executor = "fibers"
+    with pytest.raises(configparser.Error):
+        config.validate()
+    config.executor = "thread"
+    config.verify = "twice"
+    with pytest.raises(configparser.Error):
+        config.validate()
+    config.verify = "size"
+    config.fsync = "always"
+    with pytest.raises(configparser.Error):
+        config.validate()
+    config.fsync = "off"
+    config.executor = "process"
+    config.concurrency = "0"
+    with pytest.raises(configparser.Error):
+        config.validate()
+
+def test_config_source_dirs(mocker):
+    """Test Config class reads one source folder per line of source_dir."""
+    mocker.patch.object(configparser.ConfigParser, "read", return_value=[''])
+    mocker.patch("os.path.exists", return_value=True)
+    mocker.patch.object(Config, "get_config_item", side_effect=lambda group, key: "tests/data\n  tests/destination\n" if key == "source_dir" else get_test_data_item(group, key))
+    config = Config()
+    assert config.source_dirs == ("tests/data", "tests/destination")
+    assert config.source_dir == "tests/data"
+
+def test_config_destination_dirs(mocker):
+    """Test Config class reads the destination folder and its mirrors from the lines of destination_dir."""
+    mocker.patch.object(configparser.ConfigParser, "read", return_value=[''])
+    mocker.patch("os.path.exists", return_value=True)
+    mocker.patch.object(Config, "get_config_item", side_effect=lambda group, key: "tests/data\n  tests/destination\n" if key == "destination_dir" else get_test_data_item(group, key))
+    config = Config()
+    assert config.destination_dirs == ("tests/data", "tests/destination")
+    assert config.destination_dir == "tests/data"
+
+def test_config_watch(mocker):
+    """Test Config class watches the usual mount roots unless watch_dir lists others."""
+    mocker.patch.object(configparser.ConfigParser, "read", return_value=[''])
+    mocker.patch("os.path.exists", return_value=True)
+    mocker.patch.object(Config, "get_config_item", side_effect=get_test_data_item)
+    config = Config()
+    assert config.watch_dirs == mount_roots()
+    assert (config.watch_interval, config.watch_settle) == (2, 10)
+    mocker.patch.object(configparser.ConfigParser, "has_option", side_effect=lambda group, key: key == "watch_dir")
+    mocker.patch.object(Config, "get_config_item", side_effect=lambda group, key: "/mnt/cards\n  /media/cards\n" if key == "watch_dir" else get_test_data_item(group, key))
+    assert Config().watch_dirs == ("/mnt/cards", "/media/cards")
@@ -0,0 +1,101 @@
+"""Unit Tests for importphotos.dedup module."""
+import os
+
+from importphotos.dedup import Deduplicator, FileStatus, HashIndex, BLOCK_SIZE
+from importphotos.lib import Photo
+
+def write_photos(tmp_path, contents):
+    """Write test files and return them as photos."""
+    photos = []
+    for i, data in enumerate(contents):
+        (tmp_path / f"IMG_{i:04}.JPG").write_bytes(data)
+        photos.append(Photo(str(tmp_path / f"IMG_{i:04}.JPG")))
+    return photos
+
+def test_deduplicator_same(tmp_path):
+    """Test Deduplicator compares partial hashes and only hashes whole files when they match."""
+    head = b"h" * BLOCK_SIZE
+    tail = b"t" * BLOCK_SIZE
+    photos = write_photos(tmp_path, [head + b"a" * 100 + tail, head + b"b" * 100 + tail, head + b"a" * 100 + tail, b"small", b"small"])
+    deduplicator = Deduplicator()
+    assert not deduplicator.same(photos[0].path, photos[1].path)
+    assert deduplicator.same(photos[0].path, photos[2].path)
+    assert deduplicator.partial_hashed == 3
+    deduplicator.forget_seen()
+    assert deduplicator.seen(photos[3]) is None
+    assert deduplicator.full_hashed == 3
+    assert deduplicator.same(photos[3].path, photos[4].path)
+    assert deduplicator.full_hashed == 3
+    assert not deduplicator.same(photos[0].path, photos[3].path)
+
+def test_deduplicator_find(tmp_path):
+    """Test Deduplicator find returns the first candidate with the same content."""
+    photos = write_photos(tmp_path, [b"data", b"other", b"data"])
+    deduplicator = Deduplicator()
+    candidates = [photos[1].path, str(tmp_path / "missing.JPG"), photos[2].path]
+    assert deduplicator.find(photos[0].path, candidates) == photos[2].path
+    assert deduplicator.find(photos[1].path, [photos[0].path]) is None
+
+def test_deduplicator_find_statuses(tmp_path, mocker):
+    """Test Deduplicator find looks up the hashes of candidates with a known FileStatus without a stat, and stats them to hash them."""
+    photos = write_photos(tmp_path, [b"data", b"date", b"data"])
+    deduplicator = Deduplicator()
+    assert not deduplicator.same(photos[0].path, photos[1].path)
+    statuses = {photo.path: FileStatus(photo.stat.st_size, photo.stat.st_mtime_ns) for photo in photos}
+    stat = mocker.spy(os, "stat")
+    assert deduplicator.find(photos[0].path, [photos[1].path], photos[0].stat, statuses) is None
+    stat.assert_not_called()
+    assert deduplicator.find(photos[0].path, [photos[1].path, photos[2].path], photos[0].stat, statuses) == photos[2].path
+    assert [call.args[0] for call in stat.call_args_list] == [photos[2].path]
+    assert deduplicator.partial_hashed == 3
+
+def test_deduplicator_duplicates(tmp_path):
+    """Test Deduplicator duplicates buckets photos by size and hashes only buckets of several photos."""
+    photos = write_photos(tmp_path, [b"data", b"date", b"data", b"single", b"data"])
+    photos.append(Photo(str(tmp_path / "missing.JPG")))
+    deduplicator = Deduplicator()
+    assert deduplicator.duplicates(photos) == {photos[2]: photos[0], photos[4]: photos[0]}
+    assert deduplicator.partial_hashed == 4
+
+def test_deduplicator_hash_index(tmp_path):
+    """Test Deduplicator keeps hashes in the HashIndex so later runs do not read files again."""
+    photos = write_photos(tmp_path, [b"x" * (3 * BLOCK_SIZE), b"x" * (3 * BLOCK_SIZE)])
+    deduplicator = Deduplicator(HashIndex(str(tmp_path / "cache" / "hashes.sqlite3")))
+    assert deduplicator.same(photos[0].path, photos[1].path)
+    deduplicator.close()
+    deduplicator = Deduplicator(HashIndex(str(tmp_path / "cache" / "hashes.sqlite3")))
+    assert len(deduplicator.hashes) == 2
+    assert deduplicator.same(photos[0].path, photos[1].path)
+    assert deduplicator.partial_hashed == 0
+    assert deduplicator.full_hashed == 0
+    (tmp_path / "IMG_0001.JPG").write_bytes(b"y" * (3 * BLOCK_SIZE))
+    os.utime(tmp_path / "IMG_0001.JPG", ns=(0, 1))
+    assert not deduplicator.same(photos[0].path, photos[1].path)
+    assert deduplicator.partial_hashed == 1
+    deduplicator.close()
+    assert len(HashIndex(str(tmp_path / "cache" / "hashes.sqlite3"), rebuild=True)) == 0
+
+def test_deduplicator_str_repr(tmp_path):
+    """Test Deduplicator and HashIndex str and repr."""
+    hashes = HashIndex(str(tmp_path / "hashes.sqlite3"))
+    assert str(hashes) == f"HashIndex({tmp_path / 'hashes.sqlite3'})"
+    assert str(Deduplicator()) == "Deduplicator(0 partial hashes, 0 full hashes)"
+    assert repr(Deduplicator(hashes)) == f"Deduplicator(HashIndex({tmp_path / 'hashes.sqlite3'}, 0), 0, 0)"
+    hashes.close()
+
+def test_deduplicator_seen(tmp_path):
+    """Test Deduplicator seen finds photos with the content of an earlier one as they come."""
+    photos = write_photos(tmp_path, [b"data", b"single", b"date", b"data"])
+    deduplicator = Deduplicator()
+    assert [deduplicator.seen(photo) for photo in photos] == [None, None, None, photos[0]]
+    assert deduplicator.partial_hashed == 3
+
+def test_deduplicator_store_full_hash(tmp_path):
+    """Test Deduplicator uses a full hash stored from elsewhere and keeps it when hashing the ends of the file."""
+    photos = write_photos(tmp_path, [b"x" * (3 * BLOCK_SIZE), b"x" * (3 * BLOCK_SIZE)])
+    deduplicator = Deduplicator()
+    deduplicator.store_full_hash(photos[0].path, photos[0].stat, "stored")
+    deduplicator.partial_hash(photos[0].path, photos[0].stat)
+    assert deduplicator.full_hash(photos[0].path, photos[0].stat) == "stored"
+    assert not deduplicator.same(photos[0].path, photos[1].path)
+    assert deduplicator.full_hashed == 1
@@ -1,10 +1,14 @@
 """Unit Tests for importphotos.helpers.* modules."""
 import argparse
 import datetime
+import json
+import os
 
 from tabulate import tabulate
 
 import importphotos.helpers.cli
+import importphotos.helpers.log
+import importphotos.helpers.progress
 
 def test_find_last_space():
     """Test the _find_last_space function."""
@@ -131,3 +135,117 @@ def test_input_custom(mocker, capsys):
     assert importphotos.helpers.cli.input_custom('Enter a value', throw_error, 'Help text') == 'hi'
     captured = capsys.readouterr()
     assert captured.out == 'Help text\n'
+
+def test_progress_advance():
+    """Test the Progress advance and add methods."""
+    progress = importphotos.helpers.progress.Progress('Copying:', 2, 3000, tty=False)
+    progress.add(1, 1000)
+    progress.advance(1, 1000)
+    progress.advance(1, skipped=1000)
+    assert (progress.files, progress.size, progress.total_files, progress.total_size) == (2, 1000, 3, 3000)
+    assert progress.fraction() == 1000 / 3000
+    assert importphotos.helpers.progress.Progress(files=4).fraction() == 0.0
+    assert importphotos.helpers.progress.Progress().fraction() == 1.0
+
+def test_progress_throughput(mocker):
+    """Test the Progress throughput and eta methods."""
+    monotonic = mocker.patch('importphotos.helpers.progress.time.monotonic', return_value=100.0)
+    progress = importphotos.helpers.progress.Progress('Copying:', 2, 6000000, window=5.0, tty=False)
+    assert progress.throughput() == 0.0
+    assert progress.eta() is None
+    progress._sample()
+    progress.advance(1, 2000000)
+    monotonic.return_value = 102.0
+    progress._sample()
+    assert progress.throughput() == 1000000.0
+    assert progress.eta() == datetime.timedelta(seconds=4)
+    progress.advance(1, 1000000)
+    monotonic.return_value = 110.0
+    progress._sample()
+    assert len(progress._samples) == 2
+    assert progress.throughput() == 1000000 / 8
+
+def test_progress_log(capsys):
+    """Test the Progress logs a line when stdout is not a terminal."""
+    with importphotos.helpers.progress.Progress('Copying:', 2, 2000000, tty=False) as progress:
+        progress.advance(1, 1000000)
+        progress.advance(1, 1000000)
+    captured = capsys.readouterr()
+    assert "# Copying: 100.0% 2/2 files, 2.0/2.0 MB" in captured.out
+    assert '\r' not in captured.out
+    assert progress.draws == 0
+
+def test_progress_draw(mocker, capsys):
+    """Test the Progress draws a bar at most rate times a second on a terminal."""
+    mocker.patch('importphotos.helpers.progress.width', return_value=87)
+    with importphotos.helpers.progress.Progress('Copying:', 1000, tty=True, rate=50) as progress:
+        for _ in range(1000):
+            progress.advance()
+    captured = capsys.readouterr()
+    assert captured.out.startswith('\r# Copying: |')
+    assert "| 100.0% 1000/1000 " in captured.out
+    assert captured.out.endswith('#\r\n')
+    assert 1 <= progress.draws <= 10
+
+def test_width(mocker):
+    """Test the width function reads the terminal size once until refreshed."""
+    mocker.patch('importphotos.helpers.cli._width', None)
+    get_terminal_size = mocker.patch('shutil.get_terminal_size', return_value=os.terminal_size((120, 40)))
+    assert importphotos.helpers.cli.width() == 119
+    assert importphotos.helpers.cli.width() == 119
+    assert get_terminal_size.call_count == 1
+    get_terminal_size.return_value = os.terminal_size((60, 40))
+    importphotos.helpers.cli.refresh_width()
+    assert importphotos.helpers.cli.width() == 59
+
+def test_buffer_message(mocker, capsys):
+    """Test the buffer_message function prints messages in batches and before printed messages."""
+    mocker.patch('importphotos.helpers.cli.BATCH', 3)
+    importphotos.helpers.cli.buffer_message('First')
+    importphotos.helpers.cli.buffer_message('Second')
+    assert capsys.readouterr().out == ""
+    importphotos.helpers.cli.buffer_message('Third')
+    assert capsys.readouterr().out.count('\n') == 3
+    importphotos.helpers.cli.buffer_message('Fourth')
+    importphotos.helpers.cli.print_message('Fifth')
+    captured = capsys.readouterr()
+    assert captured.out.index('Fourth') < captured.out.index('Fifth')
+
+def test_log_levels(capsys):
+    """Test the Log class prints messages at or above its level."""
+    log = importphotos.helpers.log.Log(importphotos.helpers.log.WARNING)
+    log.debug('Detail')
+    log.info('Information')
+    log.warning('Problem')
+    log.error('Failure')
+    log.flush()
+    captured = capsys.readouterr()
+    assert 'Detail' not in captured.out
+    assert 'Information' not in captured.out
+    assert '# Problem ' in captured.out
+    assert '# Failure ' in captured.out
+    assert log.counts == {10: 1, 20: 1, 30: 1, 40: 1}
+    assert str(log) == 'Log(warning, None)'
+
+def test_log_file(tmp_path, capsys):
+    """Test the Log class writes every message to its file as JSON lines."""
+    path = tmp_path / 'logs' / 'import.jsonl'
+    log = importphotos.helpers.log.Log(importphotos.helpers.log.ERROR, str(path))
+    log.debug('IMG_0001.JPG -> 2021-01', path='/card/IMG_0001.JPG', status='copied')
+    log.warning('Failed to copy IMG_0002.JPG')
+    log.close()
+    assert capsys.readouterr().out == ""
+    records = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [record['level'] for record in records] == ['debug', 'warning']
+    assert records[0]['message'] == 'IMG_0001.JPG -> 2021-01'
+    assert records[0]['path'] == '/card/IMG_0001.JPG'
+    assert records[0]['status'] == 'copied'
+
+def test_log_configure(tmp_path, mocker):
+    """Test the configure function replaces the log of the module functions."""
+    mocker.patch('importphotos.helpers.log.log', importphotos.helpers.log.Log())
+    log = importphotos.helpers.log.configure(importphotos.helpers.log.INFO, str(tmp_path / 'import.jsonl'))
+    assert importphotos.helpers.log.log is log
+    importphotos.helpers.log.debug('Detail')
+    importphotos.helpers.log.close()
+    assert json.loads((tmp_path / 'import.jsonl').read_text(encoding='utf-8'))['message'] == 'Detail'
@@ -0,0 +1,115 @@
+"""Unit Tests for importphotos.index module."""
+import os
+import threading
+
+from importphotos import index as index_module
+from importphotos.index import DestinationIndex
+
+def test_index_get(tmp_path):
+    """Test DestinationIndex lists a folder once and reads sizes from it."""
+    (tmp_path / "IMG_0001.JPG").write_bytes(b"data")
+    (tmp_path / "2021-01").mkdir()
+    (tmp_path / ".importphotos-IMG_0003.JPG.part").write_bytes(b"part")
+    index = DestinationIndex()
+    assert index.get(str(tmp_path), "IMG_0001.JPG") == (4, os.stat(tmp_path / "IMG_0001.JPG").st_mtime_ns)
+    assert index.get(str(tmp_path), "IMG_0002.JPG") is None
+    assert index.get(str(tmp_path), "2021-01") is None
+    assert index.get(str(tmp_path), ".importphotos-IMG_0003.JPG.part") is None
+    (tmp_path / "IMG_0002.JPG").write_bytes(b"data")
+    assert index.get(str(tmp_path), "IMG_0002.JPG") is None
+    assert index.get(str(tmp_path / ".." / tmp_path.name), "IMG_0001.JPG")[0] == 4
+    assert index.scans == 1
+
+def test_index_missing_folder(tmp_path):
+    """Test DestinationIndex treats a missing folder as empty."""
+    index = DestinationIndex()
+    assert index.get(str(tmp_path / "missing"), "IMG_0001.JPG") is None
+    assert len(index) == 0
+
+def test_index_add_remove(tmp_path):
+    """Test DestinationIndex add and remove."""
+    index = DestinationIndex()
+    index.add(str(tmp_path), "IMG_0001.JPG", 10, 5)
+    assert index.get(str(tmp_path), "IMG_0001.JPG") == (10, 5)
+    index.add(str(tmp_path), "IMG_0002.JPG", 20)
+    assert index.get(str(tmp_path), "IMG_0002.JPG")[0] == 20
+    assert len(index) == 2
+    index.remove(str(tmp_path), "IMG_0001.JPG")
+    index.remove(str(tmp_path), "IMG_0003.JPG")
+    assert index.get(str(tmp_path), "IMG_0001.JPG") is None
+    assert len(index) == 1
+
+def test_index_refresh(tmp_path):
+    """Test DestinationIndex refresh lists again only the folders changed since they were listed."""
+    (tmp_path / "2021-01").mkdir()
+    (tmp_path / "2021-02").mkdir()
+    index = DestinationIndex()
+    assert index.get(str(tmp_path / "2021-01"), "IMG_0001.JPG") is None
+    assert index.get(str(tmp_path / "2021-02"), "IMG_0002.JPG") is None
+    assert index.get(str(tmp_path / "2021-03"), "IMG_0003.JPG") is None
+    assert index.refresh() == 0
+    (tmp_path / "2021-01" / "IMG_0001.JPG").write_bytes(b"data")
+    os.utime(tmp_path / "2021-01", ns=(1, 1))
+    (tmp_path / "2021-03").mkdir()
+    assert index.refresh() == 2
+    assert index.get(str(tmp_path / "2021-01"), "IMG_0001.JPG")[0] == 4
+    assert index.get(str(tmp_path / "2021-02"), "IMG_0002.JPG") is None
+    assert index.scans == 4
+
+def test_index_mark(tmp_path):
+    """Test DestinationIndex mark keeps a folder written through the index from being listed again by refresh."""
+    index = DestinationIndex()
+    reserved = index.reserve(str(tmp_path), "IMG_0001.JPG", 4)
+    (tmp_path / reserved).write_bytes(b"data")
+    os.utime(tmp_path, ns=(1, 1))
+    index.mark(str(tmp_path))
+    index.mark(str(tmp_path / "unlisted"))
+    assert index.refresh() == 0
+    assert index.scans == 1
+
+def test_index_threads(tmp_path, mocker):
+    """Test DestinationIndex lists a folder without blocking the other folders, and lists it once for the threads waiting on it."""
+    (tmp_path / "slow").mkdir()
+    (tmp_path / "fast").mkdir()
+    (tmp_path / "slow" / "IMG_0001.JPG").write_bytes(b"data")
+    listing = threading.Event()
+    release = threading.Event()
+    scan = index_module._scan
+    def slow_scan(folder):
+        if folder.endswith("slow"):
+            listing.set()
+            release.wait(5)
+        return scan(folder)
+    mocker.patch("importphotos.index._scan", side_effect=slow_scan)
+    index = DestinationIndex()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(index.get(str(tmp_path / "slow"), "IMG_0001.JPG"))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    assert listing.wait(5)
+    assert index.reserve(str(tmp_path / "fast"), "IMG_0001.JPG", 4) == "IMG_0001.JPG"
+    assert not results
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert [result[0] for result in results] == [4, 4]
+    assert index.scans == 2
+
+def test_index_str_repr(tmp_path):
+    """Test DestinationIndex str and repr."""
+    index = DestinationIndex()
+    index.add(str(tmp_path), "IMG_0001.JPG", 10, 5)
+    assert str(index) == "DestinationIndex(1 folders, 1 files)"
+    assert repr(index) == "DestinationIndex(1, 1, 1)"
+
+def test_index_reserve(tmp_path):
+    """Test DestinationIndex reserve picks a free name."""
+    (tmp_path / "IMG_0001.JPG").write_bytes(b"data")
+    index = DestinationIndex()
+    assert index.reserve(str(tmp_path), "IMG_0001.JPG", 5) == "IMG_0001_1.JPG"
+    assert index.reserve(str(tmp_path), "IMG_0001.JPG", 6) == "IMG_0001_2.JPG"
+    assert index.reserve(str(tmp_path), "IMG_0002.JPG", 4) == "IMG_0002.JPG"
+    assert sorted(index.same_size(str(tmp_path), 4)) == ["IMG_0001.JPG", "IMG_0002.JPG"]
+    assert index.same_size(str(tmp_path), 5) == ["IMG_0001_1.JPG"]
+    status = index.files_of_size(str(tmp_path), 4)[os.path.normcase("IMG_0001.JPG")]
+    assert (status.st_size, status.st_mtime_ns) == (4, os.stat(tmp_path / "IMG_0001.JPG").st_mtime_ns)
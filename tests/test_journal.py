@@ -0,0 +1,67 @@
+"""Unit Tests for importphotos.journal module."""
+import json
+import os
+
+from importphotos.journal import Journal, replay, DISCOVERED, DATED, COPIED, VERIFIED, DELETED
+
+def test_journal_record_replay(tmp_path):
+    """Test Journal appends records and replays the latest state of each file."""
+    (tmp_path / "IMG_0001.JPG").write_bytes(b"data")
+    stat = os.stat(tmp_path / "IMG_0001.JPG")
+    journal = Journal(str(tmp_path / "journal" / "journal.jsonl"))
+    journal.record(DISCOVERED, str(tmp_path / "IMG_0001.JPG"))
+    journal.record(DATED, str(tmp_path / "IMG_0001.JPG"), stat, date_taken="2021-01-01T00:00:00")
+    journal.record(COPIED, str(tmp_path / "IMG_0001.JPG"), stat, destination="/library/IMG_0001.JPG")
+    journal.record(DISCOVERED, str(tmp_path / "IMG_0002.JPG"))
+    journal.close()
+    entries = replay(str(tmp_path / "journal" / "journal.jsonl"))
+    assert entries[str(tmp_path / "IMG_0001.JPG")]["state"] == COPIED
+    assert entries[str(tmp_path / "IMG_0001.JPG")]["date_taken"] == "2021-01-01T00:00:00"
+    assert entries[str(tmp_path / "IMG_0002.JPG")]["state"] == DISCOVERED
+    journal = Journal(str(tmp_path / "journal" / "journal.jsonl"), resume=True)
+    assert journal.reached(str(tmp_path / "IMG_0001.JPG"), stat, COPIED)
+    assert not journal.reached(str(tmp_path / "IMG_0001.JPG"), stat, VERIFIED)
+    assert journal.state(str(tmp_path / "IMG_0001.JPG"), stat)["destination"] == "/library/IMG_0001.JPG"
+    journal.record(DISCOVERED, str(tmp_path / "IMG_0001.JPG"))
+    journal.close()
+    assert replay(str(tmp_path / "journal" / "journal.jsonl"))[str(tmp_path / "IMG_0001.JPG")]["state"] == COPIED
+    assert len(Journal(str(tmp_path / "journal" / "journal.jsonl")).entries) == 0
+
+def test_journal_changed_file(tmp_path):
+    """Test Journal starts again for a file that changed since it was recorded."""
+    (tmp_path / "IMG_0001.JPG").write_bytes(b"data")
+    stat = os.stat(tmp_path / "IMG_0001.JPG")
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    journal.record(COPIED, str(tmp_path / "IMG_0001.JPG"), stat, destination="/library/IMG_0001.JPG")
+    (tmp_path / "IMG_0001.JPG").write_bytes(b"other data")
+    changed = os.stat(tmp_path / "IMG_0001.JPG")
+    journal.record(DATED, str(tmp_path / "IMG_0001.JPG"), changed, date_taken="2021-01-01T00:00:00")
+    journal.close()
+    journal = Journal(str(tmp_path / "journal.jsonl"), resume=True)
+    assert journal.state(str(tmp_path / "IMG_0001.JPG"), stat) is None
+    assert journal.state(str(tmp_path / "IMG_0001.JPG"), changed)["state"] == DATED
+    assert "destination" not in journal.state(str(tmp_path / "IMG_0001.JPG"), changed)
+    journal.close()
+
+def test_journal_truncated(tmp_path):
+    """Test replay ignores a record cut short by a crash."""
+    with open(tmp_path / "journal.jsonl", "w", encoding="utf-8") as file:
+        file.write(json.dumps({"state": DELETED, "path": "/card/IMG_0001.JPG"}) + "\n")
+        file.write('{"state": "copied", "path": "/card/IMG_00')
+    assert replay(str(tmp_path / "journal.jsonl")) == {"/card/IMG_0001.JPG": {"state": DELETED, "path": "/card/IMG_0001.JPG"}}
+    assert replay(str(tmp_path / "missing.jsonl")) == {}
+
+def test_journal_batches_syncs(tmp_path, mocker):
+    """Test Journal syncs to disk in batches."""
+    mocker.patch("importphotos.journal.SYNC_EVERY", 3)
+    mocker.patch("importphotos.journal.SYNC_INTERVAL", 3600)
+    fsync = mocker.patch("os.fsync")
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    for i in range(7):
+        journal.record(DISCOVERED, f"IMG_{i:04}.JPG")
+    assert fsync.call_count == 2
+    assert journal.pending == 1
+    journal.close()
+    assert fsync.call_count == 3
+    assert str(journal) == f"Journal({tmp_path / 'journal.jsonl'}, 0 files replayed)"
+    assert repr(journal) == f"Journal({tmp_path / 'journal.jsonl'}, 0, 3)"
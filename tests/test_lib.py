@@ -1,11 +1,20 @@
 """Unit Tests for importphotos.lib module."""
 import datetime
+import errno
+import os
 import pytest
 import shutil
 
 from PIL import Image
 
-from importphotos.lib import Job, DeleteJob, ImportJob, Folder, Photo
+from importphotos.cache import MetadataCache
+from importphotos.helpers import log
+from importphotos.journal import Journal, replay, COPIED as JOURNAL_COPIED, DELETED
+from importphotos.lib import Job, DeleteJob, ImportJob, Folder, Photo, pair_photos, COPIED, MOVED, SKIPPED, ERRORED, VERIFY_FULL, VERIFY_SIZE
+from importphotos.metadata import Metadata
+from importphotos.profiler import Profiler, WALK, DATES, CHECKS, COPY, DELETE
+from importphotos import transfer
+from importphotos.transfer import AtomicWriter, BUFFERED, REFLINK, FSYNC_BATCH, FSYNC_OFF
 
 def test_job_init(mocker):
     """Test Job class init."""
@@ -205,14 +214,17 @@ def test_import_job_execute_copy(mocker, capsys):
     taken = datetime.datetime.fromisoformat("2021-01-01:00:00:00")
     mocker.patch("os.path.exists", return_value=True)
     mocker.patch("importphotos.lib.Photo._get_date_taken", return_value= taken)
-    mocker.patch("shutil.copy", side_effect=[None, shutil.SameFileError("Error")] )
+    mocker.patch("importphotos.lib.AtomicWriter.copy", side_effect=[(BUFFERED, "tests/destination/.copy"), shutil.SameFileError("Error")])
+    mocker.patch("importphotos.lib.AtomicWriter.commit")
     folder = Folder("tests/data")
     photo = Photo("tests/data/IMG_20210101_000000.ARW")
     second_photo = Photo("tests/data/IMG_20210102_000000.ARW")
     folder.add_photo(photo)
     folder.add_photo(second_photo)
     job = ImportJob(folder, "tests/destination", False)
-    mocker.patch("os.path.exists", side_effect=[True, False, False])
+    mocker.patch("importphotos.lib.Photo.stat", new_callable=mocker.PropertyMock, return_value=mocker.Mock(st_size=1000, st_dev=1))
+    mocker.patch("importphotos.lib.Deduplicator.duplicates", return_value={})
+    mocker.patch("importphotos.lib.Deduplicator.find", return_value=None)
     copied, errored, skipped = job.execute(1)
 
     captured = capsys.readouterr()
@@ -226,11 +238,14 @@ def test_import_job_execute_skip(mocker, capsys):
     taken = datetime.datetime.fromisoformat("2021-01-01:00:00:00")
     mocker.patch("os.path.exists", return_value=True)
     mocker.patch("importphotos.lib.Photo._get_date_taken", return_value= taken)
-    mocker.patch("shutil.copy", return_value=None)
+    mocker.patch("importphotos.lib.AtomicWriter.copy", return_value=(BUFFERED, "tests/destination/.copy"))
     folder = Folder("tests/data")
     photo = Photo("tests/data/IMG_20210101_000000.ARW")
     folder.add_photo(photo)
     job = ImportJob(folder, "tests/destination", False)
+    mocker.patch("importphotos.lib.Photo.stat", new_callable=mocker.PropertyMock, return_value=mocker.Mock(st_size=1000, st_dev=1))
+    mocker.patch("importphotos.lib.Deduplicator.duplicates", return_value={})
+    mocker.patch("importphotos.lib.Deduplicator.find", return_value="tests/destination/IMG_20210101_000000.ARW")
     copied, errored, skipped = job.execute(1)
 
     captured = capsys.readouterr()
@@ -244,12 +259,14 @@ def test_import_job_execute_error(mocker, capsys):
     taken = datetime.datetime.fromisoformat("2021-01-01:00:00:00")
     mocker.patch("os.path.exists", return_value=True)
     mocker.patch("importphotos.lib.Photo._get_date_taken", return_value= taken)
-    mocker.patch("shutil.copy", side_effect=shutil.Error("Error"))
+    mocker.patch("importphotos.lib.AtomicWriter.copy", side_effect=shutil.Error("Error"))
     folder = Folder("tests/data")
     photo = Photo("tests/data/IMG_20210101_000000.ARW")
     folder.add_photo(photo)
     job = ImportJob(folder, "tests/destination", False)
-    mocker.patch("os.path.exists", side_effect=[True, False])
+    mocker.patch("importphotos.lib.Photo.stat", new_callable=mocker.PropertyMock, return_value=mocker.Mock(st_size=1000, st_dev=1))
+    mocker.patch("importphotos.lib.Deduplicator.duplicates", return_value={})
+    mocker.patch("importphotos.lib.Deduplicator.find", return_value=None)
     copied, errored, skipped = job.execute(1)
     captured = capsys.readouterr()
     print(captured.out)
@@ -263,14 +280,17 @@ def test_import_job_execute_verbose(mocker, capsys):
     taken = datetime.datetime.fromisoformat("2021-01-01:00:00:00")
     mocker.patch("os.path.exists", return_value=True)
     mocker.patch("importphotos.lib.Photo._get_date_taken", return_value= taken)
-    mocker.patch("shutil.copy", side_effect=[None, shutil.Error("Error")])
+    mocker.patch("importphotos.lib.AtomicWriter.copy", side_effect=[(REFLINK, "tests/destination/.copy"), shutil.Error("Error")])
+    mocker.patch("importphotos.lib.AtomicWriter.commit")
     folder = Folder("tests/data")
     photo = Photo("tests/data/IMG_20210101_000000.ARW")
     folder.add_photo(photo)
     folder.add_photo(photo)
     folder.add_photo(photo)
     job = ImportJob(folder, "tests/destination", False)
-    mocker.patch("os.path.exists", side_effect=[True, False, True, False])
+    mocker.patch("importphotos.lib.Photo.stat", new_callable=mocker.PropertyMock, return_value=mocker.Mock(st_size=1000, st_dev=1))
+    mocker.patch("importphotos.lib.Deduplicator.duplicates", return_value={})
+    mocker.patch("importphotos.lib.Deduplicator.find", side_effect=[None, "tests/destination/IMG_20210101_000000.ARW", None])
     copied, errored, skipped = job.execute(1, True)
 
     captured = capsys.readouterr()
@@ -279,12 +299,224 @@ def test_import_job_execute_verbose(mocker, capsys):
     assert "Skipped 1 files with duplicates in destination" in captured.out
     assert "Errored out on 1 files" in captured.out
     assert "Copied files:" in captured.out
-    assert "IMG_20210101_000000.ARW -> tests/destination" in captured.out
+    assert "IMG_20210101_000000.ARW -> tests/destination (reflink)" in captured.out
+    assert "Copied with reflink 1" in captured.out
     assert "Errored files:" in captured.out
     assert "IMG_20210101_000000.ARW" in captured.out
     assert "Skipped files:" in captured.out
     assert "IMG_20210101_000000.ARW == tests/destination" in captured.out
 
+def test_import_job_import_photo(mocker):
+    """Test ImportJob class import_photo."""
+    taken = datetime.datetime.fromisoformat("2021-01-01:00:00:00")
+    mocker.patch("os.path.exists", return_value=True)
+    mocker.patch("importphotos.lib.Photo._get_date_taken", return_value= taken)
+    folder = Folder("tests/data")
+    photo = Photo("tests/data/IMG_20210101_000000.ARW")
+    folder.add_photo(photo)
+    job = ImportJob(folder, "tests/destination", False)
+    mocker.patch("importphotos.lib.Photo.stat", new_callable=mocker.PropertyMock, return_value=mocker.Mock(st_size=1000, st_dev=1))
+    find = mocker.patch("importphotos.lib.Deduplicator.find", return_value="tests/destination/IMG_20210101_000000.ARW")
+    assert job.photos == [photo]
+    assert job.import_photo(photo) == SKIPPED
+    find.return_value = None
+    mocker.patch("importphotos.lib.AtomicWriter.copy", side_effect=[(BUFFERED, "tests/destination/.copy"), PermissionError("Error")])
+    commit = mocker.patch("importphotos.lib.AtomicWriter.commit")
+    assert job.import_photo(photo) == COPIED
+    assert commit.call_args.args[:2] == ("tests/destination/.copy", os.path.join("tests/destination", photo.filename))
+    assert job.import_photo(photo) == ERRORED
+
+def test_import_job_import_photo_move(tmp_path, mocker, capsys):
+    """Test ImportJob class import_photo renames photos on the same device when moving."""
+    (tmp_path / "source").mkdir()
+    folder = Folder(str(tmp_path / "source"))
+    for name in ("IMG_0001.JPG", "IMG_0002.JPG"):
+        (tmp_path / "source" / name).write_bytes(name.encode())
+        folder.add_photo(Photo(str(tmp_path / "source" / name)))
+    job = ImportJob(folder, str(tmp_path / "destination"), False, True)
+    statuses = [job.import_photo(folder.photos[0])]
+    assert statuses == [MOVED]
+    assert not (tmp_path / "source" / "IMG_0001.JPG").exists()
+    assert (tmp_path / "destination" / "IMG_0001.JPG").read_bytes() == b"IMG_0001.JPG"
+    mocker.patch.object(ImportJob, "device", new_callable=mocker.PropertyMock, return_value=-1)
+    statuses.append(job.import_photo(folder.photos[1]))
+    assert statuses[1] == COPIED
+    assert (tmp_path / "source" / "IMG_0002.JPG").exists()
+    assert job.finish(statuses) == (folder.photos, [], [])
+    assert job.moved_files == [folder.photos[0]]
+    assert "Moved 1 files on the same device by renaming" in capsys.readouterr().out
+    mocker.patch("importphotos.lib.Photo._get_date_taken", return_value=datetime.datetime(2021, 1, 1))
+    jobs = job.sort_files_by_date()
+    assert all(sorted_job.move for sorted_job in jobs.values())
+
+def test_import_job_import_photo_verify(tmp_path, mocker, capsys):
+    """Test ImportJob class import_photo verifies copies and DeleteJob only deletes verified photos."""
+    (tmp_path / "source").mkdir()
+    folder = Folder(str(tmp_path / "source"))
+    for name in ("IMG_0001.JPG", "IMG_0002.JPG", "IMG_0003.JPG"):
+        (tmp_path / "source" / name).write_bytes(name.encode() * 100)
+        folder.add_photo(Photo(str(tmp_path / "source" / name)))
+    mocker.patch.object(Photo, "journal", Journal(str(tmp_path / "journal.jsonl")))
+    mocker.patch.object(ImportJob, "device", new_callable=mocker.PropertyMock, return_value=-1)
+    job = ImportJob(folder, str(tmp_path / "destination"), False, True, verify=VERIFY_FULL)
+    assert job.import_photo(folder.photos[0]) == COPIED
+    checksum = folder.photos[0].checksum
+    assert checksum == job.deduplicator.full_hash(str(tmp_path / "destination" / "IMG_0001.JPG"), os.stat(tmp_path / "destination" / "IMG_0001.JPG"))
+    assert job.deduplicator.full_hashed == 0
+    mocker.patch("importphotos.lib.hash_file", return_value="corrupt")
+    assert job.import_photo(folder.photos[1], True) == ERRORED
+    assert folder.photos[1].checksum is None
+    assert not (tmp_path / "destination" / "IMG_0002.JPG").exists()
+    log.flush()
+    assert "Copy does not match the source" in capsys.readouterr().out
+    job.verify = VERIFY_SIZE
+    assert job.import_photo(folder.photos[2]) == COPIED
+    assert folder.photos[2].checksum is not None
+    delete_job = DeleteJob(folder, True)
+    deleted, errored = delete_job.execute(1)
+    assert deleted == [folder.photos[0], folder.photos[2]]
+    assert errored == []
+    assert delete_job.unverified_files == [folder.photos[1]]
+    assert (tmp_path / "source" / "IMG_0002.JPG").exists()
+    assert "Kept 1 files whose copy was not verified" in capsys.readouterr().out
+    Photo.journal.close()
+    entries = replay(str(tmp_path / "journal.jsonl"))
+    assert entries[os.path.abspath(folder.photos[0].path)]["checksum"] == checksum
+    assert entries[os.path.abspath(folder.photos[0].path)]["state"] == DELETED
+    assert os.path.abspath(folder.photos[1].path) not in entries
+
+def test_import_job_import_photo_verify_errors(tmp_path, mocker):
+    """Test ImportJob class import_photo counts a copy whose read back or rename fails as errored and removes it."""
+    (tmp_path / "source").mkdir()
+    folder = Folder(str(tmp_path / "source"))
+    for name in ("IMG_0001.JPG", "IMG_0002.JPG"):
+        (tmp_path / "source" / name).write_bytes(name.encode() * 100)
+        folder.add_photo(Photo(str(tmp_path / "source" / name)))
+    job = ImportJob(folder, str(tmp_path / "destination"), verify=VERIFY_FULL, writer=AtomicWriter(FSYNC_OFF))
+    mocker.patch("importphotos.lib.hash_file", side_effect=OSError(errno.EIO, "Input/output error"))
+    assert job.import_photo(folder.photos[0]) == ERRORED
+    mocker.stopall()
+    mocker.patch("importphotos.transfer.os.replace", side_effect=OSError(errno.EIO, "Input/output error"))
+    assert job.import_photo(folder.photos[1]) == ERRORED
+    assert folder.photos[1].checksum is None
+    assert os.listdir(tmp_path / "destination") == []
+    assert job.index.get(str(tmp_path / "destination"), "IMG_0002.JPG") is None
+
+def test_import_job_finish_uncommitted(tmp_path, mocker):
+    """Test ImportJob class finish counts a batched copy the writer fails to rename once it is synced as errored."""
+    (tmp_path / "source").mkdir()
+    folder = Folder(str(tmp_path / "source"))
+    for name in ("IMG_0001.JPG", "IMG_0002.JPG"):
+        (tmp_path / "source" / name).write_bytes(name.encode() * 100)
+        folder.add_photo(Photo(str(tmp_path / "source" / name)))
+    job = ImportJob(folder, str(tmp_path / "destination"), verify=VERIFY_FULL, writer=AtomicWriter(FSYNC_BATCH, batch=10))
+    statuses = [job.import_photo(photo) for photo in folder.photos]
+    assert statuses == [COPIED, COPIED]
+    assert sorted(os.listdir(tmp_path / "destination")) == [".importphotos-IMG_0001.JPG.part", ".importphotos-IMG_0002.JPG.part"]
+    replace = os.replace
+    def failing(source, destination):
+        if destination.endswith("IMG_0002.JPG"):
+            raise OSError(errno.EIO, "Input/output error")
+        replace(source, destination)
+    mocker.patch("importphotos.transfer.os.replace", side_effect=failing)
+    assert job.finish(statuses) == ([folder.photos[0]], [folder.photos[1]], [])
+    assert folder.photos[1].checksum is None
+    assert os.listdir(tmp_path / "destination") == ["IMG_0001.JPG"]
+    assert job.index.get(str(tmp_path / "destination"), "IMG_0002.JPG") is None
+
+def test_import_job_import_photo_mirrors(tmp_path, mocker, capsys):
+    """Test ImportJob class import_photo reads a photo once for all destinations and decides for each on its own."""
+    (tmp_path / "source").mkdir()
+    (tmp_path / "backup").mkdir()
+    folder = Folder(str(tmp_path / "source"))
+    for name in ("IMG_0001.JPG", "IMG_0002.JPG"):
+        (tmp_path / "source" / name).write_bytes(name.encode() * 100)
+        folder.add_photo(Photo(str(tmp_path / "source" / name)))
+    (tmp_path / "backup" / "IMG_0002.JPG").write_bytes(b"IMG_0002.JPG" * 100)
+    copy_to_many = mocker.spy(transfer, "copy_to_many")
+    job = ImportJob(folder, str(tmp_path / "library"), False, True, verify=VERIFY_FULL, mirrors=[str(tmp_path / "backup")])
+    statuses = [job.import_photo(photo) for photo in folder.photos]
+    assert statuses == [COPIED, COPIED]
+    assert copy_to_many.call_count == 1
+    assert job.mirror_statuses[str(tmp_path / "backup")] == {folder.photos[0]: COPIED, folder.photos[1]: SKIPPED}
+    assert sorted(os.listdir(tmp_path / "library")) == ["IMG_0001.JPG", "IMG_0002.JPG"]
+    assert (tmp_path / "backup" / "IMG_0001.JPG").read_bytes() == b"IMG_0001.JPG" * 100
+    assert all(photo.checksum is not None for photo in folder.photos)
+    assert all((tmp_path / "source" / photo.filename).exists() for photo in folder.photos)
+    job.finish(statuses)
+    assert job.mirror_results[str(tmp_path / "backup")] == ([folder.photos[0]], [], [folder.photos[1]])
+    assert "# Mirrored 1 files to " in capsys.readouterr().out
+    mocker.patch("importphotos.lib.Photo._get_date_taken", return_value=datetime.datetime(2021, 1, 1))
+    assert [sorted_job.mirror_folders for sorted_job in job.sort_files_by_date().values()] == [[str(tmp_path / "backup" / "2021-01")]]
+
+def test_import_job_import_photo_duplicates(tmp_path, capsys):
+    """Test ImportJob class import_photo skips duplicates under any name and renames name collisions."""
+    (tmp_path / "source").mkdir()
+    (tmp_path / "destination").mkdir()
+    folder = Folder(str(tmp_path / "source"))
+    for name, data in (("IMG_0001.JPG", b"data"), ("IMG_0002.JPG", b"data2"), ("IMG_0003.JPG", b"data3"), ("IMG_0004.JPG", b"data3")):
+        (tmp_path / "source" / name).write_bytes(data)
+        folder.add_photo(Photo(str(tmp_path / "source" / name)))
+    (tmp_path / "destination" / "renamed.JPG").write_bytes(b"data")
+    (tmp_path / "destination" / "IMG_0002.JPG").write_bytes(b"other")
+    job = ImportJob(folder, str(tmp_path / "destination"))
+    job.start(1)
+    assert job.duplicates == {folder.photos[3]: folder.photos[2]}
+    statuses = [job.import_photo(photo) for photo in folder.photos]
+    assert statuses == [SKIPPED, COPIED, COPIED, SKIPPED]
+    assert (tmp_path / "destination" / "IMG_0002.JPG").read_bytes() == b"other"
+    assert (tmp_path / "destination" / "IMG_0002_1.JPG").read_bytes() == b"data2"
+    assert job.import_photo(folder.photos[1]) == SKIPPED
+    assert job.index.scans == 1
+    assert job.finish(statuses, True) == (folder.photos[1:3], [], [folder.photos[0], folder.photos[3]])
+    assert job.renamed_files == {folder.photos[1].path: "IMG_0002_1.JPG"}
+    captured = capsys.readouterr()
+    assert "Skipped 2 files with duplicates in destination" in captured.out
+    assert "Renamed 1 files with a different file of the same name in destination" in captured.out
+    assert "IMG_0002.JPG -> IMG_0002_1.JPG" in captured.out
+
+def test_import_job_resume(tmp_path, mocker, capsys):
+    """Test ImportJob class resumes from the journal without copying photos again."""
+    (tmp_path / "source").mkdir()
+    for name in ("IMG_0001.JPG", "IMG_0002.JPG"):
+        (tmp_path / "source" / name).write_bytes(name.encode())
+    mocker.patch("importphotos.lib.read_metadata", return_value=Metadata(datetime.datetime(2021, 1, 1), {"Make": "Sony"}, 100))
+    mocker.patch.object(Photo, "journal", Journal(str(tmp_path / "journal.jsonl")))
+    folder = Folder(str(tmp_path / "source"))
+    folder.get_files_with_extension((".JPG",))
+    folder.photos.sort(key=lambda photo: photo.filename)
+    folder.extract_dates()
+    job = ImportJob(folder, str(tmp_path / "destination"))
+    job.start(1)
+    assert job.import_photo(folder.photos[0]) == COPIED
+    Photo.journal.close()
+    mocker.patch.object(Photo, "journal", Journal(str(tmp_path / "journal.jsonl"), resume=True))
+    read_metadata = mocker.patch("importphotos.lib.read_metadata")
+    copy_file = mocker.spy(transfer, "copy_file")
+    folder = Folder(str(tmp_path / "source"))
+    folder.get_files_with_extension((".JPG",))
+    folder.photos.sort(key=lambda photo: photo.filename)
+    folder.extract_dates()
+    assert [photo.date_taken for photo in folder.photos] == [datetime.datetime(2021, 1, 1)] * 2
+    assert folder.photos[0].tags == {"Make": "Sony"}
+    read_metadata.assert_not_called()
+    job = ImportJob(folder, str(tmp_path / "destination"))
+    job.start(1)
+    statuses = [job.import_photo(photo) for photo in folder.photos]
+    assert statuses == [COPIED, COPIED]
+    assert copy_file.call_count == 1
+    assert job.resumed_files == [folder.photos[0]]
+    job.finish(statuses)
+    assert "Resumed 1 files copied by an earlier run" in capsys.readouterr().out
+    delete_folder = Folder(str(tmp_path / "source"))
+    delete_folder.add_photo(folder.photos[0])
+    DeleteJob(delete_folder).execute(1)
+    Photo.journal.close()
+    entries = replay(str(tmp_path / "journal.jsonl"))
+    assert entries[os.path.abspath(folder.photos[0].path)]["state"] == DELETED
+    assert entries[os.path.abspath(folder.photos[1].path)]["state"] == JOURNAL_COPIED
+    assert entries[os.path.abspath(folder.photos[1].path)]["destination"] == str(tmp_path / "destination" / "IMG_0002.JPG")
+
 def test_import_job_sort_files_by_date_one_folder(mocker):
     """Test ImportJob class sort_files_by_date."""
     taken = datetime.datetime.fromisoformat("2021-01-01:00:00:00")
@@ -398,43 +630,212 @@ def test_folder_add_photo(mocker):
     folder.add_photo(photo)
     assert folder.photos == [photo]
 
-def test_folder_get_files_with_extension_no_recurse(mocker, capsys):
+def test_folder_get_files_with_extension_no_recurse(tmp_path, capsys):
     """Test Folder class get_files_with_extension."""
-    taken = datetime.datetime.fromisoformat("2021-01-01:00:00:00")
-    mocker.patch("os.path.exists", return_value=True)
-    mocker.patch("importphotos.lib.Photo._get_date_taken", return_value= taken)
-    mocker.patch("os.walk", return_value=[("tests\\data", [], ["IMG_20210101_000000.ARW", "IMG_20210101_000001.JPG"])])
-    folder = Folder("tests\\data")
+    (tmp_path / "dir").mkdir()
+    for name in ("IMG_20210101_000000.ARW", "IMG_20210101_000001.JPG", "dir/IMG_20210101_000002.ARW"):
+        (tmp_path / name).write_bytes(b"data")
+    folder = Folder(str(tmp_path))
     found_photos = folder.get_files_with_extension((".ARW"))
     assert found_photos == 1
     assert folder.photos[0].filename == "IMG_20210101_000000.ARW"
     captured = capsys.readouterr()
-    assert "Found 2 files in tests\\data" in captured.out
-    assert "Found 1 .ARW total in tests\\data" in captured.out
-    folder = Folder("tests\\data")
+    assert f"Found 2 files in {tmp_path}" in captured.out
+    assert f"Found 1 .ARW total in {tmp_path}" in captured.out
+    folder = Folder(str(tmp_path))
     found_photos = folder.get_files_with_extension((".ARW"), False, True)
     captured = capsys.readouterr()
     assert found_photos == 1
-    assert "1 Selected from tests\\data" in captured.out
-    assert "0 folders in tests\\data" in captured.out
+    assert f"1 Selected from {tmp_path}" in captured.out
+    assert f"1 folders in {tmp_path}" in captured.out
     assert "IMG_20210101_000000.ARW" in captured.out
-    assert "1 Not selected from tests\\data" in captured.out
-    assert "tests\\data\\IMG_20210101_000001.JPG" in captured.out
+    assert f"1 Not selected from {tmp_path}" in captured.out
+    assert "IMG_20210101_000001.JPG" in captured.out
+    assert "IMG_20210101_000002.ARW" not in captured.out
 
-def test_folder_get_files_with_extension_recurse(mocker, capsys):
+def test_folder_get_files_with_extension_recurse(tmp_path, capsys):
     """Test Folder class get_files_with_extension."""
-    taken = datetime.datetime.fromisoformat("2021-01-01:00:00:00")
-    mocker.patch("os.path.exists", return_value=True)
-    mocker.patch("importphotos.lib.Photo._get_date_taken", return_value= taken)
-    mocker.patch("os.walk", return_value=[
-        ("tests\\data", ["dir"], ["IMG_20210101_000000.ARW", "IMG_20210101_000001.JPG"]),
-        ("tests\\data\\dir", [], ["IMG_20210101_000002.ARW"])
-    ])
-    folder = Folder("tests\\data")
+    (tmp_path / "dir").mkdir()
+    (tmp_path / ".Trashes").mkdir()
+    for name in ("IMG_20210101_000000.ARW", "IMG_20210101_000001.JPG", "dir/IMG_20210101_000002.arw", ".Trashes/IMG_20210101_000003.ARW"):
+        (tmp_path / name).write_bytes(b"data")
+    folder = Folder(str(tmp_path))
     found_photos = folder.get_files_with_extension((".ARW"), recurse=True)
     assert found_photos == 2
     assert folder.photos[0].filename == "IMG_20210101_000000.ARW"
-    assert folder.photos[1].filename == "IMG_20210101_000002.ARW"
+    assert folder.photos[1].filename == "IMG_20210101_000002.arw"
+    assert folder.photos[1].stat.st_size == 4
+    captured = capsys.readouterr()
+    assert f"Found 1 files in {tmp_path / 'dir'}" in captured.out
+
+def test_folder_iter_photos(tmp_path):
+    """Test Folder class iter_photos yields photos with the extensions."""
+    (tmp_path / "sub").mkdir()
+    for name in ("IMG_0001.JPG", "IMG_0002.arw", "notes.txt", "sub/IMG_0003.JPG"):
+        (tmp_path / name).write_bytes(b"data")
+    folder = Folder(str(tmp_path))
+    assert sorted(photo.filename for photo in folder.iter_photos((".JPG", ".ARW"))) == ["IMG_0001.JPG", "IMG_0002.arw"]
+    assert sorted(photo.filename for photo in folder.iter_photos((".JPG",), True)) == ["IMG_0001.JPG", "IMG_0003.JPG"]
+    assert folder.photos == []
+
+def test_profiler_stages(tmp_path, mocker):
+    """Test the stages of an import are recorded with a profiler."""
+    (tmp_path / "card").mkdir()
+    for name in ("IMG_0001.JPG", "IMG_0002.JPG"):
+        (tmp_path / "card" / name).write_bytes(name.encode())
+    profiler = Profiler()
+    mocker.patch.object(Photo, "profiler", profiler)
+    mocker.patch("importphotos.lib.read_date", side_effect=lambda path: (datetime.datetime(2021, 1, 1), 12, {}))
+    folder = Folder(str(tmp_path / "card"))
+    folder.get_files_with_extension(".JPG")
+    folder.extract_dates()
+    ImportJob(folder, str(tmp_path / "library")).execute(1)
+    delete_folder = Folder(str(tmp_path / "card"))
+    delete_folder.add_photo(folder.photos[0])
+    DeleteJob(delete_folder).execute(2)
+    report = profiler.report()
+    assert list(report) == [WALK, DATES, CHECKS, COPY, DELETE]
+    assert [report[stage]["files"] for stage in report] == [2, 2, 2, 2, 1]
+    assert report[DATES]["read"] == 24
+    assert report[COPY]["read"] == report[COPY]["written"] == 24
+
+def test_pair_photos():
+    """Test pair_photos pairs files of a folder with the same name, led by the JPEG."""
+    raw = Photo("card/100CANON/IMG_0001.CR2")
+    jpeg = Photo("card/100CANON/IMG_0001.jpg")
+    video = Photo("card/100CANON/MVI_0002.MP4")
+    other = Photo("card/101CANON/IMG_0001.CR2")
+    assert pair_photos([raw, video, jpeg, other]) == [jpeg, raw, video, other]
+    assert raw.pair is jpeg.pair
+    assert raw.pair == [jpeg, raw]
+    assert raw.partner is jpeg
+    assert jpeg.partner is None
+    assert video.pair is None
+    assert other.pair is None
+
+def test_folder_iter_photos_pairs(tmp_path):
+    """Test Folder class iter_photos yields the files of a pair together."""
+    for name in ("IMG_0001.CR2", "IMG_0002.JPG", "IMG_0001.JPG", "IMG_0003.CR2"):
+        (tmp_path / name).write_bytes(name.encode())
+    photos = list(Folder(str(tmp_path)).iter_photos((".JPG", ".CR2")))
+    assert len(photos) == 4
+    raw = next(photo for photo in photos if photo.filename == "IMG_0001.CR2")
+    assert [photo.filename for photo in raw.pair] == ["IMG_0001.JPG", "IMG_0001.CR2"]
+    assert photos.index(raw) == photos.index(raw.partner) + 1
+
+def test_import_job_sort_files_by_date_pairs(tmp_path, mocker):
+    """Test ImportJob class sort_files_by_date keeps a pair together across a month boundary."""
+    dates = {"IMG_0001.JPG": datetime.datetime(2021, 1, 31, 23, 59, 59), "IMG_0001.CR2": datetime.datetime(2021, 2, 1)}
+    mocker.patch("importphotos.lib.read_metadata", side_effect=lambda path: Metadata(dates[os.path.basename(path)], {}, 4096))
+    folder = Folder(str(tmp_path))
+    folder.photos = pair_photos([Photo(str(tmp_path / "IMG_0001.CR2")), Photo(str(tmp_path / "IMG_0001.JPG"))])
+    jobs = ImportJob(folder, str(tmp_path / "library")).sort_files_by_date()
+    assert list(jobs) == ["2021-01"]
+    assert [photo.filename for photo in jobs["2021-01"].photos] == ["IMG_0001.JPG", "IMG_0001.CR2"]
+
+def test_photo_resolve_date_taken(mocker):
+    """Test Photo class resolve_date_taken reads the date once and raises read errors."""
+    taken = datetime.datetime(2021, 1, 1)
+    read_date = mocker.patch("importphotos.lib.read_date", return_value=(taken, 100, {"Make": "Sony"}))
+    photo = Photo("tests/data/IMG_20210101_000000.ARW")
+    assert photo.resolve_date_taken() == taken
+    assert photo.resolve_date_taken() == taken
+    assert read_date.call_count == 1
+    assert photo.bytes_read == 100
+    assert photo.tags == {"Make": "Sony"}
+    read_date.return_value = OSError("Error")
+    with pytest.raises(OSError):
+        Photo("tests/data/IMG_20210102_000000.ARW").resolve_date_taken()
+
+def test_photo_resolve_date_taken_pairs(mocker):
+    """Test Photo class resolve_date_taken takes the date of the partner without reading the file, unless the partner had none."""
+    taken = datetime.datetime(2021, 1, 1)
+    read_date = mocker.patch("importphotos.lib.read_date", return_value=(taken, 100, {"Make": "Canon"}))
+    jpeg, raw = pair_photos([Photo("card/IMG_0001.CR2"), Photo("card/IMG_0001.JPG")])
+    assert jpeg.resolve_date_taken() == taken
+    assert raw.resolve_date_taken() == taken
+    assert raw.tags == {"Make": "Canon"}
+    read_date.assert_called_once_with("card/IMG_0001.JPG")
+    mocker.patch("os.path.getmtime", return_value=datetime.datetime(2021, 3, 1).timestamp())
+    read_date.return_value = (None, 100, {})
+    jpeg, raw = pair_photos([Photo("card/IMG_0002.CR2"), Photo("card/IMG_0002.JPG")])
+    assert jpeg.resolve_date_taken() == datetime.datetime(2021, 3, 1)
+    read_date.return_value = (taken, 100, {})
+    assert raw.resolve_date_taken() == taken
+    assert read_date.call_args.args == ("card/IMG_0002.CR2",)
+
+def test_folder_extract_dates_pairs(tmp_path, mocker):
+    """Test Folder class extract_dates reads the first photo of a pair and gives its date to the others."""
+    taken = datetime.datetime(2021, 1, 1)
+    read_metadata = mocker.patch("importphotos.lib.read_metadata", return_value=Metadata(taken, {}, 4096))
+    folder = Folder(str(tmp_path))
+    folder.photos = pair_photos([Photo(str(tmp_path / "IMG_0001.CR2")), Photo(str(tmp_path / "IMG_0001.JPG"))])
+    assert folder.extract_dates(2) == []
+    assert [photo.date_taken for photo in folder.photos] == [taken, taken]
+    read_metadata.assert_called_once_with(str(tmp_path / "IMG_0001.JPG"))
+
+def test_folder_extract_dates(mocker, capsys):
+    """Test Folder class extract_dates keeps order and skips failed files."""
+    taken = datetime.datetime.fromisoformat("2021-01-01:00:00:00")
+    second_taken = datetime.datetime.fromisoformat("2021-01-02:00:00:00")
+    mocker.patch("os.path.exists", return_value=True)
+    dates = {
+        "tests/data/IMG_20210101_000000.JPG": Metadata(taken, {}, 4096),
+        "tests/data/IMG_20210102_000000.JPG": Metadata(second_taken, {}, 8192),
+    }
+    def read_metadata(path):
+        if path not in dates:
+            raise PermissionError(path)
+        return dates[path]
+    mocker.patch("importphotos.lib.read_metadata", side_effect=read_metadata)
+    folder = Folder("tests/data")
+    photo = Photo("tests/data/IMG_20210101_000000.JPG")
+    bad_photo = Photo("tests/data/IMG_20210101_000001.JPG")
+    second_photo = Photo("tests/data/IMG_20210102_000000.JPG")
+    for item in (photo, bad_photo, second_photo):
+        folder.add_photo(item)
+    errored = folder.extract_dates(4, verbose=True)
+    assert errored == [bad_photo]
+    assert folder.photos == [photo, second_photo]
+    assert photo.date_taken == taken
+    assert second_photo.date_taken == second_taken
+    assert second_photo.bytes_read == 8192
+    captured = capsys.readouterr()
+    assert "Failed to read date of IMG_20210101_000001.JPG" in captured.out
+    assert "Read dates of 2 files with 4 thread workers." in captured.out
+    assert "Failed to read dates of 1 files" in captured.out
+    assert folder.extract_dates(4) == []
+
+def test_folder_extract_dates_process(tmp_path):
+    """Test Folder class extract_dates with a process pool."""
+    exif = Image.Exif()
+    exif[0x0132] = "2021:01:02 03:04:05"
+    Image.new('RGB', (8, 8)).save(tmp_path / "IMG_0001.JPG", exif=exif)
+    folder = Folder(str(tmp_path))
+    folder.add_photo(Photo(str(tmp_path / "IMG_0001.JPG")))
+    assert folder.extract_dates(2, "process") == []
+    assert folder.photos[0].date_taken == datetime.datetime(2021, 1, 2, 3, 4, 5)
+    assert folder.photos[0].bytes_read > 0
+
+def test_folder_extract_dates_cache(tmp_path, mocker, capsys):
+    """Test Folder class extract_dates reads cached dates without opening files."""
+    taken = datetime.datetime.fromisoformat("2021-01-01:00:00:00")
+    for name in ("IMG_0001.JPG", "IMG_0002.JPG"):
+        (tmp_path / name).write_bytes(b"data")
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+    cache.put(str(tmp_path / "IMG_0001.JPG"), os.stat(tmp_path / "IMG_0001.JPG"), taken, {"Make": "Sony"})
+    mocker.patch.object(Photo, "cache", cache)
+    read_metadata = mocker.patch("importphotos.lib.read_metadata", return_value=Metadata(taken, {"Make": "Canon"}, 4096))
+    folder = Folder(str(tmp_path))
+    folder.add_photo(Photo(str(tmp_path / "IMG_0001.JPG")))
+    folder.add_photo(Photo(str(tmp_path / "IMG_0002.JPG")))
+    assert folder.extract_dates(2) == []
+    assert read_metadata.call_count == 1
+    assert folder.photos[0].tags == {"Make": "Sony"}
+    assert folder.photos[1].tags == {"Make": "Canon"}
+    assert "Read dates of 1 files from the cache." in capsys.readouterr().out
+    assert cache.get(str(tmp_path / "IMG_0002.JPG"), os.stat(tmp_path / "IMG_0002.JPG")) == (taken, {"Make": "Canon"})
+    cache.close()
 
 def test_folder_filter_by_date(mocker, capsys):
     """Test Folder class filter_by_date."""
@@ -473,60 +874,83 @@ def test_folder_repr(mocker):
 def test_photo_init(mocker):
     """Test Photo class init."""
     taken = datetime.datetime.fromisoformat("2021-01-01:00:00:00")
-    mocker.patch("os.path.exists", return_value=False)
-    with pytest.raises(FileNotFoundError):
-        Photo("tests/data/IMG_20210101_000000.ARW")
-    mocker.patch("os.path.exists", return_value=True)
-    mocker.patch("importphotos.lib.Photo._get_date_taken", return_value= taken)
-    #mock all file system calls
+    exists = mocker.patch("os.path.exists", return_value=False)
+    get_date_taken = mocker.patch("importphotos.lib.Photo._get_date_taken", return_value= taken)
     photo = Photo("tests/data/IMG_20210101_000000.ARW")
+    assert not exists.called
+    assert not get_date_taken.called
     assert photo.filename == "IMG_20210101_000000.ARW"
     assert photo.date_taken == taken
     assert photo.path == "tests/data/IMG_20210101_000000.ARW"
 
+def test_photo_date_taken_lazy(mocker):
+    """Test Photo class date_taken is read once on first access."""
+    taken = datetime.datetime.fromisoformat("2021-01-01:00:00:00")
+    get_date_taken = mocker.patch("importphotos.lib.Photo._get_date_taken", return_value= taken)
+    photo = Photo("tests/data/IMG_20210101_000000.ARW")
+    assert photo.date_taken == taken
+    assert photo.date_taken == taken
+    get_date_taken.assert_called_once()
+    with pytest.raises(AttributeError):
+        photo.other = None
+
+def test_photo_get_date_taken_missing_file():
+    """Test Photo class get_date_taken, file does not exist."""
+    photo = Photo("tests/data/IMG_20210101_000000.ARW")
+    with pytest.raises(FileNotFoundError):
+        photo.date_taken
+
 def test_photo_get_date_taken(mocker):
     """Test Photo class get_date_taken, exit data present."""
     taken = datetime.datetime.fromisoformat("2021-01-01:00:00:00")
-    mocker.patch("os.path.exists", return_value=True)
-    magic_mock = mocker.MagicMock()
-    magic_mock.getexif.return_value = dict({306: "2021:01:01 00:00:00"})
-    mocker.patch("PIL.Image.open", return_value=magic_mock)
+    mocker.patch("importphotos.lib.read_metadata", return_value=Metadata(taken, {}, 4096))
     photo = Photo("tests/data/IMG_20210101_000000.ARW")
     assert photo.date_taken == taken
+    assert photo.bytes_read == 4096
 
 def test_photo_get_date_taken_no_exif_alternative_exif(mocker):
-    """Test Photo class get_date_taken, no exif data, alternative file to read."""
+    """Test Photo class get_date_taken, no exif data, date of the JPEG it is paired with."""
     taken = datetime.datetime.fromisoformat("2021-01-01:00:00:00")
-    mocker.patch("os.path.exists", return_value=True)
-    bad_mock = mocker.MagicMock()
-    bad_mock.getexif.side_effect = Image.UnidentifiedImageError('')
-    good_mock = mocker.MagicMock()
-    good_mock.getexif.return_value = {306: "2021:01:01 00:00:00"}
-    mocker.patch("PIL.Image.open", side_effect=[bad_mock, good_mock])
+    exists = mocker.patch("os.path.exists", return_value=True)
+    read_metadata = mocker.patch("importphotos.lib.read_metadata", side_effect=[Metadata(taken, {}, 4096), Metadata(None, {}, 4096)])
     photo = Photo("tests/data/IMG_20210101_000000.ARW")
+    jpeg = Photo("tests/data/IMG_20210101_000000.JPG")
+    pair_photos([photo, jpeg])
+    assert jpeg.date_taken == taken
     assert photo.date_taken == taken
+    assert read_metadata.call_count == 2
+    assert exists.call_count == 0
 
 def test_photo_get_date_taken_no_exif_no_alternative(mocker):
     """Test Photo class get_date_taken, no exif data, no alternative file to read."""
     taken = datetime.datetime.fromisoformat("2021-01-01:00:00:00")
-    mocker.patch("os.path.exists", side_effect=[True, False, False])
-    mock = mocker.MagicMock()
-    mock.getexif.return_value = None
-    mocker.patch("PIL.Image.open", return_value=mock)
+    mocker.patch("os.path.exists", side_effect=[False, False])
+    mocker.patch("importphotos.lib.read_metadata", return_value=Metadata(None, {}, 4096))
     mocker.patch("os.path.getmtime", return_value=1609459200.0)
     photo = Photo("tests/data/IMG_20210101_000000.ARW")
-    assert photo.date_taken == taken
+    assert photo.date_taken == datetime.datetime.fromtimestamp(1609459200.0)
 
 def test_photo_get_date_taken_no_exif_no_alternative_jpg(mocker):
     """Test Photo class get_date_taken, no exit, no alternative because it is a jpg."""
-    taken = datetime.datetime.fromisoformat("2021-01-01:00:00:00")
-    mocker.patch("os.path.exists", side_effect=[True, True, False])
-    mock = mocker.MagicMock()
-    mock.getexif.return_value = None
-    mocker.patch("PIL.Image.open", return_value=mock)
+    mocker.patch("os.path.exists", side_effect=[True, False])
+    mocker.patch("importphotos.lib.read_metadata", return_value=Metadata(None, {}, 4096))
     mocker.patch("os.path.getmtime", return_value=1609459200.0)
     photo = Photo("tests/data/IMG_20210101_000000.JPG")
-    assert photo.date_taken == taken
+    assert photo.date_taken == datetime.datetime.fromtimestamp(1609459200.0)
+
+def test_photo_get_date_taken_cache(tmp_path, mocker):
+    """Test Photo class get_date_taken uses the metadata cache."""
+    taken = datetime.datetime.fromisoformat("2021-01-01:00:00:00")
+    (tmp_path / "IMG_0001.JPG").write_bytes(b"data")
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+    mocker.patch.object(Photo, "cache", cache)
+    read_metadata = mocker.patch("importphotos.lib.read_metadata", return_value=Metadata(taken, {}, 4096))
+    assert Photo(str(tmp_path / "IMG_0001.JPG")).date_taken == taken
+    assert Photo(str(tmp_path / "IMG_0001.JPG")).date_taken == taken
+    assert read_metadata.call_count == 1
+    assert cache.hits == 1
+    assert Photo(str(tmp_path / "IMG_0002.JPG"))._get_cached_date_taken() is None
+    cache.close()
 
 def test_photo_str(mocker):
     """Test Photo class str."""
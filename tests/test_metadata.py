@@ -0,0 +1,204 @@
+"""Unit Tests for importphotos.metadata module."""
+import datetime
+import io
+import struct
+
+import pytest
+
+from PIL import Image
+
+from importphotos.metadata import HeaderReader, CountingFile, read_metadata, BLOCK_SIZE, MAX_HEADER_BYTES
+
+def exif_data(date_time=None, date_time_original=None, make=None):
+    """Build an Exif object for Pillow to save."""
+    exif = Image.Exif()
+    if date_time:
+        exif[0x0132] = date_time
+    if make:
+        exif[0x010F] = make
+    if date_time_original:
+        exif.get_ifd(0x8769)[0x9003] = date_time_original
+    return exif
+
+def ifd(byte_order, entries, ifd_offset, exif_entries=None):
+    """Build an IFD of ASCII entries (tag, value) with its values after it."""
+    data_offset = ifd_offset + 2 + (len(entries) + (exif_entries is not None)) * 12 + 4
+    header = struct.pack(f'{byte_order}H', len(entries) + (exif_entries is not None))
+    data = b''
+    for tag, value in entries:
+        value = value.encode('ascii') + b'\x00'
+        header += struct.pack(f'{byte_order}HHII', tag, 2, len(value), data_offset + len(data))
+        data += value
+    if exif_entries is not None:
+        header += struct.pack(f'{byte_order}HHII', 0x8769, 4, 1, data_offset + len(data))
+    return header + b'\x00\x00\x00\x00' + data
+
+def tiff_header(byte_order, entries, exif_entries=None, ifd_offset=8):
+    """Build a TIFF header with IFD0 and optionally an EXIF IFD."""
+    prefix = b'II' if byte_order == '<' else b'MM'
+    header = (prefix + struct.pack(f'{byte_order}HI', 42, ifd_offset)).ljust(ifd_offset, b'\x00')
+    header += ifd(byte_order, entries, ifd_offset, exif_entries)
+    if exif_entries is not None:
+        header += ifd(byte_order, exif_entries, len(header))
+    return header
+
+def test_header_reader():
+    """Test HeaderReader reads each block once and counts bytes."""
+    reader = HeaderReader(io.BytesIO(bytes(range(256)) * 64))
+    assert reader.read(0, 4) == b'\x00\x01\x02\x03'
+    assert reader.bytes_read == BLOCK_SIZE
+    assert reader.read(BLOCK_SIZE - 2, 4) == bytes([254, 255, 0, 1])
+    assert reader.bytes_read == 2 * BLOCK_SIZE
+    assert reader.read(10, 2) == bytes([10, 11])
+    assert reader.bytes_read == 2 * BLOCK_SIZE
+    with pytest.raises(ValueError):
+        reader.read(MAX_HEADER_BYTES - 2, 4)
+    with pytest.raises(ValueError):
+        reader.read(16380, 8)
+
+def test_counting_file():
+    """Test CountingFile counts the bytes read."""
+    file = CountingFile(io.BytesIO(b'0123456789'))
+    assert file.read(4) == b'0123'
+    file.seek(8)
+    assert file.tell() == 8
+    assert file.read() == b'89'
+    assert file.bytes_read == 6
+
+def test_read_metadata_jpeg(tmp_path):
+    """Test read_metadata prefers DateTimeOriginal in a JPEG."""
+    path = tmp_path / "IMG_0001.JPG"
+    Image.new('RGB', (64, 64)).save(path, exif=exif_data("2021:01:02 03:04:05", "2021:01:01 00:00:00", "Sony"))
+    metadata = read_metadata(path)
+    assert metadata.date_taken == datetime.datetime(2021, 1, 1)
+    assert metadata.tags["Make"] == "Sony"
+    assert metadata.tags["DateTime"] == "2021:01:02 03:04:05"
+    assert metadata.bytes_read <= MAX_HEADER_BYTES
+
+def test_read_metadata_jpeg_date_time(tmp_path):
+    """Test read_metadata falls back to DateTime."""
+    path = tmp_path / "IMG_0001.JPG"
+    Image.new('RGB', (64, 64)).save(path, exif=exif_data("2021:01:02 03:04:05"))
+    assert read_metadata(path).date_taken == datetime.datetime(2021, 1, 2, 3, 4, 5)
+
+def test_read_metadata_jpeg_no_exif(tmp_path):
+    """Test read_metadata on a JPEG without EXIF."""
+    path = tmp_path / "IMG_0001.JPG"
+    Image.new('RGB', (64, 64)).save(path)
+    metadata = read_metadata(path)
+    assert metadata.date_taken is None
+    assert metadata.tags == {}
+
+def test_read_metadata_jpeg_invalid_date(tmp_path):
+    """Test read_metadata ignores an unset date."""
+    path = tmp_path / "IMG_0001.JPG"
+    Image.new('RGB', (64, 64)).save(path, exif=exif_data("0000:00:00 00:00:00"))
+    assert read_metadata(path).date_taken is None
+
+def test_read_metadata_tiff(tmp_path):
+    """Test read_metadata on TIFF based raw files."""
+    path = tmp_path / "IMG_0001.ARW"
+    Image.new('RGB', (64, 64)).save(path, format="TIFF", exif=exif_data("2021:01:02 03:04:05", make="Sony"))
+    metadata = read_metadata(path)
+    assert metadata.date_taken == datetime.datetime(2021, 1, 2, 3, 4, 5)
+    assert metadata.tags["Make"] == "Sony"
+    assert metadata.bytes_read <= MAX_HEADER_BYTES
+
+def test_read_metadata_tiff_exif_ifd(tmp_path):
+    """Test read_metadata follows the EXIF IFD offset."""
+    path = tmp_path / "IMG_0001.ARW"
+    path.write_bytes(tiff_header('<', [(0x0132, "2021:01:02 03:04:05")], [(0x9003, "2021:01:01 00:00:00")]))
+    metadata = read_metadata(path)
+    assert metadata.date_taken == datetime.datetime(2021, 1, 1)
+    assert metadata.tags["DateTime"] == "2021:01:02 03:04:05"
+
+def test_read_metadata_tiff_big_endian(tmp_path):
+    """Test read_metadata on a big endian TIFF header."""
+    path = tmp_path / "IMG_0001.CR2"
+    path.write_bytes(tiff_header('>', [(0x0110, "Camera Model"), (0x0132, "2021:01:02 03:04:05")]))
+    metadata = read_metadata(path)
+    assert metadata.date_taken == datetime.datetime(2021, 1, 2, 3, 4, 5)
+    assert metadata.tags["Model"] == "Camera Model"
+    assert metadata.bytes_read == path.stat().st_size
+
+def test_read_metadata_tiff_outside_header(tmp_path):
+    """Test read_metadata does not follow offsets past the header limit."""
+    path = tmp_path / "IMG_0001.ARW"
+    path.write_bytes(tiff_header('<', [(0x0132, "2021:01:02 03:04:05")], ifd_offset=MAX_HEADER_BYTES + 8))
+    metadata = read_metadata(path)
+    assert metadata.date_taken is None
+    assert metadata.bytes_read <= MAX_HEADER_BYTES
+
+def test_read_metadata_pil_fallback(tmp_path):
+    """Test read_metadata uses PIL for formats without a header parser."""
+    path = tmp_path / "IMG_0001.PNG"
+    Image.new('RGB', (64, 64)).save(path, exif=exif_data("2021:01:02 03:04:05"))
+    metadata = read_metadata(path)
+    assert metadata.date_taken == datetime.datetime(2021, 1, 2, 3, 4, 5)
+    assert metadata.bytes_read > 0
+
+def test_read_metadata_unknown(tmp_path):
+    """Test read_metadata on files PIL can not read."""
+    path = tmp_path / "VID_0001.MP4"
+    path.write_bytes(b'\x00\x00\x00\x18ftypmp42' + b'\x00' * 64)
+    assert read_metadata(path).date_taken is None
+    path = tmp_path / "EMPTY.JPG"
+    path.write_bytes(b'')
+    assert read_metadata(path) == (None, {}, 0)
+
+def test_read_metadata_missing_file(tmp_path):
+    """Test read_metadata raises for missing files."""
+    with pytest.raises(FileNotFoundError):
+        read_metadata(tmp_path / "IMG_0001.JPG")
+
+def box(kind, payload=b'', large=False):
+    """Build an ISO base media box, with a 64 bit size if large."""
+    if large:
+        return struct.pack('>I4sQ', 1, kind, 16 + len(payload)) + payload
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+def mvhd(created, version=0):
+    """Build a mvhd box with the creation time created."""
+    seconds = int((created.astimezone(datetime.timezone.utc) - datetime.datetime(1904, 1, 1, tzinfo=datetime.timezone.utc)).total_seconds())
+    if version == 1:
+        return box(b'mvhd', struct.pack('>B3sQQIQ', 1, b'\x00' * 3, seconds, seconds, 600, 0) + b'\x00' * 80)
+    return box(b'mvhd', struct.pack('>B3sIIII', 0, b'\x00' * 3, seconds, seconds, 600, 0) + b'\x00' * 80)
+
+def test_read_metadata_movie(tmp_path):
+    """Test read_metadata reads the creation time of a movie with the moov box first."""
+    created = datetime.datetime(2021, 1, 2, 3, 4, 5)
+    path = tmp_path / "VID_0001.MP4"
+    path.write_bytes(box(b'ftyp', b'isom\x00\x00\x02\x00isomiso2mp41') + box(b'moov', box(b'trak') + mvhd(created)) + box(b'mdat', b'\x00' * 1024))
+    metadata = read_metadata(path)
+    assert metadata.date_taken == created
+    assert metadata.tags == {'CreateDate': '2021:01:02 03:04:05'}
+
+def test_read_metadata_movie_at_end(tmp_path):
+    """Test read_metadata seeks past a large mdat box to a moov box at the end, reading only headers."""
+    created = datetime.datetime(2021, 1, 2, 3, 4, 5)
+    path = tmp_path / "VID_0001.MOV"
+    with open(path, 'wb') as file:
+        file.write(box(b'ftyp', b'qt  \x00\x00\x02\x00qt  ') + struct.pack('>I4sQ', 1, b'mdat', 16 + 50000000))
+        file.seek(50000000, 1)
+        file.write(box(b'moov', mvhd(created, version=1)))
+    metadata = read_metadata(path)
+    assert metadata.date_taken == created
+    assert metadata.bytes_read < 2 * BLOCK_SIZE
+
+def test_read_metadata_movie_without_date(tmp_path):
+    """Test read_metadata on movies without a moov box or a creation time."""
+    path = tmp_path / "VID_0001.MP4"
+    path.write_bytes(box(b'ftyp', b'mp42') + box(b'mdat', b'\x00' * 64))
+    assert read_metadata(path).date_taken is None
+    path.write_bytes(box(b'ftyp', b'mp42') + box(b'moov', box(b'mvhd', b'\x00' * 100)))
+    assert read_metadata(path).date_taken is None
+    path.write_bytes(box(b'ftyp', b'mp42') + struct.pack('>I4s', 4, b'moov'))
+    assert read_metadata(path).date_taken is None
+
+def test_read_metadata_heic(tmp_path, mocker):
+    """Test read_metadata leaves still images in ISO base media files to PIL."""
+    read_with_pil = mocker.patch('importphotos.metadata._read_with_pil')
+    path = tmp_path / "IMG_0001.HEIC"
+    path.write_bytes(box(b'ftyp', b'heic\x00\x00\x00\x00mif1heic') + box(b'meta'))
+    read_metadata(path)
+    assert read_with_pil.call_count == 1
@@ -0,0 +1,201 @@
+"""Unit Tests for importphotos.pipeline module."""
+import datetime
+import os
+import threading
+import time
+
+import pytest
+
+from importphotos.dedup import Deduplicator
+from importphotos.index import DestinationIndex
+from importphotos.lib import Folder, ImportJob, Photo, COPIED
+from importphotos.pipeline import ImportPipeline, Stage
+from importphotos.scheduler import CopyScheduler
+
+def make_card(tmp_path, count):
+    """Write count photos to a card folder, taken one per month of 2021 in turn."""
+    card = tmp_path / "card"
+    card.mkdir()
+    for i in range(count):
+        (card / f"IMG_{i:04}.JPG").write_bytes(f"photo {i}".encode() * 100)
+    (card / "notes.txt").write_bytes(b"notes")
+    return Folder(str(card))
+
+def date_of(photo):
+    """Date taken of the test photos, from their number."""
+    return datetime.datetime(2021, int(photo.filename[4:8]) % 3 + 1, 1)
+
+@pytest.fixture
+def dates(mocker):
+    """Read test dates from file names instead of EXIF data."""
+    return mocker.patch("importphotos.lib.read_date", side_effect=lambda path: (date_of(Photo(path)), 0, {}))
+
+def test_pipeline_run(tmp_path, dates, capsys):
+    """Test ImportPipeline sorts and copies the photos of a card by year-month."""
+    folder = make_card(tmp_path, 7)
+    (tmp_path / "card" / "IMG_0006.JPG").write_bytes(b"photo 0" * 100)
+    pipeline = ImportPipeline(folder, str(tmp_path / "library"), CopyScheduler(2), (".JPG",), deduplicator=Deduplicator(), workers=2)
+    results = pipeline.run(True)
+    assert pipeline.found == 7
+    assert sorted(pipeline.jobs) == ["2021-01", "2021-02", "2021-03"]
+    assert len(os.listdir(tmp_path / "library" / "2021-01")) == 2
+    assert "IMG_0003.JPG" in os.listdir(tmp_path / "library" / "2021-01")
+    assert sum(len(result[0]) for result in results) == 6
+    assert sum(len(result[2]) for result in results) == 1
+    assert pipeline.scheduler.bytes_copied == sum(os.path.getsize(tmp_path / "card" / f"IMG_{i:04}.JPG") for i in range(6))
+    captured = capsys.readouterr()
+    assert "Found 7 files in" in captured.out
+    assert "Dates: 7 photos, queue full 0 times" in captured.out
+    assert "Copying: 7 photos" in captured.out
+
+def test_pipeline_dedup_in_copy_workers(tmp_path, dates, mocker):
+    """Test ImportPipeline hashes photos to find the ones routed twice in the copy workers, not in the routing thread."""
+    folder = make_card(tmp_path, 2)
+    (tmp_path / "card" / "IMG_0002.JPG").write_bytes(b"photo 0" * 100)
+    deduplicator = Deduplicator()
+    threads = {}
+    route, seen = ImportPipeline._route, deduplicator.seen
+    mocker.patch.object(ImportPipeline, "_route", autospec=True,
+                        side_effect=lambda self, routing: threads.setdefault("route", threading.current_thread()) and route(self, routing))
+    mocker.patch.object(deduplicator, "seen", side_effect=lambda photo: threads.setdefault("seen", set()).add(threading.current_thread()) or seen(photo))
+    results = ImportPipeline(folder, str(tmp_path / "library"), CopyScheduler(2), (".JPG",), deduplicator=deduplicator, workers=2).run()
+    assert sum(len(result[2]) for result in results) == 1
+    assert len(threads["seen"]) >= 1
+    assert threads["route"] not in threads["seen"]
+
+def test_pipeline_date_range_foldername(tmp_path, dates, capsys):
+    """Test ImportPipeline copies the photos in the date range to one folder."""
+    folder = make_card(tmp_path, 6)
+    date_range = (datetime.datetime(2021, 2, 1), datetime.datetime(2021, 3, 1))
+    pipeline = ImportPipeline(folder, str(tmp_path / "library"), CopyScheduler(2), (".JPG",), date_range=date_range, foldername="trip")
+    results = pipeline.run()
+    assert list(pipeline.jobs) == ["trip"]
+    assert sorted(os.listdir(tmp_path / "library" / "trip")) == ["IMG_0001.JPG", "IMG_0002.JPG", "IMG_0004.JPG", "IMG_0005.JPG"]
+    assert pipeline.filtered == 2
+    assert len(results[0][0]) == 4
+    assert "Selected 4 files in date range." in capsys.readouterr().out
+
+def test_pipeline_date_margin(tmp_path, dates, capsys):
+    """Test ImportPipeline skips photos modified far outside the date range without reading their date."""
+    folder = make_card(tmp_path, 6)
+    for i in range(6):
+        modified = date_of(Photo(str(tmp_path / "card" / f"IMG_{i:04}.JPG"))).timestamp()
+        os.utime(tmp_path / "card" / f"IMG_{i:04}.JPG", (modified, modified))
+    date_range = (datetime.datetime(2021, 3, 1), datetime.datetime(2021, 3, 2))
+    pipeline = ImportPipeline(folder, str(tmp_path / "library"), CopyScheduler(2), (".JPG",), date_range=date_range,
+                              date_margin=datetime.timedelta(days=2))
+    pipeline.run()
+    assert pipeline.pruned == 4
+    assert dates.call_count == 2
+    assert sorted(os.listdir(tmp_path / "library" / "2021-03")) == ["IMG_0002.JPG", "IMG_0005.JPG"]
+    captured = capsys.readouterr()
+    assert "Skipped 4 files modified more than 2 days, 0:00:00 outside the date range." in captured.out
+    assert "Selected 2 files in date range." in captured.out
+
+def test_pipeline_date_errors(tmp_path, mocker, capsys):
+    """Test ImportPipeline leaves out photos whose date can not be read."""
+    folder = make_card(tmp_path, 2)
+    mocker.patch("importphotos.lib.read_date", side_effect=lambda path: ValueError("Bad file") if path.endswith("0001.JPG") else (datetime.datetime(2021, 1, 1), 0, {}))
+    pipeline = ImportPipeline(folder, str(tmp_path / "library"), CopyScheduler(1), (".JPG",))
+    pipeline.run(True)
+    assert [photo.filename for photo in pipeline.errored_dates] == ["IMG_0001.JPG"]
+    assert os.listdir(tmp_path / "library" / "2021-01") == ["IMG_0000.JPG"]
+    captured = capsys.readouterr()
+    assert "Failed to read date of IMG_0001.JPG: Bad file" in captured.out
+    assert "Failed to read dates of 1 files" in captured.out
+
+def test_pipeline_sources(tmp_path, dates, capsys):
+    """Test ImportPipeline imports several folders at once into shared jobs, skipping a photo on both cards."""
+    folder = make_card(tmp_path, 3)
+    second = tmp_path / "second"
+    second.mkdir()
+    for i in range(3, 6):
+        (second / f"IMG_{i:04}.JPG").write_bytes(f"photo {i}".encode() * 100)
+    (second / "IMG_0009.JPG").write_bytes(b"photo 0" * 100)
+    pipeline = ImportPipeline([folder, Folder(str(second))], str(tmp_path / "library"), CopyScheduler(2), (".JPG",),
+                              deduplicator=Deduplicator(), workers=2)
+    results = pipeline.run(True)
+    assert pipeline.found_in == [3, 4]
+    assert pipeline.found == 7
+    assert sorted(pipeline.jobs) == ["2021-01", "2021-02", "2021-03"]
+    assert sorted(os.listdir(tmp_path / "library" / "2021-01")) == ["IMG_0000.JPG", "IMG_0003.JPG"]
+    assert sum(len(result[0]) for result in results) == 6
+    assert sum(len(result[2]) for result in results) == 1
+    assert [stage.name for stage in pipeline.stages] == ["Dates 1", "Dates 2", "Routing", "Copying 1", "Copying 2"]
+    assert pipeline.copying[0].items == 3
+    captured = capsys.readouterr()
+    assert f"Found 3 files in {folder.path}" in captured.out
+    assert f"Found 4 files in {second}" in captured.out
+    assert str(pipeline) == f"ImportPipeline({folder.path}, {second} -> {tmp_path / 'library'}, 3 jobs)"
+
+def test_pipeline_index(tmp_path, dates):
+    """Test ImportPipeline uses the destination index it is given, so folders listed before are not listed again."""
+    folder = make_card(tmp_path, 3)
+    index = DestinationIndex()
+    ImportPipeline(folder, str(tmp_path / "library"), CopyScheduler(2), (".JPG",), workers=2, index=index).run()
+    assert index.scans == 3
+    pipeline = ImportPipeline(Folder(str(tmp_path / "card")), str(tmp_path / "library"), CopyScheduler(2), (".JPG",), workers=2, index=index)
+    results = pipeline.run()
+    assert pipeline.index is index
+    assert index.refresh() == 0
+    assert index.scans == 3
+    assert sum(len(result[2]) for result in results) == 3
+
+def test_pipeline_copy_errors(tmp_path, dates, mocker):
+    """Test ImportPipeline copy workers count photos that fail as errored and keep copying, so a full queue never blocks."""
+    folder = make_card(tmp_path, 40)
+    mocker.patch.object(CopyScheduler, "import_photo", side_effect=OSError("read back failed"))
+    pipeline = ImportPipeline(folder, str(tmp_path / "library"), CopyScheduler(1), (".JPG",), workers=1, queue_size=2)
+    results = pipeline.run()
+    assert sum(len(result[1]) for result in results) == 40
+
+def test_pipeline_backpressure(tmp_path, dates, mocker):
+    """Test ImportPipeline stages wait on full queues and copying starts before scanning ends."""
+    folder = make_card(tmp_path, 12)
+    started = []
+    def import_photo(self, photo, verbose=False):
+        started.append(pipeline.found)
+        time.sleep(0.01)
+        return COPIED
+    mocker.patch.object(ImportJob, "import_photo", import_photo)
+    pipeline = ImportPipeline(folder, str(tmp_path / "library"), CopyScheduler(1), (".JPG",), workers=1, queue_size=1)
+    pipeline.run()
+    assert started[0] < 12
+    assert sum(stage.waits for stage in pipeline.stages) > 0
+    assert pipeline.stages[2].waited > 0
+
+def test_pipeline_errors(tmp_path, dates, mocker):
+    """Test ImportPipeline stops and raises the error of a stage."""
+    folder = make_card(tmp_path, 3)
+    mocker.patch("importphotos.pipeline.ImportJob", side_effect=PermissionError("Denied"))
+    with pytest.raises(PermissionError):
+        ImportPipeline(folder, str(tmp_path / "library"), CopyScheduler(1), (".JPG",), queue_size=1).run()
+
+def test_stage_str_repr():
+    """Test Stage str and repr."""
+    stage = Stage("Dates", 2)
+    stage.put("photo")
+    assert stage.get() == "photo"
+    assert str(stage) == "Dates: 1 photos, queue full 0 times for 0.0 seconds"
+    assert repr(stage) == "Stage(Dates, 2, 1, 0, 0.0)"
+
+def test_pipeline_str_repr(tmp_path):
+    """Test ImportPipeline str and repr."""
+    folder = make_card(tmp_path, 1)
+    pipeline = ImportPipeline(folder, "library", CopyScheduler(3), (".JPG",), workers=2)
+    assert str(pipeline) == f"ImportPipeline({tmp_path / 'card'} -> library, 0 jobs)"
+    assert repr(pipeline) == f"ImportPipeline({tmp_path / 'card'}, library, 2, 3, 0)"
+
+def test_pipeline_pairs(tmp_path, mocker):
+    """Test ImportPipeline dates a RAW from its JPEG without reading it and copies the pair to the same folder."""
+    folder = make_card(tmp_path, 1)
+    (tmp_path / "card" / "IMG_0000.CR2").write_bytes(b"raw" * 100)
+    (tmp_path / "card" / "IMG_0001.CR2").write_bytes(b"raw without a jpeg" * 100)
+    read_date = mocker.patch("importphotos.lib.read_date", side_effect=lambda path: (datetime.datetime(2021, 1, 31, 23, 59) if path.endswith(".JPG") else None, 0, {}))
+    mocker.patch("os.path.getmtime", return_value=datetime.datetime(2021, 3, 1).timestamp())
+    pipeline = ImportPipeline(folder, str(tmp_path / "library"), CopyScheduler(2), (".JPG", ".CR2"), workers=2)
+    pipeline.run()
+    assert sorted(os.path.basename(call.args[0]) for call in read_date.call_args_list) == ["IMG_0000.JPG", "IMG_0001.CR2"]
+    assert sorted(os.listdir(tmp_path / "library" / "2021-01")) == ["IMG_0000.CR2", "IMG_0000.JPG"]
+    assert os.listdir(tmp_path / "library" / "2021-03") == ["IMG_0001.CR2"]
+    assert pipeline.stages[0].items == 3
@@ -0,0 +1,58 @@
+"""Unit Tests for importphotos.profiler module."""
+import json
+
+from importphotos.profiler import Profiler, COPY, DATES, WALK
+
+def test_profiler_record():
+    """Test Profiler class record sums the counters of a stage."""
+    profiler = Profiler()
+    profiler.record(COPY, "IMG_0001.JPG", 0.5, 100, 100)
+    profiler.record(COPY, "IMG_0002.JPG", 0.25, 200, 200)
+    profiler.record(COPY, None, 1.0, files=0)
+    report = profiler.report()
+    assert report[COPY]["files"] == 2
+    assert report[COPY]["seconds"] == 1.75
+    assert report[COPY]["read"] == 300
+    assert report[COPY]["written"] == 300
+    assert report[COPY]["wall"] >= 1.0
+    assert [file["path"] for file in report[COPY]["slowest"]] == ["IMG_0001.JPG", "IMG_0002.JPG"]
+
+def test_profiler_slowest():
+    """Test Profiler class keeps the slowest files of each stage."""
+    profiler = Profiler(slowest=2)
+    for i, seconds in enumerate((0.1, 0.4, 0.2, 0.3)):
+        profiler.record(DATES, f"IMG_000{i}.JPG", seconds)
+    assert [file["path"] for file in profiler.report()[DATES]["slowest"]] == ["IMG_0001.JPG", "IMG_0003.JPG"]
+
+def test_profiler_report_order():
+    """Test Profiler class reports stages in the order of an import."""
+    profiler = Profiler()
+    profiler.record(COPY, "IMG_0001.JPG", 0.1)
+    profiler.record("other", "IMG_0001.JPG", 0.1)
+    profiler.record(WALK, "IMG_0001.JPG", 0.1)
+    assert list(profiler.report()) == [WALK, COPY, "other"]
+
+def test_profiler_write(tmp_path):
+    """Test Profiler class write."""
+    profiler = Profiler()
+    profiler.record(WALK, "IMG_0001.JPG", 0.1)
+    profiler.write(str(tmp_path / "reports" / "profile.json"))
+    with open(tmp_path / "reports" / "profile.json", encoding='utf-8') as file:
+        assert json.load(file)[WALK]["files"] == 1
+
+def test_profiler_print(capsys):
+    """Test Profiler class print."""
+    profiler = Profiler()
+    profiler.record(COPY, "/card/IMG_0001.JPG", 0.5, 2000000, 2000000)
+    profiler.print()
+    captured = capsys.readouterr()
+    assert "| Stage   |   Files |" in captured.out
+    assert "| copy    |       1 |      0.5 |      0.5 |         2 |            2 |" in captured.out
+    assert "| IMG_0001.JPG    |" in captured.out
+
+def test_profiler_str():
+    """Test Profiler class __str__ and __repr__."""
+    profiler = Profiler()
+    profiler.record(WALK, "IMG_0001.JPG", 0.1)
+    assert str(profiler) == "Profiler(walk)"
+    assert repr(profiler) == "Profiler(10, ['walk'])"
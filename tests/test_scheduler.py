@@ -0,0 +1,76 @@
+"""Unit Tests for importphotos.scheduler module."""
+import os
+import threading
+import time
+
+from importphotos.lib import Folder, ImportJob, Photo, COPIED
+from importphotos.scheduler import CopyScheduler
+
+def make_job(tmp_path, name, count, destination):
+    """Create an ImportJob of count real files."""
+    source = tmp_path / "source" / name
+    source.mkdir(parents=True)
+    folder = Folder(str(source))
+    for i in range(count):
+        (source / f"IMG_{i:04}.JPG").write_bytes(f"{name}{i:04}".encode() * 200)
+        folder.add_photo(Photo(str(source / f"IMG_{i:04}.JPG")))
+    return ImportJob(folder, str(tmp_path / "destination" / destination))
+
+def test_scheduler_run(tmp_path, capsys):
+    """Test CopyScheduler copies the photos of all jobs and keeps each job's results."""
+    first = make_job(tmp_path, "a", 3, "2021-01")
+    second = make_job(tmp_path, "b", 2, "2021-02")
+    (tmp_path / "destination" / "2021-02" / "IMG_0000.JPG").write_bytes(b"old")
+    os.remove(first.photos[1].path)
+    scheduler = CopyScheduler(4, 2, 2)
+    results = scheduler.run([first, second])
+    assert results[0] == ([first.photos[0], first.photos[2]], [first.photos[1]], [])
+    assert results[1] == (second.photos, [], [])
+    assert first.result == results[0]
+    assert sorted(os.listdir(tmp_path / "destination" / "2021-01")) == ["IMG_0000.JPG", "IMG_0002.JPG"]
+    assert sorted(os.listdir(tmp_path / "destination" / "2021-02")) == ["IMG_0000.JPG", "IMG_0000_1.JPG", "IMG_0001.JPG"]
+    assert scheduler.bytes_copied == 4000
+    assert scheduler.throughput() > 0
+    captured = capsys.readouterr()
+    assert "Copying 5 files from 2 jobs with 4 workers" in captured.out
+    assert "Copied 2 files to 2021-01" in captured.out
+    assert "Renamed 1 files with a different file of the same name in 2021-02" in captured.out
+    assert "Copied 0.0 MB in" in captured.out
+
+def test_scheduler_errors(tmp_path, mocker):
+    """Test CopyScheduler counts a photo whose copy raised as errored instead of losing it."""
+    job = make_job(tmp_path, "a", 3, "2021-01")
+    mocker.patch.object(ImportJob, "import_photo", side_effect=[COPIED, OSError("read back failed"), RuntimeError("bug")])
+    results = CopyScheduler(1).run([job])
+    assert [len(result) for result in results[0]] == [1, 2, 0]
+
+def test_scheduler_limits(tmp_path, mocker):
+    """Test CopyScheduler never runs more copies on a destination than its limit."""
+    jobs = [make_job(tmp_path, str(j), 4, f"2021-0{j + 1}") for j in range(3)]
+    running = []
+    peak = []
+    lock = threading.Lock()
+    def import_photo(photo, verbose=False):
+        with lock:
+            running.append(photo)
+            peak.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(photo)
+        return COPIED
+    for job in jobs:
+        mocker.patch.object(job, "import_photo", side_effect=import_photo)
+    CopyScheduler(8, 8, 2).run(jobs)
+    assert max(peak) == 2
+    assert all(len(job.result[0]) == 4 for job in jobs)
+
+def test_scheduler_order(tmp_path):
+    """Test CopyScheduler takes photos from each job in turn."""
+    jobs = [make_job(tmp_path, "a", 3, "2021-01"), make_job(tmp_path, "b", 1, "2021-02")]
+    assert list(CopyScheduler()._order(jobs)) == [(0, 0), (1, 0), (0, 1), (0, 2)]
+
+def test_scheduler_str_repr():
+    """Test CopyScheduler str and repr."""
+    scheduler = CopyScheduler(4, 2, 3)
+    assert str(scheduler) == "CopyScheduler(4 workers, 0.0 MB/s)"
+    assert repr(scheduler) == "CopyScheduler(4, 2, 3)"
@@ -0,0 +1,321 @@
+"""Unit Tests for importphotos.transfer module."""
+import errno
+import hashlib
+import json
+import os
+import shutil
+
+import pytest
+
+from importphotos import transfer
+from importphotos.transfer import AtomicWriter, copy_file, copy_resumable, copy_to_many, hash_file, temporary_name, CHUNKED, REFLINK, COPY_FILE_RANGE, SENDFILE, BUFFERED
+from importphotos.transfer import FSYNC_FILE, FSYNC_BATCH, FSYNC_OFF
+
+DATA = bytes(range(256)) * 1000
+
+@pytest.fixture(autouse=True)
+def clear_unsupported():
+    """Forget the methods refused in other tests."""
+    transfer._unsupported.clear()
+    yield
+    transfer._unsupported.clear()
+
+def test_copy_file(tmp_path):
+    """Test copy_file copies the data with the fastest method available."""
+    (tmp_path / "IMG_0001.JPG").write_bytes(DATA)
+    (tmp_path / "copy.JPG").write_bytes(DATA * 2)
+    method = copy_file(str(tmp_path / "IMG_0001.JPG"), str(tmp_path / "copy.JPG"))
+    assert method in (REFLINK, COPY_FILE_RANGE, SENDFILE, BUFFERED)
+    assert (tmp_path / "copy.JPG").read_bytes() == DATA
+
+def test_copy_file_same_file(tmp_path):
+    """Test copy_file does not truncate a file copied onto itself."""
+    (tmp_path / "IMG_0001.JPG").write_bytes(DATA)
+    with pytest.raises(shutil.SameFileError):
+        copy_file(str(tmp_path / "IMG_0001.JPG"), str(tmp_path / "IMG_0001.JPG"))
+    assert (tmp_path / "IMG_0001.JPG").read_bytes() == DATA
+
+def test_copy_file_reflink(tmp_path, mocker):
+    """Test copy_file uses a reflink on the same device."""
+    (tmp_path / "IMG_0001.JPG").write_bytes(DATA)
+    ioctl = mocker.patch("fcntl.ioctl", side_effect=lambda fdst, request, fsrc: os.write(fdst, DATA) and 0)
+    assert copy_file(str(tmp_path / "IMG_0001.JPG"), str(tmp_path / "copy.JPG")) == REFLINK
+    assert ioctl.call_args.args[1] == transfer.FICLONE
+
+def test_copy_file_fallbacks(tmp_path, mocker):
+    """Test copy_file falls back to slower methods and remembers refused ones."""
+    (tmp_path / "IMG_0001.JPG").write_bytes(DATA)
+    mocker.patch("fcntl.ioctl", side_effect=OSError(errno.EOPNOTSUPP, "Not supported"))
+    copy_file_range = mocker.patch("os.copy_file_range", side_effect=OSError(errno.EXDEV, "Cross device"))
+    assert copy_file(str(tmp_path / "IMG_0001.JPG"), str(tmp_path / "copy.JPG")) == SENDFILE
+    assert (tmp_path / "copy.JPG").read_bytes() == DATA
+    mocker.patch("os.sendfile", side_effect=OSError(errno.EINVAL, "Invalid"))
+    transfer._unsupported.clear()
+    assert copy_file(str(tmp_path / "IMG_0001.JPG"), str(tmp_path / "copy.JPG")) == BUFFERED
+    assert (tmp_path / "copy.JPG").read_bytes() == DATA
+    calls = copy_file_range.call_count
+    assert copy_file(str(tmp_path / "IMG_0001.JPG"), str(tmp_path / "copy.JPG")) == BUFFERED
+    assert copy_file_range.call_count == calls
+
+def test_copy_file_continues_from_offset(tmp_path, mocker):
+    """Test copy_file continues a partial kernel copy with the next method."""
+    (tmp_path / "IMG_0001.JPG").write_bytes(DATA)
+    mocker.patch("fcntl.ioctl", side_effect=OSError(errno.EOPNOTSUPP, "Not supported"))
+    real_copy_file_range = os.copy_file_range
+    mocker.patch("os.copy_file_range", side_effect=lambda src, dst, count, offset_src, offset_dst:
+                 real_copy_file_range(src, dst, 1000, offset_src, offset_dst) if offset_src == 0 else 0)
+    mocker.patch("os.sendfile", side_effect=OSError(errno.EINVAL, "Invalid"))
+    assert copy_file(str(tmp_path / "IMG_0001.JPG"), str(tmp_path / "copy.JPG")) == BUFFERED
+    assert (tmp_path / "copy.JPG").read_bytes() == DATA
+    assert (COPY_FILE_RANGE, *[os.stat(tmp_path).st_dev] * 2) not in transfer._unsupported
+
+def test_copy_file_errors(tmp_path, mocker):
+    """Test copy_file raises errors that are not about the method."""
+    (tmp_path / "IMG_0001.JPG").write_bytes(DATA)
+    mocker.patch("fcntl.ioctl", side_effect=OSError(errno.EOPNOTSUPP, "Not supported"))
+    mocker.patch("os.copy_file_range", side_effect=OSError(errno.ENOSPC, "No space"))
+    with pytest.raises(OSError):
+        copy_file(str(tmp_path / "IMG_0001.JPG"), str(tmp_path / "copy.JPG"))
+    mocker.patch("os.copy_file_range", side_effect=OSError(errno.EXDEV, "Cross device"))
+    mocker.patch("os.sendfile", side_effect=OSError(errno.EIO, "IO error"))
+    with pytest.raises(OSError):
+        copy_file(str(tmp_path / "IMG_0001.JPG"), str(tmp_path / "copy.JPG"))
+    with pytest.raises(FileNotFoundError):
+        copy_file(str(tmp_path / "IMG_0002.JPG"), str(tmp_path / "copy.JPG"))
+
+def test_copy_file_short(tmp_path, mocker):
+    """Test copy_file raises when the source ends before its size, like a file truncated while it is copied."""
+    (tmp_path / "IMG_0001.JPG").write_bytes(DATA)
+    mocker.patch("importphotos.transfer._copy_range", return_value=(COPY_FILE_RANGE, 1000))
+    with pytest.raises(OSError):
+        copy_file(str(tmp_path / "IMG_0001.JPG"), str(tmp_path / "copy.JPG"))
+    mocker.patch("importphotos.transfer._buffered", return_value=1000)
+    with pytest.raises(OSError):
+        copy_file(str(tmp_path / "IMG_0001.JPG"), str(tmp_path / "copy.JPG"), hashlib.blake2b())
+
+def test_buffered(tmp_path, mocker):
+    """Test the user space copy in several reads."""
+    mocker.patch("importphotos.transfer.BUFFER_SIZE", 1000)
+    (tmp_path / "IMG_0001.JPG").write_bytes(DATA)
+    with open(tmp_path / "IMG_0001.JPG", "rb") as fsrc, open(tmp_path / "copy.JPG", "wb") as fdst:
+        assert transfer._buffered(fsrc.fileno(), fdst.fileno(), 0, len(DATA)) == len(DATA)
+    assert (tmp_path / "copy.JPG").read_bytes() == DATA
+
+def test_copy_file_digest(tmp_path, mocker):
+    """Test copy_file hashes the data while copying it through the buffer."""
+    reflink = mocker.patch("importphotos.transfer._reflink")
+    (tmp_path / "IMG_0001.JPG").write_bytes(DATA)
+    digest = hashlib.blake2b(digest_size=32)
+    assert copy_file(tmp_path / "IMG_0001.JPG", tmp_path / "copy.JPG", digest) == BUFFERED
+    reflink.assert_not_called()
+    assert (tmp_path / "copy.JPG").read_bytes() == DATA
+    assert digest.hexdigest() == hashlib.blake2b(DATA, digest_size=32).hexdigest()
+    assert hash_file(tmp_path / "copy.JPG", hashlib.blake2b(digest_size=32)) == digest.hexdigest()
+
+def test_atomic_writer(tmp_path):
+    """Test AtomicWriter writes copies under a temporary name and renames them when committed."""
+    (tmp_path / "IMG_0001.JPG").write_bytes(DATA)
+    writer = AtomicWriter(FSYNC_FILE)
+    method, temporary = writer.copy(tmp_path / "IMG_0001.JPG", tmp_path / "copy.JPG")
+    assert temporary == temporary_name(tmp_path / "copy.JPG") == str(tmp_path / ".importphotos-copy.JPG.part")
+    assert not (tmp_path / "copy.JPG").exists()
+    committed = []
+    writer.commit(temporary, tmp_path / "copy.JPG", lambda: committed.append(True))
+    assert committed == [True]
+    assert (tmp_path / "copy.JPG").read_bytes() == DATA
+    assert not os.path.exists(temporary)
+    assert writer.file_syncs == 1
+    writer.sync()
+    assert writer.directory_syncs == (1 if hasattr(os, 'O_DIRECTORY') else 0)
+    with pytest.raises(shutil.SameFileError):
+        writer.copy(tmp_path / "copy.JPG", tmp_path / "copy.JPG")
+
+def test_atomic_writer_batch(tmp_path, mocker):
+    """Test AtomicWriter syncs a batch of copies together, then renames them into place and syncs their folder before calling on_commit."""
+    writer = AtomicWriter(FSYNC_BATCH, batch=2)
+    calls = []
+    sync_batch, sync_directories, replace = AtomicWriter._sync_batch, AtomicWriter._sync_directories, os.replace
+    mocker.patch.object(AtomicWriter, "_sync_batch", autospec=True,
+                        side_effect=lambda self, paths: calls.append(("sync", [os.path.basename(path) for path in paths])) or sync_batch(self, paths))
+    mocker.patch.object(AtomicWriter, "_sync_directories", autospec=True,
+                        side_effect=lambda self: calls.append(("folders",)) or sync_directories(self))
+    mocker.patch("importphotos.transfer.os.replace", side_effect=lambda source, destination: calls.append(("rename", os.path.basename(destination)))
+                 or replace(source, destination))
+    committed = []
+    for name in ("IMG_0001.JPG", "IMG_0002.JPG", "IMG_0003.JPG"):
+        (tmp_path / name).write_bytes(DATA)
+        _, temporary = writer.copy(tmp_path / name, tmp_path / f"copy_{name}")
+        writer.commit(temporary, tmp_path / f"copy_{name}", lambda name=name: committed.append(name))
+        if name == "IMG_0001.JPG":
+            assert not (tmp_path / "copy_IMG_0001.JPG").exists()
+            assert os.path.exists(temporary)
+    assert committed == ["IMG_0001.JPG", "IMG_0002.JPG"]
+    assert (tmp_path / "copy_IMG_0002.JPG").read_bytes() == DATA
+    assert not (tmp_path / "copy_IMG_0003.JPG").exists()
+    writer.sync()
+    assert committed == ["IMG_0001.JPG", "IMG_0002.JPG", "IMG_0003.JPG"]
+    assert calls == [("sync", [".importphotos-copy_IMG_0001.JPG.part", ".importphotos-copy_IMG_0002.JPG.part"]),
+                     ("rename", "copy_IMG_0001.JPG"), ("rename", "copy_IMG_0002.JPG"), ("folders",),
+                     ("sync", [".importphotos-copy_IMG_0003.JPG.part"]), ("rename", "copy_IMG_0003.JPG"), ("folders",)]
+    if transfer._syncfs is not None:
+        assert (writer.file_syncs, writer.filesystem_syncs) == (0, 2)
+    else:
+        assert (writer.file_syncs, writer.filesystem_syncs) == (3, 0)
+    assert writer.directory_syncs == (2 if hasattr(os, 'O_DIRECTORY') else 0)
+
+def test_atomic_writer_batch_errors(tmp_path, mocker):
+    """Test AtomicWriter calls on_error for a batched copy it fails to rename, and keeps a batch that failed to sync for sync."""
+    writer = AtomicWriter(FSYNC_BATCH, batch=2)
+    mocker.patch("importphotos.transfer._syncfs", None)
+    committed = []
+    errors = []
+    for name in ("IMG_0001.JPG", "IMG_0002.JPG", "IMG_0003.JPG", "IMG_0004.JPG"):
+        (tmp_path / name).write_bytes(DATA)
+    _, temporary = writer.copy(tmp_path / "IMG_0001.JPG", tmp_path / "copy_1.JPG")
+    writer.commit(temporary, tmp_path / "copy_1.JPG", lambda: committed.append(1), errors.append)
+    _, temporary = writer.copy(tmp_path / "IMG_0002.JPG", tmp_path / "copy_2.JPG")
+    writer.commit(temporary, tmp_path / "missing" / "copy_2.JPG", lambda: committed.append(2), errors.append)
+    assert committed == [1]
+    assert len(errors) == 1 and isinstance(errors[0], FileNotFoundError)
+    assert not os.path.exists(temporary)
+    sync_file = mocker.patch.object(AtomicWriter, "_sync_file", side_effect=OSError(errno.EIO, "Error"))
+    for i in (3, 4):
+        _, temporary = writer.copy(tmp_path / f"IMG_000{i}.JPG", tmp_path / f"copy_{i}.JPG")
+        writer.commit(temporary, tmp_path / f"copy_{i}.JPG", lambda i=i: committed.append(i), errors.append)
+    assert committed == [1]
+    assert not (tmp_path / "copy_3.JPG").exists()
+    sync_file.side_effect = None
+    writer.sync()
+    assert committed == [1, 3, 4]
+    assert (tmp_path / "copy_3.JPG").read_bytes() == DATA
+    assert len(errors) == 1
+
+def test_atomic_writer_off_and_errors(tmp_path, mocker):
+    """Test AtomicWriter without syncs, and that a failed copy leaves no temporary file."""
+    (tmp_path / "IMG_0001.JPG").write_bytes(DATA)
+    writer = AtomicWriter(FSYNC_OFF)
+    _, temporary = writer.copy(tmp_path / "IMG_0001.JPG", tmp_path / "copy.JPG")
+    writer.commit(temporary, tmp_path / "copy.JPG")
+    writer.sync()
+    assert (writer.file_syncs, writer.directory_syncs) == (0, 0)
+    mocker.patch("importphotos.transfer._buffered", side_effect=OSError(errno.EIO, "Error"))
+    with pytest.raises(OSError):
+        writer.copy(tmp_path / "IMG_0001.JPG", tmp_path / "other.JPG", hashlib.blake2b())
+    assert sorted(os.listdir(tmp_path)) == ["IMG_0001.JPG", "copy.JPG"]
+
+def test_copy_resumable(tmp_path, mocker):
+    """Test copy_resumable continues an interrupted copy from its last checkpoint."""
+    (tmp_path / "CLIP0001.MP4").write_bytes(DATA)
+    buffered = transfer._buffered
+    calls = []
+    def interrupted(*args):
+        calls.append(args[2])
+        if len(calls) == 3:
+            raise OSError(errno.EIO, "Error")
+        return buffered(*args)
+    mocker.patch("importphotos.transfer._buffered", side_effect=interrupted)
+    with pytest.raises(OSError):
+        copy_resumable(tmp_path / "CLIP0001.MP4", str(tmp_path / "copy.MP4"), hashlib.blake2b(digest_size=32), chunk_size=100000)
+    assert calls == [0, 100000, 200000]
+    assert json.loads((tmp_path / "copy.MP4.checkpoint").read_text())["offset"] == 200000
+    digest = hashlib.blake2b(digest_size=32)
+    hashed = mocker.spy(transfer, "hash_file")
+    assert copy_resumable(tmp_path / "CLIP0001.MP4", str(tmp_path / "copy.MP4"), digest, chunk_size=100000) == 200000
+    assert hashed.call_count == 1
+    assert calls[3:] == [200000]
+    assert (tmp_path / "copy.MP4").read_bytes() == DATA
+    assert digest.hexdigest() == hashlib.blake2b(DATA, digest_size=32).hexdigest()
+    (tmp_path / "copy.MP4").write_bytes(b"x" * len(DATA))
+    with pytest.raises(OSError):
+        copy_resumable(tmp_path / "CLIP0001.MP4", str(tmp_path / "copy.MP4"), chunk_size=100000)
+    assert not (tmp_path / "copy.MP4.checkpoint").exists()
+    assert copy_resumable(tmp_path / "CLIP0001.MP4", str(tmp_path / "copy.MP4"), chunk_size=100000) == 0
+    assert (tmp_path / "copy.MP4").read_bytes() == DATA
+
+def test_copy_resumable_kernel(tmp_path, mocker):
+    """Test copy_resumable copies the chunks in the kernel without a digest and checks their checkpoints by the hash of the source."""
+    (tmp_path / "CLIP0001.MP4").write_bytes(DATA)
+    copy_range = transfer._copy_range
+    calls = []
+    def interrupted(*args):
+        calls.append(args[2])
+        if len(calls) == 2:
+            raise OSError(errno.EIO, "Error")
+        return copy_range(*args)
+    mocker.patch("importphotos.transfer._copy_range", side_effect=interrupted)
+    with pytest.raises(OSError):
+        copy_resumable(tmp_path / "CLIP0001.MP4", str(tmp_path / "copy.MP4"), chunk_size=100000)
+    state = json.loads((tmp_path / "copy.MP4.checkpoint").read_text())
+    assert state["checksum"] == hashlib.blake2b(DATA[:100000], digest_size=32).hexdigest()
+    hashed = mocker.spy(transfer, "hash_file")
+    assert copy_resumable(tmp_path / "CLIP0001.MP4", str(tmp_path / "copy.MP4"), chunk_size=100000) == 100000
+    assert calls == [0, 100000, 100000, 200000]
+    assert hashed.call_count == 1
+    assert (tmp_path / "copy.MP4").read_bytes() == DATA
+    calls.clear()
+    with pytest.raises(OSError):
+        copy_resumable(tmp_path / "CLIP0001.MP4", str(tmp_path / "other.MP4"), chunk_size=100000)
+    with open(tmp_path / "other.MP4", "r+b") as file:
+        file.write(b"x" * 1000)
+    digest = hashlib.blake2b(digest_size=32)
+    with pytest.raises(OSError):
+        copy_resumable(tmp_path / "CLIP0001.MP4", str(tmp_path / "other.MP4"), digest, chunk_size=100000)
+    assert not (tmp_path / "other.MP4.checkpoint").exists()
+    state["checksum"] = None
+    (tmp_path / "other.MP4.checkpoint").write_text(json.dumps(state))
+    digest = hashlib.blake2b(digest_size=32)
+    assert copy_resumable(tmp_path / "CLIP0001.MP4", str(tmp_path / "other.MP4"), digest, chunk_size=100000) == 0
+    assert (tmp_path / "other.MP4").read_bytes() == DATA
+    assert digest.hexdigest() == hashlib.blake2b(DATA, digest_size=32).hexdigest()
+
+def test_atomic_writer_resumable(tmp_path, mocker):
+    """Test AtomicWriter copies large files in checkpointed chunks and keeps them when the copy fails."""
+    (tmp_path / "IMG_0001.JPG").write_bytes(DATA[:1000])
+    (tmp_path / "CLIP0001.MP4").write_bytes(DATA)
+    writer = AtomicWriter(FSYNC_OFF, resumable_size=len(DATA))
+    method, temporary = writer.copy(tmp_path / "IMG_0001.JPG", tmp_path / "copy.JPG")
+    assert method != CHUNKED
+    writer.commit(temporary, tmp_path / "copy.JPG")
+    copy = mocker.spy(transfer, "copy_resumable")
+    mocker.patch("importphotos.transfer.CHECKPOINT_SIZE", 100000)
+    mocker.patch("importphotos.transfer.os.fsync", side_effect=[None, OSError(errno.EIO, "Error")])
+    with pytest.raises(OSError):
+        writer.copy(tmp_path / "CLIP0001.MP4", tmp_path / "copy.MP4")
+    assert os.path.exists(tmp_path / ".importphotos-copy.MP4.part")
+    mocker.patch("importphotos.transfer.os.fsync")
+    method, temporary = writer.copy(tmp_path / "CLIP0001.MP4", tmp_path / "copy.MP4")
+    assert method == CHUNKED
+    assert writer.resumed_bytes == 100000
+    assert copy.call_count == 2
+    writer.commit(temporary, tmp_path / "copy.MP4")
+    assert (tmp_path / "copy.MP4").read_bytes() == DATA
+    assert sorted(os.listdir(tmp_path)) == ["CLIP0001.MP4", "IMG_0001.JPG", "copy.JPG", "copy.MP4"]
+
+def test_copy_to_many(tmp_path, mocker):
+    """Test copy_to_many reads the source once for all destinations and keeps the error of each."""
+    mocker.patch("importphotos.transfer.BUFFER_SIZE", 1000)
+    (tmp_path / "IMG_0001.JPG").write_bytes(DATA)
+    (tmp_path / "first").mkdir()
+    (tmp_path / "second").mkdir()
+    digest = hashlib.blake2b(digest_size=32)
+    errors = copy_to_many(tmp_path / "IMG_0001.JPG", [tmp_path / "first" / "copy.JPG", tmp_path / "missing" / "copy.JPG",
+                                                       tmp_path / "second" / "copy.JPG"], digest)
+    assert errors[0] is None and errors[2] is None
+    assert isinstance(errors[1], FileNotFoundError)
+    assert (tmp_path / "first" / "copy.JPG").read_bytes() == DATA
+    assert (tmp_path / "second" / "copy.JPG").read_bytes() == DATA
+    assert digest.hexdigest() == hashlib.blake2b(DATA, digest_size=32).hexdigest()
+
+def test_atomic_writer_copy_many(tmp_path):
+    """Test AtomicWriter copy_many writes a temporary copy in each destination."""
+    (tmp_path / "IMG_0001.JPG").write_bytes(DATA)
+    (tmp_path / "backup").mkdir()
+    writer = AtomicWriter(FSYNC_OFF)
+    results = writer.copy_many(tmp_path / "IMG_0001.JPG", [tmp_path / "copy.JPG", tmp_path / "backup" / "copy.JPG",
+                                                           tmp_path / "IMG_0001.JPG", tmp_path / "missing" / "copy.JPG"])
+    assert results[0] == (BUFFERED, temporary_name(tmp_path / "copy.JPG"))
+    assert results[1] == (BUFFERED, temporary_name(tmp_path / "backup" / "copy.JPG"))
+    assert isinstance(results[2], shutil.SameFileError)
+    assert isinstance(results[3], OSError)
+    assert (tmp_path / "backup" / ".importphotos-copy.JPG.part").read_bytes() == DATA
+    assert writer.copy_many(tmp_path / "IMG_0001.JPG", [tmp_path / "missing" / "copy.JPG"])[0].errno == errno.ENOENT
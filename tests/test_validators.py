@@ -2,7 +2,7 @@
 import argparse
 import pytest
 
-from importphotos.validators import FileValidator
+from importphotos.validators import FileValidator, NumberValidator
 
 def test_file_extension():
     """Test file_extension validator."""
@@ -22,4 +22,14 @@ def test_file_path(mocker):
     with pytest.raises(argparse.ArgumentTypeError):
         FileValidator.file_path("tests/test_validators.py")
     with pytest.raises(argparse.ArgumentTypeError):
-        FileValidator.file_path("tests/test_validators.py, tests/test_validators.pyx")
\ No newline at end of file
+        FileValidator.file_path("tests/test_validators.py, tests/test_validators.pyx")
+def test_positive_integer():
+    """Test positive_integer validator."""
+    assert NumberValidator.positive_integer("4") == 4
+    assert NumberValidator.positive_integer(1) == 1
+    with pytest.raises(argparse.ArgumentTypeError):
+        NumberValidator.positive_integer("0")
+    with pytest.raises(argparse.ArgumentTypeError):
+        NumberValidator.positive_integer("four")
+    with pytest.raises(argparse.ArgumentTypeError):
+        NumberValidator.positive_integer(None)
@@ -0,0 +1,69 @@
+"""Unit Tests for importphotos.walker module."""
+import os
+
+from importphotos.walker import Walker, extension_set
+
+def make_tree(tmp_path, names):
+    """Create empty files, and the folders they are in, under tmp_path."""
+    for name in names:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_bytes(b"data")
+
+def test_extension_set():
+    """Test extension_set lowercases one or many extensions."""
+    assert extension_set(".ARW") == {".arw"}
+    assert extension_set((".JPG", ".jpeg")) == {".jpg", ".jpeg"}
+
+def test_walker_walk(tmp_path):
+    """Test Walker yields files with the extensions, folders before their subfolders."""
+    make_tree(tmp_path, ["DCIM/100MSDCF/IMG_0001.JPG", "DCIM/100MSDCF/IMG_0002.arw", "DCIM/100MSDCF/notes.txt",
+                         "DCIM/101MSDCF/IMG_0003.jpg", "IMG_0000.JPG", "JPG"])
+    walker = Walker((".JPG", ".ARW"), recurse=True)
+    found = [os.path.relpath(entry.path, tmp_path) for entry in walker.walk(str(tmp_path))]
+    assert found[0] == "IMG_0000.JPG"
+    assert sorted(found) == sorted(["IMG_0000.JPG", os.path.join("DCIM", "100MSDCF", "IMG_0001.JPG"),
+                                    os.path.join("DCIM", "100MSDCF", "IMG_0002.arw"), os.path.join("DCIM", "101MSDCF", "IMG_0003.jpg")])
+    assert walker.directories == 4
+    assert walker.matched == 4
+    assert walker.entries == 9
+    assert [entry.name for entry in Walker(".JPG").walk(str(tmp_path))] == ["IMG_0000.JPG"]
+
+def test_walker_skips_hidden_and_system(tmp_path):
+    """Test Walker skips hidden files and folders and folders of the system."""
+    make_tree(tmp_path, [".Trashes/501/IMG_0001.JPG", "MISC/IMG_0002.JPG", ".hidden/IMG_0003.JPG",
+                         "DCIM/._IMG_0004.JPG", "DCIM/IMG_0004.JPG"])
+    walker = Walker(".JPG", recurse=True)
+    assert [entry.name for entry in walker.walk(str(tmp_path))] == ["IMG_0004.JPG"]
+    assert sorted(os.path.basename(path) for path in walker.skipped) == [".Trashes", ".hidden", "MISC"]
+    walker = Walker(".JPG", recurse=True, skip_hidden=False, system_dirs=frozenset())
+    assert len(list(walker.walk(str(tmp_path)))) == 5
+
+def test_walker_on_directory(tmp_path):
+    """Test Walker reports the names found in each folder."""
+    make_tree(tmp_path, ["IMG_0001.JPG", "notes.txt", "sub/IMG_0002.JPG"])
+    reports = []
+    list(Walker(".JPG", recurse=True).walk(str(tmp_path), lambda *report: reports.append(report)))
+    assert reports == [(str(tmp_path), ["IMG_0001.JPG"], ["notes.txt"], ["sub"]),
+                       (os.path.join(str(tmp_path), "sub"), ["IMG_0002.JPG"], [], [])]
+
+def test_walker_errors(tmp_path, mocker):
+    """Test Walker keeps going past folders it can not read."""
+    make_tree(tmp_path, ["a/IMG_0001.JPG", "b/IMG_0002.JPG"])
+    scandir = os.scandir
+    mocker.patch("os.scandir", side_effect=lambda path: (_ for _ in ()).throw(PermissionError(path)) if path.endswith("a") else scandir(path))
+    walker = Walker(".JPG", recurse=True)
+    assert [entry.name for entry in walker.walk(str(tmp_path))] == ["IMG_0002.JPG"]
+    assert len(walker.errors) == 1
+
+def test_walker_linear(tmp_path, mocker):
+    """Test Walker lists each folder once."""
+    make_tree(tmp_path, [f"{d}/IMG_{i:04}.JPG" for d in range(5) for i in range(20)])
+    scandir = mocker.patch("os.scandir", side_effect=os.scandir)
+    assert len(list(Walker(".JPG", recurse=True).walk(str(tmp_path)))) == 100
+    assert scandir.call_count == 6
+
+def test_walker_str_repr():
+    """Test Walker str and repr."""
+    walker = Walker((".JPG", ".ARW"), True)
+    assert str(walker) == "Walker(0 of 0 entries in 0 folders)"
+    assert repr(walker) == "Walker(['.arw', '.jpg'], True, 0, 0, 0)"
@@ -0,0 +1,136 @@
+"""Unit Tests for importphotos.watch module."""
+import os
+import sys
+
+import pytest
+
+from importphotos.watch import Inotify, MountWatcher, card_folder, drives, mount_roots, snapshot
+
+def mount(root, name, count=2):
+    """Make a volume folder in root with count photos in DCIM/100CANON."""
+    folder = root / name / "DCIM" / "100CANON"
+    folder.mkdir(parents=True)
+    for i in range(count):
+        (folder / f"IMG_{i:04}.JPG").write_bytes(b"photo" * (i + 1))
+    return str(root / name)
+
+def test_mount_roots(mocker):
+    """Test mount_roots lists the folders of the current user on Linux and the volumes on macOS, and none on Windows."""
+    if os.name == 'nt':
+        assert mount_roots() == ()
+        return
+    roots = mount_roots()
+    assert roots[0] == os.path.join("/media", os.path.basename(os.path.expanduser("~")))
+    assert "/Volumes" in roots
+    mocker.patch("importphotos.watch.os.name", "nt")
+    assert mount_roots() == ()
+
+def test_drives(mocker):
+    """Test drives lists the drives with os.listdrives, and probes the drive letters on Windows without it."""
+    mocker.patch("importphotos.watch.os.listdrives", create=True, return_value=["C:\\", "E:\\"])
+    assert drives() == ["C:\\", "E:\\"]
+    mocker.patch("importphotos.watch.os.listdrives", create=True, side_effect=OSError("Error"))
+    mocker.patch("importphotos.watch.os.name", "nt")
+    mocker.patch("importphotos.watch.os.path.exists", side_effect=lambda path: path in ("C:\\", "D:\\"))
+    assert drives() == ["C:\\", "D:\\"]
+
+def test_card_folder(tmp_path):
+    """Test card_folder uses the DCIM folder of a volume when it has one."""
+    assert card_folder(mount(tmp_path, "CARD")) == str(tmp_path / "CARD" / "DCIM")
+    (tmp_path / "USB").mkdir()
+    assert card_folder(str(tmp_path / "USB")) == str(tmp_path / "USB")
+
+def test_snapshot(tmp_path):
+    """Test snapshot counts the files with one of the extensions and changes as they are written."""
+    volume = mount(tmp_path, "CARD")
+    (tmp_path / "CARD" / "notes.txt").write_bytes(b"notes")
+    count, size, _ = snapshot(volume, (".jpg",))
+    assert (count, size) == (2, 15)
+    (tmp_path / "CARD" / "DCIM" / "100CANON" / "IMG_0002.JPG").write_bytes(b"photo")
+    assert snapshot(volume, (".jpg",))[:2] == (3, 20)
+    assert snapshot(str(tmp_path / "missing"), (".jpg",)) == (0, 0, 0)
+
+def test_mount_watcher_poll(tmp_path):
+    """Test MountWatcher yields a new volume once its files stop changing, and not the volumes there at the start."""
+    mount(tmp_path, "OLD")
+    watcher = MountWatcher([str(tmp_path), str(tmp_path / "missing")], (".jpg",), settle=0, inotify=False)
+    assert watcher.poll() == []
+    volume = mount(tmp_path, "CARD")
+    (tmp_path / ".hidden").mkdir()
+    assert watcher.poll() == []
+    assert len(watcher.pending) == 1
+    (tmp_path / "CARD" / "DCIM" / "100CANON" / "IMG_0002.JPG").write_bytes(b"photo")
+    assert watcher.poll() == []
+    assert watcher.poll() == [volume]
+    assert watcher.poll() == []
+    assert watcher.polls == 5
+
+def test_mount_watcher_settle(tmp_path, mocker):
+    """Test MountWatcher waits settle seconds, drops volumes without photos and forgets volumes removed."""
+    monotonic = mocker.patch("importphotos.watch.time.monotonic", return_value=100.0)
+    root = tmp_path / "media"
+    root.mkdir()
+    watcher = MountWatcher([str(root)], (".jpg",), settle=5, inotify=False)
+    volume = mount(root, "CARD")
+    (root / "EMPTY").mkdir()
+    assert watcher.poll() == []
+    monotonic.return_value = 104.0
+    assert watcher.poll() == []
+    monotonic.return_value = 105.0
+    assert watcher.poll() == [volume]
+    assert watcher.pending == {}
+    mount(root, "SECOND")
+    assert watcher.poll() == []
+    assert len(watcher.pending) == 1
+    os.rename(root / "SECOND", tmp_path / "SECOND")
+    assert watcher.poll() == []
+    assert watcher.pending == {}
+
+def test_mount_watcher_drives(tmp_path, mocker):
+    """Test MountWatcher without roots watches the drives, so a card is found as a new drive letter."""
+    drives = mocker.patch("importphotos.watch.drives", return_value=[str(tmp_path / "C")])
+    (tmp_path / "C").mkdir()
+    watcher = MountWatcher([], (".jpg",), settle=0, inotify=False)
+    assert watcher.poll() == []
+    volume = mount(tmp_path, "E")
+    drives.return_value = [str(tmp_path / "C"), volume, str(tmp_path / "F")]
+    assert watcher.poll() == []
+    assert watcher.poll() == [volume]
+    assert str(watcher) == "MountWatcher(drives, polling)"
+
+def test_mount_watcher_wait(tmp_path, mocker):
+    """Test MountWatcher polls every interval seconds without inotify."""
+    sleep = mocker.patch("importphotos.watch.time.sleep")
+    watcher = MountWatcher([str(tmp_path)], (".jpg",), interval=3, settle=0, inotify=False)
+    assert watcher.inotify is None
+    mount(tmp_path, "CARD")
+    volumes = iter(watcher)
+    assert next(volumes) == str(tmp_path / "CARD")
+    sleep.assert_called_once_with(3)
+    assert str(watcher) == f"MountWatcher({tmp_path}, polling)"
+    assert repr(watcher) == f"MountWatcher([{str(tmp_path)!r}], 3, 0, 1, 0, 2)"
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is only on Linux")
+def test_inotify(tmp_path):
+    """Test Inotify wakes up when a folder is created in a watched folder."""
+    inotify = Inotify()
+    assert inotify.watch(str(tmp_path))
+    assert not inotify.watch(str(tmp_path / "missing"))
+    assert not inotify.wait(0)
+    (tmp_path / "CARD").mkdir()
+    assert inotify.wait(1)
+    assert inotify.events == 1
+    assert str(inotify) == "Inotify(1 folders, 1 events)"
+    inotify.close()
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is only on Linux")
+def test_mount_watcher_inotify(tmp_path):
+    """Test MountWatcher watches the roots with inotify, including a root created later."""
+    watcher = MountWatcher([str(tmp_path / "media")], (".jpg",), settle=0)
+    assert watcher.inotify is not None
+    assert watcher.inotify.watched == set()
+    (tmp_path / "media").mkdir()
+    watcher.poll()
+    assert watcher.inotify.watched == {str(tmp_path / "media")}
+    watcher.close()
+    assert watcher.inotify is None